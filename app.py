@@ -23,6 +23,7 @@ import atexit
 import platform
 import requests
 import logging
+import multiprocessing
 
 # ロギングの設定
 logging.basicConfig(
@@ -190,29 +191,41 @@ def start_translation_server():
                     text=True
                 )
         
-        # サーバーの起動を確認するために待機
+        # サーバーの準備状態を確認するために待機
         print("サーバーの起動を確認しています...")
-        max_retries = 60  # 無制限に近い値に設定（60回のリトライ）
-        retry_interval = 2  # 秒
+        connect_timeout = 120  # サーバーがポートを開くまで待つ最大時間（秒）
+        poll_interval = 0.5  # 秒
+        started_at = time.time()
         server_ready = False
+        last_status = None
         
-        for i in range(max_retries):
+        while True:
             # プロセスが終了していないか確認
             if server_process.poll() is not None:
                 print("エラー: 翻訳サーバーの起動に失敗しました")
                 return None
                 
-            # サーバーが応答するか確認
+            # サーバーの準備状態を確認（準備中は503で状態が返される）
             try:
-                response = requests.get("http://127.0.0.1:11451/docs", timeout=5)  # タイムアウトを5秒に増加
-                if response.status_code == 200:
-                    server_ready = True
+                health = requests.get("http://127.0.0.1:11451/health", timeout=5).json()
+            except (requests.RequestException, ValueError):
+                if time.time() - started_at >= connect_timeout:
                     break
-            except requests.RequestException:
-                pass
-                
-            print(f"サーバー起動待機中... ({i+1}/{max_retries})")
-            time.sleep(retry_interval)
+                time.sleep(poll_interval)
+                continue
+            
+            status = health.get("status")
+            if status == "ready":
+                server_ready = True
+                print(f"翻訳サーバーの準備が完了しました ({health.get('ready_after_sec')}秒)")
+                break
+            if status == "failed":
+                print(f"エラー: 翻訳モデルの読み込みに失敗しました: {health.get('error')}")
+                break
+            if status != last_status:
+                print(f"サーバー起動待機中... ({status})")
+                last_status = status
+            time.sleep(poll_interval)
             
         if not server_ready:
             print("警告: サーバーの応答を確認できませんでしたが、プロセスは実行中です")
@@ -377,4 +390,6 @@ def main():
         cleanup_server()
 
 if __name__ == "__main__":
+    # パッケージ化された実行ファイルで翻訳サーバーのワーカープロセスを起動できるようにする
+    multiprocessing.freeze_support()
     main()
\ No newline at end of file
@@ -17,6 +17,30 @@ a = Analysis(
         # 翻訳サーバー関連のファイル（モデルは除く）
         ('translator_main/translator/server_client/translate_client.py', 'translator_main/translator/server_client'),
         ('translator_main/translator/server_client/translate_server_run.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/micro_batcher.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/inference_executor.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/translation_cache.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/persistent_cache.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/quantization.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/engines.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/generation_policy.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/readiness.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/cancellation.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/job_store.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/worker_coordination.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/admission.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/metrics.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/shared_weights.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/file_lock.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/resource_governor.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/weight_snapshot.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/sample_texts.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/text_chunker.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/vocab_shortlist.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/sentencepiece_tokenizer.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/timing.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/compiled_decoding.py', 'translator_main/translator/server_client'),
+        ('translator_main/translator/server_client/assisted_decoding.py', 'translator_main/translator/server_client'),
         # モデルディレクトリ構造だけを含める（中身は含めない）
         ('translator_main/translator/server_client/model', 'translator_main/translator/server_client/model'),
     ],
@@ -8,7 +8,7 @@ setup(
     author_email="",  # プライバシー保護のため空にしておく
     url="https://github.com/Borshchnabe/enjapp",
     packages=find_packages(),
-    python_requires=">=3.7",
+    python_requires=">=3.8",
     install_requires=[
         # 画像処理関連
         "opencv-python>=4.5.0",  # 画像処理
@@ -22,14 +22,15 @@ setup(
         "PyQt5>=5.15.0",         # GUI フレームワーク
 
         # サーバー関連
-        "fastapi>=0.68.0",       # APIサーバー
+        "fastapi>=0.93.0",       # APIサーバー（lifespan を使用）
         "uvicorn>=0.15.0",       # ASGIサーバー
         "requests>=2.25.0",      # HTTP通信
 
         # 翻訳モデル関連
-        "torch>=1.9.0",          # 機械学習フレームワーク
+        "torch>=2.1.0",          # 機械学習フレームワーク（重みのメモリマップ共有に2.1以上が必要）
         "transformers>=4.11.0",  # 自然言語処理モデル
         "sentencepiece>=0.1.96", # M2M100モデルに必要
+        "psutil>=5.8.0",         # メモリ使用量の計測
         
         # 環境設定
         "python-dotenv>=0.19.0", # 環境変数管理
@@ -38,7 +39,9 @@ setup(
         "colorlog>=6.0.0",       # カラーロギング
     ],
     extras_require={
-        "gpu": ["torch>=1.7.0"],                   # GPU使用時のみ必要
+        "gpu": ["torch>=2.1.0"],                   # GPU使用時のみ必要
+        "onnx": ["optimum[onnxruntime]>=1.14.0"],  # ONNX Runtimeエンジン使用時のみ必要
+        "ctranslate2": ["ctranslate2>=3.20.0"],  # CTranslate2エンジン使用時のみ必要
     },
     # パッケージデータの追加
     include_package_data=True,
@@ -55,7 +58,6 @@ setup(
         'Intended Audience :: End Users/Desktop',
         'Topic :: Utilities',
         'Programming Language :: Python :: 3',
-        'Programming Language :: Python :: 3.7',
         'Programming Language :: Python :: 3.8',
         'Programming Language :: Python :: 3.9',
         'Programming Language :: Python :: 3.10',
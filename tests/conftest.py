@@ -0,0 +1,18 @@
+# -*- coding: utf-8 -*-
+
+"""
+テスト共通の設定
+
+翻訳サーバーの補助モジュールは server_client ディレクトリに平置きされ、
+互いに同じディレクトリからインポートしているため、そのディレクトリをパスに追加します。
+"""
+
+import os
+import sys
+
+SERVER_CLIENT_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+    "translator_main", "translator", "server_client"
+)
+if SERVER_CLIENT_DIR not in sys.path:
+    sys.path.insert(0, SERVER_CLIENT_DIR)
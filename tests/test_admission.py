@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+
+"""admission のテスト"""
+
+import pytest
+
+import admission as admission_module
+from admission import (AdmissionController, AdmissionRejectedError, LANE_BULK, LANE_INTERACTIVE,
+                       lane_priority)
+
+
+def test_bulk_lane_is_limited_to_its_share():
+    admission = AdmissionController(max_depth=4, bulk_share=0.5)
+    assert admission.lane_limits == {LANE_INTERACTIVE: 4, LANE_BULK: 2}
+    admission.acquire(LANE_BULK)
+    admission.acquire(LANE_BULK)
+    with pytest.raises(AdmissionRejectedError):
+        admission.acquire(LANE_BULK)
+    # bulk が上限に達しても interactive の枠は残っている
+    admission.acquire(LANE_INTERACTIVE)
+    admission.acquire(LANE_INTERACTIVE)
+    with pytest.raises(AdmissionRejectedError):
+        admission.acquire(LANE_INTERACTIVE)
+    stats = admission.stats()["lanes"]
+    assert stats[LANE_BULK]["rejected"] == 1
+    assert stats[LANE_INTERACTIVE]["rejected"] == 1
+
+
+def test_release_frees_the_slot():
+    admission = AdmissionController(max_depth=1)
+    ticket = admission.acquire(LANE_INTERACTIVE)
+    with pytest.raises(AdmissionRejectedError):
+        admission.acquire(LANE_INTERACTIVE)
+    admission.release(ticket)
+    admission.acquire(LANE_INTERACTIVE)
+
+
+class FakeClock:
+    """テスト用の perf_counter"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def record_latency(admission, clock, seconds):
+    """所要時間 seconds のリクエストを1件処理したことにする"""
+    ticket = admission.acquire(LANE_INTERACTIVE)
+    clock.now += seconds
+    admission.release(ticket)
+
+
+def test_retry_after_uses_latency_and_depth(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission_module.time, "perf_counter", clock)
+    admission = AdmissionController(max_depth=8, concurrency=2, ema_alpha=1.0)
+    # 所要時間の実測値がない場合は1秒
+    assert admission.retry_after() == 1
+    record_latency(admission, clock, 3.0)
+    for _ in range(4):
+        admission.acquire(LANE_INTERACTIVE)
+    # 3秒 × 4件 ÷ 同時実行数2
+    assert admission.retry_after() == 6
+    for _ in range(4):
+        admission.acquire(LANE_INTERACTIVE)
+    with pytest.raises(AdmissionRejectedError) as excinfo:
+        admission.acquire(LANE_INTERACTIVE)
+    assert excinfo.value.retry_after == 12
+
+
+def test_retry_after_is_capped(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(admission_module.time, "perf_counter", clock)
+    admission = AdmissionController(max_depth=100)
+    record_latency(admission, clock, 10.0)
+    for _ in range(10):
+        admission.acquire(LANE_INTERACTIVE)
+    assert admission.retry_after() == 30
+
+
+def test_resolve_lane_and_priority():
+    assert AdmissionController.resolve_lane(None) == LANE_INTERACTIVE
+    assert AdmissionController.resolve_lane(None, default=LANE_BULK) == LANE_BULK
+    with pytest.raises(ValueError):
+        AdmissionController.resolve_lane("urgent")
+    assert lane_priority(LANE_INTERACTIVE) < lane_priority(LANE_BULK)
@@ -0,0 +1,56 @@
+# -*- coding: utf-8 -*-
+
+"""cancellation のテスト"""
+
+import pytest
+
+from cancellation import (BatchCancellation, CancellationRegistry, CancellationStoppingCriteria,
+                          TranslationCancelledError)
+
+
+def test_cancel_by_request_id():
+    registry = CancellationRegistry()
+    first = registry.register("req-1")
+    second = registry.register("req-1")
+    other = registry.register("req-2")
+
+    assert registry.cancel("req-1") is True
+    assert first.is_cancelled and second.is_cancelled
+    assert not other.is_cancelled
+    with pytest.raises(TranslationCancelledError):
+        first.raise_if_cancelled()
+    assert registry.cancel("unknown") is False
+    assert registry.stats() == {"active_requests": 2, "cancelled": 1}
+
+
+def test_unregistered_request_is_not_cancelled():
+    registry = CancellationRegistry()
+    token = registry.register("req-1")
+    registry.unregister(token)
+    assert registry.cancel("req-1") is False
+    assert not token.is_cancelled
+    assert registry.stats()["active_requests"] == 0
+
+
+def test_batch_is_cancelled_only_when_all_requests_are():
+    registry = CancellationRegistry()
+    first = registry.register("a")
+    second = registry.register("b")
+    batch = BatchCancellation([first])
+    batch.add(second)
+    stopping = CancellationStoppingCriteria(batch)
+
+    registry.cancel("a")
+    assert not batch.is_cancelled
+    assert stopping(None, None) is False
+    batch.raise_if_cancelled()
+
+    registry.cancel("b")
+    assert batch.is_cancelled
+    assert stopping(None, None) is True
+    with pytest.raises(TranslationCancelledError):
+        batch.raise_if_cancelled()
+
+
+def test_empty_batch_is_never_cancelled():
+    assert not BatchCancellation([]).is_cancelled
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+
+"""generation_policy のテスト"""
+
+import pytest
+
+from generation_policy import GenerationPolicy
+
+BASE_SETTINGS = {"max_length": 512, "num_beams": 5, "early_stopping": True}
+
+
+def test_max_new_tokens_scales_with_input_and_is_capped():
+    policy = GenerationPolicy(BASE_SETTINGS, max_new_tokens_cap=100)
+    assert policy.max_new_tokens(0) == 16
+    assert policy.max_new_tokens(20) == 50
+    assert policy.max_new_tokens(1000) == 100
+
+
+def test_choose_beams_follows_quality_hints():
+    policy = GenerationPolicy(BASE_SETTINGS)
+    assert policy.choose_beams(20, quality="fast") == 1
+    assert policy.choose_beams(20, quality="quality") == 5
+    # 遅延の目標値がなければ最大ビーム数
+    assert policy.choose_beams(20) == 5
+
+
+def test_choose_beams_without_measurements_uses_max_beams():
+    policy = GenerationPolicy(BASE_SETTINGS, latency_budget_ms=100)
+    assert policy.choose_beams(20) == 5
+
+
+def test_choose_beams_fits_latency_budget():
+    policy = GenerationPolicy(BASE_SETTINGS, latency_budget_ms=100)
+    # 1件あたり ビーム1本で 1000 トークン/秒
+    policy.record(generated_tokens=500, num_beams=1, elapsed_sec=0.5)
+    # 50トークン × ビーム数 / 1000 * 1000ms <= 100ms となるのはビーム数2まで
+    assert policy.choose_beams(50) == 2
+    assert policy.choose_beams(50, latency_budget_ms=1000) == 5
+    assert policy.choose_beams(5000) == 1
+
+
+def test_record_uses_per_request_speed():
+    policy = GenerationPolicy(BASE_SETTINGS)
+    # 4件のバッチで合計400トークン → 1件あたり100トークン、ビーム2本で 200 トークン/秒
+    policy.record(generated_tokens=400, num_beams=2, elapsed_sec=1.0, batch_size=4)
+    assert policy.stats()["beam_tokens_per_sec"] == 200.0
+    assert policy.stats()["batches_by_beams"] == {"2": 1}
+
+
+def test_resolve_drops_early_stopping_for_greedy():
+    policy = GenerationPolicy(BASE_SETTINGS)
+    settings = policy.resolve(10, quality="fast")
+    assert settings["num_beams"] == 1
+    assert "early_stopping" not in settings
+    assert "max_length" not in settings
+    assert policy.resolve(10)["early_stopping"] is True
+
+
+def test_resolve_rejects_unknown_quality():
+    policy = GenerationPolicy(BASE_SETTINGS)
+    with pytest.raises(ValueError):
+        policy.resolve(10, quality="best")
+
+
+def test_merge_uses_largest_max_new_tokens():
+    policy = GenerationPolicy(BASE_SETTINGS)
+    merged = GenerationPolicy.merge([policy.resolve(5), policy.resolve(100), policy.resolve(20)])
+    assert merged["max_new_tokens"] == policy.max_new_tokens(100)
+    assert merged["num_beams"] == 5
@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""inference_executor のテスト"""
+
+import asyncio
+import threading
+
+import pytest
+
+pytest.importorskip("torch")
+
+from inference_executor import InferenceExecutor, InferenceQueueFullError  # noqa: E402
+
+
+def test_runs_off_the_event_loop_thread():
+    async def main():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=4)
+        return threading.get_ident(), await executor.run(threading.get_ident)
+
+    loop_thread, worker_thread = asyncio.run(main())
+    assert loop_thread != worker_thread
+
+
+def test_full_queue_is_rejected_immediately():
+    release = threading.Event()
+
+    async def main():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=1)
+        running = executor.submit(release.wait)
+        queued = executor.submit(lambda: "queued")
+        with pytest.raises(InferenceQueueFullError):
+            executor.submit(lambda: "rejected")
+        release.set()
+        return await running, await queued, executor.stats()
+
+    running, queued, stats = asyncio.run(main())
+    assert (running, queued) == (True, "queued")
+    assert stats["rejected"] == 1
+
+
+def test_higher_priority_runs_first():
+    release = threading.Event()
+    order = []
+
+    async def main():
+        executor = InferenceExecutor(max_workers=1, max_queue_size=8)
+        blocker = executor.submit(release.wait)
+        low = executor.submit(order.append, "bulk", priority=1)
+        high = executor.submit(order.append, "interactive", priority=0)
+        release.set()
+        await asyncio.gather(blocker, low, high)
+
+    asyncio.run(main())
+    assert order == ["interactive", "bulk"]
+
+
+def test_exception_is_propagated():
+    def fail():
+        raise ValueError("失敗")
+
+    async def main():
+        executor = InferenceExecutor()
+        with pytest.raises(ValueError):
+            await executor.run(fail)
+        return executor.stats()
+
+    assert asyncio.run(main())["failed"] == 1
@@ -0,0 +1,99 @@
+# -*- coding: utf-8 -*-
+
+"""job_store のテスト"""
+
+import asyncio
+
+import job_store as job_store_module
+from job_store import TranslationJobStore, JOB_PENDING, JOB_DONE, JOB_FAILED
+
+
+class FakeClock:
+    """テスト用の monotonic"""
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_same_key_is_deduplicated_while_running():
+    calls = []
+
+    async def main():
+        store = TranslationJobStore(ttl_sec=60)
+        release = asyncio.Event()
+
+        async def compute(job):
+            calls.append(job.job_id)
+            await release.wait()
+            return "翻訳結果"
+
+        first, shared_first = store.submit("key", compute)
+        second, shared_second = store.submit("key", compute)
+        assert (shared_first, shared_second) == (False, True)
+        assert second is first
+        assert first.status == JOB_PENDING
+
+        release.set()
+        await store.wait(first, 1.0)
+        return store, first
+
+    store, job = asyncio.run(main())
+    assert len(calls) == 1
+    assert job.status == JOB_DONE
+    assert job.future.result() == "翻訳結果"
+    assert store.stats()["deduplicated"] == 1
+
+
+def test_failed_job_is_not_reused():
+    async def main():
+        store = TranslationJobStore()
+
+        async def fail(job):
+            raise RuntimeError("失敗")
+
+        async def succeed(job):
+            return "ok"
+
+        failed, _ = store.submit("key", fail)
+        await store.wait(failed, 1.0)
+        retried, shared = store.submit("key", succeed)
+        await store.wait(retried, 1.0)
+        return failed, retried, shared
+
+    failed, retried, shared = asyncio.run(main())
+    assert failed.status == JOB_FAILED
+    assert not shared
+    assert retried is not failed
+    assert retried.status == JOB_DONE
+
+
+def test_finished_job_expires_after_ttl(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(job_store_module.time, "monotonic", clock)
+
+    async def main():
+        store = TranslationJobStore(ttl_sec=10)
+
+        async def compute(job):
+            return "ok"
+
+        job, _ = store.submit("key", compute)
+        await store.wait(job, 1.0)
+
+        clock.now = 5.0
+        assert store.get(job.job_id) is job
+        assert store.submit("key", compute)[1] is True
+
+        clock.now = 20.0
+        assert store.get(job.job_id) is None
+        renewed, shared = store.submit("key", compute)
+        await store.wait(renewed, 1.0)
+        return store, renewed, shared
+
+    store, renewed, shared = asyncio.run(main())
+    assert not shared
+    assert renewed.status == JOB_DONE
+    assert store.stats()["expired"] == 1
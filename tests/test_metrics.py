@@ -0,0 +1,48 @@
+# -*- coding: utf-8 -*-
+
+"""metrics のテスト"""
+
+from metrics import MetricsRegistry
+
+
+def test_counter_and_callback_rendering():
+    registry = MetricsRegistry(prefix="enjapp_")
+    requests = registry.counter("requests_total", "翻訳リクエスト数", labelnames=("endpoint",))
+    registry.counter("errors_total", "エラー数")
+    registry.callback("cache_entries", "キャッシュ件数", lambda: 3)
+    registry.callback("skipped", "値がない場合は出力しない", lambda: None)
+    requests.inc(labels=("/translate",))
+    requests.inc(2, labels=("/translate",))
+
+    text = registry.render()
+    assert text.endswith("\n")
+    lines = text.splitlines()
+    assert "# HELP enjapp_requests_total 翻訳リクエスト数" in lines
+    assert "# TYPE enjapp_requests_total counter" in lines
+    assert 'enjapp_requests_total{endpoint="/translate"} 3' in lines
+    # ラベルのないカウンターは増えていなくても0を出力する
+    assert "enjapp_errors_total 0" in lines
+    assert "enjapp_cache_entries 3" in lines
+    assert not any(line.startswith("enjapp_skipped") for line in lines)
+
+
+def test_histogram_buckets_are_cumulative():
+    registry = MetricsRegistry()
+    latency = registry.histogram("latency_seconds", "所要時間", buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 0.5, 2.0):
+        latency.observe(value)
+
+    lines = registry.render().splitlines()
+    assert "# TYPE latency_seconds histogram" in lines
+    assert 'latency_seconds_bucket{le="0.1"} 1' in lines
+    assert 'latency_seconds_bucket{le="1"} 3' in lines
+    assert 'latency_seconds_bucket{le="+Inf"} 4' in lines
+    assert "latency_seconds_sum 3.05" in lines
+    assert "latency_seconds_count 4" in lines
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    counter = registry.counter("events_total", "イベント数", labelnames=("name",))
+    counter.inc(labels=('a"b\\c\n',))
+    assert 'events_total{name="a\\"b\\\\c\\n"} 1' in registry.render().splitlines()
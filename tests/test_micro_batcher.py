@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+
+"""micro_batcher のテスト"""
+
+import asyncio
+
+from micro_batcher import MicroBatcher
+
+
+def run_batches(requests, **kwargs):
+    """
+    リクエストを同時に登録し、process_batch に渡されたバッチと各リクエストの結果を返す
+
+    Args:
+        requests (list[tuple]): (payload, group_key, priority) のリスト
+    """
+    batches = []
+
+    async def process_batch(payloads):
+        batches.append(list(payloads))
+        return [f"done:{payload}" for payload in payloads]
+
+    async def main():
+        batcher = MicroBatcher(process_batch, **kwargs)
+        return await asyncio.gather(*(
+            batcher.submit(payload, group_key=group_key, priority=priority)
+            for payload, group_key, priority in requests
+        ))
+
+    results = asyncio.run(main())
+    return batches, results
+
+
+def test_requests_are_grouped_by_priority_and_beams():
+    requests = [
+        ("a", (1, 5), 1),
+        ("b", (0, 5), 0),
+        ("c", (1, 1), 1),
+        ("d", (0, 5), 0),
+        ("e", (1, 5), 1),
+    ]
+    batches, results = run_batches(requests, max_batch_size=8, window_ms=50)
+    assert results == [f"done:{payload}" for payload, _, _ in requests]
+    # 同じ (優先度, ビーム数) のリクエストだけが1つのバッチにまとまり、優先度の高いグループから実行される
+    assert batches[0] == ["b", "d"]
+    assert sorted(map(sorted, batches[1:])) == [["a", "e"], ["c"]]
+
+
+def test_max_batch_size_splits_batches():
+    requests = [(str(i), (0, 5), 0) for i in range(5)]
+    batches, _ = run_batches(requests, max_batch_size=2, window_ms=50)
+    assert [len(batch) for batch in batches] == [2, 2, 1]
+
+
+def test_exception_result_is_sent_only_to_its_caller():
+    async def process_batch(payloads):
+        return [ValueError(payload) if payload == "bad" else payload for payload in payloads]
+
+    async def main():
+        batcher = MicroBatcher(process_batch, window_ms=50)
+        return await asyncio.gather(
+            batcher.submit("ok"), batcher.submit("bad"), return_exceptions=True
+        )
+
+    ok, bad = asyncio.run(main())
+    assert ok == "ok"
+    assert isinstance(bad, ValueError)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+
+"""persistent_cache のテスト"""
+
+import os
+
+import persistent_cache as persistent_cache_module
+from persistent_cache import PersistentTranslationCache, compute_model_fingerprint
+
+
+class FakeClock:
+    """テスト用の time.time"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+def open_cache(tmp_path, fingerprint="model-a", **kwargs):
+    # バックグラウンドの書き込みが走らないよう、間隔を長くして flush() を明示的に呼ぶ
+    kwargs.setdefault("flush_interval", 60)
+    return PersistentTranslationCache(str(tmp_path / "cache.sqlite3"), fingerprint, **kwargs)
+
+
+def test_put_and_get_round_trip_across_restarts(tmp_path):
+    cache = open_cache(tmp_path)
+    cache.put(("Hello", "en", "ja"), "こんにちは")
+    # 書き込み待ちのエントリも取得できる
+    assert cache.get(("Hello", "en", "ja")) == "こんにちは"
+    cache.flush()
+    assert cache.get_many([("Hello", "en", "ja"), ("Bye", "en", "ja")]) == ["こんにちは", None]
+    stats = cache.stats()
+    assert stats["entries"] == 1
+    assert (stats["hits"], stats["misses"]) == (2, 1)
+    cache.close()
+
+    reopened = open_cache(tmp_path)
+    try:
+        assert reopened.get(("Hello", "en", "ja")) == "こんにちは"
+        assert reopened.stats()["invalidated_on_startup"] is False
+    finally:
+        reopened.close()
+
+
+def test_changed_fingerprint_invalidates_entries(tmp_path):
+    cache = open_cache(tmp_path, fingerprint="model-a")
+    cache.put("key", "value")
+    cache.close()
+
+    reopened = open_cache(tmp_path, fingerprint="model-b")
+    try:
+        assert reopened.get("key") is None
+        stats = reopened.stats()
+        assert stats["invalidated_on_startup"] is True
+        assert stats["entries"] == 0
+    finally:
+        reopened.close()
+
+
+def test_least_recently_accessed_entries_are_evicted(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(persistent_cache_module.time, "time", clock)
+    cache = open_cache(tmp_path, max_entries=2)
+    try:
+        for key in ("a", "b"):
+            cache.put(key, key.upper())
+            clock.now += 1
+        cache.flush()
+        # a にアクセスすると、最も長くアクセスされていないのは b になる
+        assert cache.get("a") == "A"
+        clock.now += 1
+        cache.put("c", "C")
+        cache.flush()
+
+        assert cache.get_many(["a", "b", "c"]) == ["A", None, "C"]
+        stats = cache.stats()
+        assert stats["entries"] == 2
+        assert stats["deleted"] == 1
+    finally:
+        cache.close()
+
+
+def test_entries_older_than_max_age_are_deleted_on_startup(tmp_path, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(persistent_cache_module.time, "time", clock)
+    cache = open_cache(tmp_path, max_age_days=1)
+    cache.put("old", "古い")
+    cache.close()
+
+    clock.now += 2 * 86400
+    reopened = open_cache(tmp_path, max_age_days=1)
+    try:
+        assert reopened.get("old") is None
+        assert reopened.stats()["deleted"] == 1
+    finally:
+        reopened.close()
+
+
+def test_model_fingerprint_changes_when_files_change(tmp_path):
+    model_file = tmp_path / "model.safetensors"
+    model_file.write_bytes(b"weights")
+    before = compute_model_fingerprint(str(tmp_path))
+    assert before == compute_model_fingerprint(str(tmp_path))
+
+    model_file.write_bytes(b"new weights")
+    os.utime(model_file, ns=(0, 123456789))
+    assert compute_model_fingerprint(str(tmp_path)) != before
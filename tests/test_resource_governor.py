@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+
+"""resource_governor のテスト"""
+
+from resource_governor import load_resource_settings, plan_resources
+
+
+def test_missing_or_disabled_settings_return_none(tmp_path):
+    assert load_resource_settings({}) is None
+    assert load_resource_settings({"resource_governor": {"preset": "none"}}) is None
+    assert load_resource_settings({"resource_governor": {"preset": "unknown"}}) is None
+    assert load_resource_settings(config_path=str(tmp_path / "config.json")) is None
+
+
+def test_individual_settings_override_the_preset():
+    settings = load_resource_settings({
+        "resource_governor": {
+            "preset": "reserve_gui", "ocr_cores": 1, "server": {"priority": "idle"}
+        }
+    })
+    assert settings["ocr_cores"] == 1
+    assert settings["gui_reserved_cores"] == 2
+    assert settings["server"]["priority"] == "idle"
+    # 入れ子の設定は項目ごとに結合される
+    assert settings["server"]["torch_interop_threads"] == 1
+
+
+def test_none_preset_can_be_enabled_with_reserve_gui_defaults():
+    settings = load_resource_settings({"resource_governor": {"preset": "none", "enabled": True}})
+    assert settings["enabled"] is True
+    assert settings["gui_reserved_cores"] == 2
+    assert settings["server"]["priority"] == "below_normal"
+
+
+def test_cores_are_split_between_gui_ocr_and_server():
+    settings = load_resource_settings({"resource_governor": {"preset": "reserve_gui"}})
+    plan = plan_resources(settings, cpu_count=8)
+    assert plan["gui_cores"] == [0, 1]
+    assert plan["server"]["cores"] == [4, 5, 6, 7]
+    assert plan["server"]["torch_threads"] == 4
+    # GUIとOCRは同じプロセスのため、OCRのアフィニティにはGUI用のコアも含まれる
+    assert plan["ocr"]["cores"] == [0, 1, 2, 3]
+    assert plan["ocr"]["tesseract_threads"] == 2
+    assert plan["ocr"]["opencv_threads"] == 2
+
+
+def test_ocr_and_server_share_cores_when_scarce():
+    settings = load_resource_settings({"resource_governor": {"preset": "reserve_gui"}})
+    plan = plan_resources(settings, cpu_count=3)
+    assert plan["gui_cores"] == [0, 1]
+    assert plan["server"]["cores"] == [2]
+    assert plan["ocr"]["cores"] == [0, 1, 2]
+    assert plan["server"]["torch_threads"] == 1
+    assert plan["ocr"]["tesseract_threads"] == 1
+
+
+def test_gui_reservation_leaves_at_least_one_core():
+    settings = load_resource_settings({
+        "resource_governor": {"preset": "reserve_gui", "gui_reserved_cores": 16}
+    })
+    plan = plan_resources(settings, cpu_count=4)
+    assert plan["gui_cores"] == [0, 1, 2]
+    assert plan["server"]["cores"] == [3]
+
+    single = plan_resources(settings, cpu_count=1)
+    assert single["gui_cores"] == []
+    assert single["server"]["cores"] == [0]
+
+
+def test_explicit_threads_and_unpinned_affinity():
+    settings = load_resource_settings({
+        "resource_governor": {
+            "preset": "reserve_gui",
+            "pin_affinity": False,
+            "server": {"torch_threads": 3},
+            "ocr": {"opencv_threads": 1},
+        }
+    })
+    plan = plan_resources(settings, cpu_count=8)
+    assert plan["server"]["cores"] is None
+    assert plan["ocr"]["cores"] is None
+    assert plan["server"]["torch_threads"] == 3
+    assert plan["ocr"]["opencv_threads"] == 1
+    assert plan["ocr"]["tesseract_threads"] == 2
@@ -0,0 +1,62 @@
+# -*- coding: utf-8 -*-
+
+"""text_chunker のテスト"""
+
+from text_chunker import chunk_text, split_lines, split_sentences
+
+
+def count_words(text):
+    """テスト用のトークン数（単語数）"""
+    return len(text.split())
+
+
+def test_short_text_is_single_chunk():
+    chunked = chunk_text("Hello world. How are you?", count_words, max_tokens=10)
+    assert chunked.chunks == ["Hello world. How are you?"]
+    assert chunked.join(["こんにちは。"]) == "こんにちは。"
+
+
+def test_long_line_is_split_at_sentences_and_packed():
+    text = "One two three. Four five six. Seven eight nine."
+    chunked = chunk_text(text, count_words, max_tokens=6)
+    assert chunked.chunks == ["One two three. Four five six.", "Seven eight nine."]
+    assert all(count_words(chunk) <= 6 for chunk in chunked.chunks)
+
+
+def test_join_uses_joiner_within_line():
+    text = "One two three. Four five six."
+    chunked = chunk_text(text, count_words, max_tokens=3, joiner="")
+    assert chunked.chunks == ["One two three.", "Four five six."]
+    assert chunked.join(["一二三。", "四五六。"]) == "一二三。四五六。"
+
+    spaced = chunk_text(text, count_words, max_tokens=3, joiner=" ")
+    assert spaced.join(["a", "b"]) == "a b"
+
+
+def test_newlines_are_preserved():
+    text = "First line.\nSecond line.\n\nThird paragraph."
+    chunked = chunk_text(text, count_words, max_tokens=10)
+    assert chunked.chunks == ["First line.", "Second line.", "Third paragraph."]
+    assert chunked.join(["一行目。", " 二行目。 ", "三段落目。"]) == "一行目。\n二行目。\n\n三段落目。"
+
+
+def test_soft_line_break_is_joined():
+    lines, separators = split_lines("This sentence is\nwrapped here.\nNext line.")
+    assert lines == ["This sentence is wrapped here.", "Next line."]
+    assert separators == ["", "\n"]
+
+
+def test_abbreviations_do_not_end_sentences():
+    sentences = split_sentences("Mr. Smith arrived. He sat down.")
+    assert sentences == ["Mr. Smith arrived.", "He sat down."]
+
+
+def test_oversize_sentence_is_split_at_clauses_then_words():
+    clauses = "alpha beta gamma, delta epsilon zeta, eta theta iota."
+    chunked = chunk_text(clauses, count_words, max_tokens=3)
+    assert chunked.chunks == ["alpha beta gamma,", "delta epsilon zeta,", "eta theta iota."]
+
+    words = " ".join(f"w{i}" for i in range(7))
+    chunked = chunk_text(words, count_words, max_tokens=3)
+    assert chunked.chunks == ["w0 w1 w2", "w3 w4 w5", "w6"]
+    assert all(count_words(chunk) <= 3 for chunk in chunked.chunks)
@@ -0,0 +1,59 @@
+# -*- coding: utf-8 -*-
+
+"""translation_cache のテスト"""
+
+import asyncio
+
+from translation_cache import TranslationCache, normalize_text
+
+
+def test_least_recently_used_entry_is_evicted():
+    cache = TranslationCache(max_entries=2)
+    cache.put("a", "A")
+    cache.put("b", "B")
+    # a を使うと、最も長く使われていないのは b になる
+    assert cache.get("a") == "A"
+    cache.put("c", "C")
+    assert cache.get("b") is None
+    assert cache.get("a") == "A"
+    assert cache.get("c") == "C"
+    stats = cache.stats()
+    assert stats["entries"] == 2
+    assert stats["evictions"] == 1
+    assert stats["hits"] == 3
+    assert stats["misses"] == 1
+
+
+def test_zero_size_disables_cache():
+    cache = TranslationCache(max_entries=0)
+    cache.put("a", "A")
+    assert cache.get("a") is None
+
+
+def test_key_normalizes_whitespace_but_keeps_newlines():
+    assert normalize_text("  Hello   world \n  next\tline ") == "Hello world\nnext line"
+    settings = {"num_beams": 5, "max_new_tokens": 20}
+    key = TranslationCache.make_key("Hello  world", "en", "ja", settings)
+    reordered = {"max_new_tokens": 20, "num_beams": 5}
+    assert key == TranslationCache.make_key(" Hello world ", "en", "ja", reordered)
+    assert key != TranslationCache.make_key("Hello\nworld", "en", "ja", settings)
+
+
+def test_concurrent_computations_are_coalesced():
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "翻訳結果"
+
+    async def main():
+        cache = TranslationCache()
+        results = await asyncio.gather(*(cache.get_or_compute("key", compute) for _ in range(3)))
+        return cache, results
+
+    cache, results = asyncio.run(main())
+    assert results == ["翻訳結果"] * 3
+    assert len(calls) == 1
+    assert cache.stats()["coalesced"] == 2
+    assert cache.get("key") == "翻訳結果"
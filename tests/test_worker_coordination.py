@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+
+"""worker_coordination のテスト"""
+
+import threading
+import time
+
+import pytest
+
+import worker_coordination as worker_coordination_module
+from worker_coordination import WorkerCoordinator, JOB_PENDING, JOB_DONE, JOB_FAILED
+
+
+class FakeClock:
+    """テスト用の time.time"""
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class CancelRecorder:
+    """on_cancel に渡すコールバック（呼び出されたリクエストIDを記録する）"""
+
+    def __init__(self):
+        self.request_ids = []
+        self.event = threading.Event()
+
+    def __call__(self, request_id):
+        self.request_ids.append(request_id)
+        self.event.set()
+        return True
+
+
+@pytest.fixture
+def coordinators(tmp_path):
+    """同じデータベースを共有する2つのワーカーの WorkerCoordinator"""
+    db_path = str(tmp_path / "worker_state.sqlite3")
+    first = WorkerCoordinator(db_path, ttl_sec=60, stale_sec=600, poll_interval=0.01)
+    second = WorkerCoordinator(db_path, ttl_sec=60, stale_sec=600, poll_interval=0.01)
+    # 同じプロセスで動かすため、別のワーカーとして扱われるようにIDを変える
+    second.worker_id = first.worker_id + 1
+    first_cancels, second_cancels = CancelRecorder(), CancelRecorder()
+    first.open(first_cancels)
+    second.open(second_cancels)
+    try:
+        yield first, second, first_cancels, second_cancels
+    finally:
+        first.close()
+        second.close()
+
+
+def test_only_one_worker_claims_the_same_key(coordinators):
+    first, second, _, _ = coordinators
+    claimed = first.claim_job(("text", "settings"), "job-1")
+    assert claimed["job_id"] == "job-1"
+    assert claimed["worker"] == first.worker_id
+
+    shared = second.claim_job(("text", "settings"), "job-2")
+    assert shared["job_id"] == "job-1"
+    assert shared["worker"] == first.worker_id
+    assert shared["status"] == JOB_PENDING
+    assert second.stats()["remote_jobs"] == 1
+
+    other = second.claim_job(("other", "settings"), "job-3")
+    assert other["job_id"] == "job-3"
+    assert other["worker"] == second.worker_id
+
+
+def test_concurrent_claims_pick_a_single_job(coordinators):
+    first, second, _, _ = coordinators
+    results = []
+    barrier = threading.Barrier(8)
+
+    def claim(coordinator, job_id):
+        barrier.wait()
+        results.append(coordinator.claim_job("key", job_id)["job_id"])
+
+    threads = [
+        threading.Thread(target=claim, args=(first if i % 2 else second, f"job-{i}"))
+        for i in range(8)
+    ]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert len(results) == 8
+    assert len(set(results)) == 1
+
+
+def test_finished_job_is_visible_to_other_workers_until_ttl(coordinators, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(worker_coordination_module.time, "time", clock)
+    first, second, _, _ = coordinators
+
+    first.claim_job("key", "job-1")
+    first.finish_job("job-1", JOB_DONE, {"result": "翻訳結果"})
+    job = second.get_job("job-1")
+    assert job["status"] == JOB_DONE
+    assert job["content"] == {"result": "翻訳結果"}
+    assert second.claim_job("key", "job-2")["job_id"] == "job-1"
+
+    clock.now += 61
+    assert second.get_job("job-1") is None
+    renewed = second.claim_job("key", "job-3")
+    assert renewed["job_id"] == "job-3"
+    assert renewed["worker"] == second.worker_id
+
+
+def test_failed_job_is_not_shared(coordinators):
+    first, second, _, _ = coordinators
+    first.claim_job("key", "job-1")
+    first.finish_job("job-1", JOB_FAILED, {"error": "失敗"})
+    assert second.get_job("job-1")["status"] == JOB_FAILED
+    retried = second.claim_job("key", "job-2")
+    assert retried["job_id"] == "job-2"
+    assert retried["worker"] == second.worker_id
+
+
+def test_stale_pending_job_is_claimed_again(coordinators, monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(worker_coordination_module.time, "time", clock)
+    first, second, _, _ = coordinators
+
+    first.claim_job("key", "job-1")
+    clock.now += 599
+    assert second.claim_job("key", "job-2")["job_id"] == "job-1"
+
+    # 実行中のまま更新されないジョブ（ワーカーの異常終了など）は無効とみなす
+    clock.now += 2
+    assert second.get_job("job-1") is None
+    assert second.claim_job("key", "job-3")["job_id"] == "job-3"
+
+
+def test_cancel_reaches_other_workers_but_not_the_sender(coordinators):
+    first, second, first_cancels, second_cancels = coordinators
+    first.publish_cancel("request-1")
+    assert second_cancels.event.wait(2.0)
+    assert second_cancels.request_ids == ["request-1"]
+
+    # 送信したワーカーの確認がひと回りする時間を待ってから、自分には届かないことを確かめる
+    time.sleep(0.1)
+    assert first_cancels.request_ids == []
+    assert first.stats()["cancels_sent"] == 1
+    assert second.stats()["cancels_received"] == 1
+
+
+def test_cancels_published_before_open_are_ignored(tmp_path):
+    db_path = str(tmp_path / "worker_state.sqlite3")
+    sender = WorkerCoordinator(db_path, poll_interval=0.01)
+    sender.open(CancelRecorder())
+    sender.publish_cancel("old-request")
+
+    late = WorkerCoordinator(db_path, poll_interval=0.01)
+    late.worker_id = sender.worker_id + 1
+    late_cancels = CancelRecorder()
+    late.open(late_cancels)
+    try:
+        sender.publish_cancel("new-request")
+        assert late_cancels.event.wait(2.0)
+        time.sleep(0.05)
+        assert late_cancels.request_ids == ["new-request"]
+    finally:
+        sender.close()
+        late.close()
@@ -41,6 +41,7 @@ sys.path.append(parent_dir)
 
 # 翻訳クライアントをインポート
 from server_client.translate_client import TranslateClient
+from server_client.resource_governor import load_resource_settings, plan_resources, apply_ocr_limits
 
 # カスタムイベント定義
 class QCaptureEvent(QEvent):
@@ -342,6 +343,11 @@ class TranslatorWindow(QMainWindow):
         
         # 設定の読み込み
         self.config = self.load_config()
+
+        # OCR（Tesseract、OpenCV）のスレッド数とコアを翻訳サーバーと分ける
+        resource_settings = load_resource_settings(self.config)
+        if resource_settings is not None:
+            apply_ocr_limits(plan_resources(resource_settings)["ocr"])
         
         # 翻訳ログの読み込み
         self.translation_logs = self.load_translation_logs()
@@ -354,6 +360,9 @@ class TranslatorWindow(QMainWindow):
         # サーバー監視スレッドの初期化
         self.server_monitor_thread = None
         
+        # 実行中の翻訳スレッド
+        self.translation_threads = set()
+        
         # ハイライト状態の初期化
         self.is_highlighted = False
         
@@ -768,18 +777,14 @@ class TranslatorWindow(QMainWindow):
             ocr_langs = self.config["ocr"]["languages"] if self.config and "ocr" in self.config and "languages" in self.config["ocr"] else 'eng+jpn'
             ocr_text = pytesseract.image_to_string(processed_img, lang=ocr_langs, config=ocr_config).strip()
             
-            # 翻訳実行
-            translated_text = self.translate_client.translate(ocr_text)
-            
-            # 翻訳ログに追加
+            # 翻訳ログに追加（翻訳結果は翻訳スレッドから逐次反映する）
             timestamp = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
             log_entry = {
                 "timestamp": timestamp,
                 "ocr_text": ocr_text,
-                "translated_text": translated_text
+                "translated_text": ""
             }
             self.translation_logs.append(log_entry)
-            self.save_translation_logs()
             
             # 最新の翻訳を表示
             self.current_log_index = len(self.translation_logs) - 1
@@ -788,12 +793,97 @@ class TranslatorWindow(QMainWindow):
             # ナビゲーションボタンの状態を更新
             self.update_log_navigation()
             
-            self.status_bar.showMessage("処理完了", 3000)
+            # 翻訳をバックグラウンドで実行
+            self.status_bar.showMessage("翻訳中...")
+            self.start_translation(log_entry)
             
         except Exception as e:
             print(f"画像処理中にエラーが発生しました: {e}")
             self.status_bar.showMessage(f"エラー: {str(e)}", 5000)
             
+    def start_translation(self, log_entry):
+        """翻訳スレッドを開始し、翻訳結果を翻訳ログに逐次反映する"""
+        translation_config = self.config.get("translation", {})
+        if translation_config.get("cascade", False):
+            # 速報を表示した後、ビームサーチの翻訳結果に差し替える
+            thread = TranslationCascadeThread(self.translate_client, log_entry)
+            thread.translation_refined.connect(self.on_translation_refined)
+        else:
+            thread = TranslationStreamThread(
+                self.translate_client, log_entry, translation_config.get("streaming", False)
+            )
+        thread.partial_translation.connect(self.on_partial_translation)
+        thread.translation_finished.connect(self.on_translation_finished)
+        thread.finished.connect(lambda: self.translation_threads.discard(thread))
+        self.translation_threads.add(thread)
+        thread.start()
+        
+    def stop_translation_threads(self, timeout_ms=3000):
+        """
+        実行中の翻訳をサーバー側でキャンセルし、翻訳スレッドが終了するまで待つ
+
+        ウィンドウを閉じる前に呼び出します。翻訳結果のシグナルは先に切断し、
+        破棄中のウィンドウに翻訳結果が届かないようにします。
+
+        Args:
+            timeout_ms (int, optional): キャンセル後に翻訳スレッドの終了を待つ最大時間（ミリ秒）。デフォルトは3000
+        """
+        threads = [thread for thread in self.translation_threads if thread.isRunning()]
+        if not threads:
+            return
+        for thread in threads:
+            for name in ("partial_translation", "translation_refined", "translation_finished"):
+                signal_ = getattr(thread, name, None)
+                if signal_ is None:
+                    continue
+                try:
+                    signal_.disconnect()
+                except TypeError:
+                    # 接続されているスロットがない場合
+                    pass
+        self.translate_client.cancel_active()
+        for thread in threads:
+            if not thread.wait(timeout_ms):
+                print("翻訳スレッドが終了しないため、強制終了します")
+                thread.terminate()
+                thread.wait()
+
+    def on_partial_translation(self, log_entry, translated_text):
+        """翻訳途中の結果を受け取ったときの処理（翻訳スレッドからのシグナルで呼ばれる）"""
+        log_entry["translated_text"] = translated_text
+        if self.is_current_log(log_entry):
+            self.show_current_translation()
+        
+    def on_translation_finished(self, log_entry, translated_text):
+        """翻訳が完了したときの処理（翻訳スレッドからのシグナルで呼ばれる）"""
+        log_entry["translated_text"] = translated_text
+        # 翻訳中に履歴がクリアされた場合は保存しない
+        if not any(log is log_entry for log in self.translation_logs):
+            return
+        self.save_translation_logs()
+        if self.is_current_log(log_entry):
+            self.show_current_translation()
+        self.status_bar.showMessage("処理完了", 3000)
+        
+    def on_translation_refined(self, log_entry, refined_text):
+        """速報の翻訳結果を改善した翻訳結果に差し替える（翻訳スレッドからのシグナルで呼ばれる）"""
+        if self.is_superseded(log_entry):
+            # 新しいキャプチャの翻訳が始まっている場合は差し替えず、速報の翻訳結果を残す
+            print("新しいキャプチャがあるため、改善した翻訳結果を破棄しました")
+            if any(log is log_entry for log in self.translation_logs):
+                self.save_translation_logs()
+            return
+        self.on_translation_finished(log_entry, refined_text)
+        
+    def is_superseded(self, log_entry):
+        """翻訳ログより新しいキャプチャの翻訳ログがあるかどうかを返す"""
+        return bool(self.translation_logs) and self.translation_logs[-1] is not log_entry
+        
+    def is_current_log(self, log_entry):
+        """翻訳ログが現在表示されているものかどうかを返す"""
+        return (0 <= self.current_log_index < len(self.translation_logs)
+                and self.translation_logs[self.current_log_index] is log_entry)
+        
     def preprocess_image(self, image):
         """画像の前処理を行う"""
         # PILイメージをOpenCV形式に変換
@@ -894,6 +984,9 @@ class TranslatorWindow(QMainWindow):
             self.server_monitor_thread.stop()
             self.server_monitor_thread.wait()
         
+        # 実行中の翻訳を止める（サーバーを終了する前に、翻訳スレッドが終了したことを確認する）
+        self.stop_translation_threads()
+        
         # サーバープロセスを終了
         self.terminate_server_process()
         
@@ -1313,6 +1406,69 @@ class TranslatorWindow(QMainWindow):
             print(f"設定ファイルの保存中にエラーが発生しました: {e}")
 
 
+class TranslationStreamThread(QThread):
+    """翻訳サーバーから翻訳結果を逐次受け取るスレッド"""
+    # シグナル定義
+    partial_translation = pyqtSignal(object, str)  # 翻訳途中の結果を受け取ったときに発火（翻訳ログ, それまでの翻訳結果）
+    translation_finished = pyqtSignal(object, str)  # 翻訳が完了したときに発火（翻訳ログ, 翻訳結果）
+    
+    def __init__(self, translate_client, log_entry, streaming=False):
+        super().__init__()
+        self.translate_client = translate_client
+        self.log_entry = log_entry
+        self.streaming = streaming
+    
+    def run(self):
+        text = self.log_entry.get("ocr_text", "")
+        translated_text = ""
+        try:
+            if self.streaming:
+                for translated_text in self.translate_client.translate_stream(text):
+                    self.partial_translation.emit(self.log_entry, translated_text)
+            else:
+                translated_text = self.translate_client.translate(text)
+        except Exception as e:
+            print(f"翻訳中にエラーが発生しました: {e}")
+            translated_text = f"翻訳中にエラーが発生しました: {e}"
+        self.translation_finished.emit(self.log_entry, translated_text)
+
+
+class TranslationCascadeThread(QThread):
+    """翻訳サーバーから速報の翻訳結果を受け取り、続けて改善した翻訳結果を受け取るスレッド"""
+    # シグナル定義
+    partial_translation = pyqtSignal(object, str)  # 速報の翻訳結果を受け取ったときに発火（翻訳ログ, 速報の翻訳結果）
+    translation_refined = pyqtSignal(object, str)  # 速報の後に改善した翻訳結果を受け取ったときに発火（翻訳ログ, 翻訳結果）
+    translation_finished = pyqtSignal(object, str)  # 速報なしで翻訳が完了したときに発火（翻訳ログ, 翻訳結果）
+    
+    def __init__(self, translate_client, log_entry):
+        super().__init__()
+        self.translate_client = translate_client
+        self.log_entry = log_entry
+    
+    def run(self):
+        text = self.log_entry.get("ocr_text", "")
+        draft_text = None
+        try:
+            for stage, translated_text in self.translate_client.translate_cascade(text):
+                if stage == "draft":
+                    draft_text = translated_text
+                    self.partial_translation.emit(self.log_entry, translated_text)
+                elif draft_text is not None:
+                    self.translation_refined.emit(self.log_entry, translated_text)
+                    return
+                else:
+                    self.translation_finished.emit(self.log_entry, translated_text)
+                    return
+        except Exception as e:
+            print(f"翻訳中にエラーが発生しました: {e}")
+            if draft_text is None:
+                self.translation_finished.emit(self.log_entry, f"翻訳中にエラーが発生しました: {e}")
+                return
+        # 改善した翻訳結果が届かなかった場合（新しいキャプチャによるキャンセルなど）は速報を翻訳結果とする
+        if draft_text is not None:
+            self.translation_finished.emit(self.log_entry, draft_text)
+
+
 class ServerMonitorThread(QThread):
     # シグナル定義
     server_status_changed = pyqtSignal(str)  # サーバーステータスが変わったときに発火
@@ -1325,33 +1481,54 @@ class ServerMonitorThread(QThread):
         self.server_is_ready = False
     
     def run(self):
-        retry_count = 0
-        max_retries = 60  # 最大リトライ回数
-        retry_interval = 2  # リトライ間隔（秒）
+        connect_timeout = 120  # サーバーがポートを開くまで待つ最大時間（秒）
+        poll_interval = 0.5  # 準備状態の確認間隔（秒）
+        started_at = time.time()
         
-        while self.running and retry_count < max_retries:
+        while self.running:
             # サーバープロセスがある場合、終了していないか確認
             if self.server_process and self.server_process.poll() is not None:
                 self.server_status_changed.emit("サーバーが予期せず終了しました")
                 return
             
-            # サーバーの応答を確認
+            # サーバーの準備状態を確認（準備中は503で状態が返される）
             try:
-                response = requests.get("http://127.0.0.1:11451/docs", timeout=5)
-                if response.status_code == 200:
-                    self.server_is_ready = True
-                    self.server_status_changed.emit("翻訳サーバー準備完了")
-                    self.server_ready.emit()
+                response = requests.get("http://127.0.0.1:11451/health", timeout=5)
+                health = response.json()
+            except (requests.RequestException, ValueError):
+                # サーバーがまだポートを開いていない
+                elapsed = int(time.time() - started_at)
+                if elapsed >= connect_timeout:
                     break
-            except requests.RequestException:
-                retry_count += 1
-                self.server_status_changed.emit(f"サーバー起動待機中... ({retry_count}/{max_retries})")
+                self.server_status_changed.emit(f"サーバー起動待機中... ({elapsed}秒)")
+                time.sleep(poll_interval)
+                continue
             
-            time.sleep(retry_interval)
+            status = health.get("status")
+            if status == "ready":
+                self.server_is_ready = True
+                self.server_status_changed.emit(f"翻訳サーバー準備完了（{health.get('ready_after_sec')}秒）")
+                self.server_ready.emit()
+                break
+            if status == "failed":
+                self.server_status_changed.emit(f"翻訳モデルの読み込みに失敗しました: {health.get('error')}")
+                return
+            self.server_status_changed.emit(self.describe_progress(health))
+            time.sleep(poll_interval)
         
         if not self.server_is_ready and self.running:
             self.server_status_changed.emit("サーバー接続タイムアウト。翻訳機能が使用できない可能性があります。")
     
+    @staticmethod
+    def describe_progress(health):
+        """/health の応答から起動処理の進行状況を表すメッセージを作成する"""
+        elapsed = health.get("stage_elapsed_sec") or 0
+        if health.get("status") == "warming":
+            return f"翻訳モデルをウォームアップ中... ({elapsed:.0f}秒)"
+        if health.get("stage") == "engine_init":
+            return f"翻訳エンジンを準備中... ({elapsed:.0f}秒)"
+        return f"翻訳モデルを読み込み中... ({elapsed:.0f}秒)"
+    
     def stop(self):
         self.running = False
 
@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+アドミッション制御モジュール
+
+このモジュールは、翻訳サーバーが同時に受け付けるリクエスト数を制限し、
+上限を超えたリクエストをすぐに拒否するアドミッション制御を実装します。
+バースト的にリクエストが届いても、受け付けたリクエストの待ち時間が際限なく伸びないようにします。
+
+主な機能:
+- 優先度レーン（interactive / bulk）ごとの受け付け中リクエスト数の管理
+- 上限を超えたリクエストの即時拒否と、再試行までの目安時間（Retry-After）の見積もり
+- bulk レーンの上限を低くして、interactive レーンの受け付け枠を常に残す
+- レーンごとの受け付け数・拒否数・所要時間の統計情報
+"""
+
+import math
+import threading
+import time
+
+# 優先度レーン（先にあるものほど優先度が高い）
+LANE_INTERACTIVE = "interactive"  # ホットキーでのキャプチャなど、ユーザーが結果を待っている翻訳
+LANE_BULK = "bulk"  # 翻訳履歴の再翻訳や継続的な監視など、バックグラウンドの翻訳
+PRIORITY_LANES = (LANE_INTERACTIVE, LANE_BULK)
+
+
+def lane_priority(lane):
+    """
+    優先度レーンの優先度を取得します。
+
+    Args:
+        lane (str): 優先度レーン
+
+    Returns:
+        int: 優先度（小さいほど優先される）
+    """
+    return PRIORITY_LANES.index(lane)
+
+
+class AdmissionRejectedError(Exception):
+    """
+    受け付け中のリクエストが上限に達しているときに送出される例外
+
+    Attributes:
+        retry_after (int): 再試行までの目安時間（秒）
+    """
+
+    def __init__(self, message, retry_after):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    優先度レーン付きのアドミッション制御
+
+    受け付けてから応答するまでのリクエストの数を max_depth 件までに制限します。
+    bulk レーンは max_depth * bulk_share 件までに制限されるため、bulk のリクエストが
+    大量に届いても interactive のリクエストを受け付ける枠が残ります。
+
+    Attributes:
+        max_depth (int): 全レーン合計で受け付けるリクエストの最大数
+        lane_limits (dict): レーンごとの受け付けるリクエストの最大数
+        concurrency (int): 同時に実行できる推論の数（Retry-After の見積もりに使用）
+    """
+
+    def __init__(self, max_depth=32, bulk_share=0.5, concurrency=1, ema_alpha=0.2):
+        """
+        AdmissionController クラスの初期化
+
+        Args:
+            max_depth (int, optional): 全レーン合計で受け付けるリクエストの最大数。デフォルトは32
+            bulk_share (float, optional): bulk レーンが使える受け付け枠の割合。デフォルトは0.5
+            concurrency (int, optional): 同時に実行できる推論の数。デフォルトは1
+            ema_alpha (float, optional): 所要時間の指数移動平均の係数。デフォルトは0.2
+        """
+        self.max_depth = max(1, int(max_depth))
+        bulk_limit = max(1, math.floor(self.max_depth * min(1.0, max(0.0, float(bulk_share)))))
+        self.lane_limits = {LANE_INTERACTIVE: self.max_depth, LANE_BULK: bulk_limit}
+        self.concurrency = max(1, int(concurrency))
+        self.ema_alpha = min(1.0, max(0.01, float(ema_alpha)))
+
+        self._lock = threading.Lock()
+        self._depth = {lane: 0 for lane in PRIORITY_LANES}
+        self._max_depth_seen = {lane: 0 for lane in PRIORITY_LANES}
+        self._admitted = {lane: 0 for lane in PRIORITY_LANES}
+        self._rejected = {lane: 0 for lane in PRIORITY_LANES}
+        self._total_latency = {lane: 0.0 for lane in PRIORITY_LANES}
+        self._completed = {lane: 0 for lane in PRIORITY_LANES}
+        self._latency_ema = None
+
+    @staticmethod
+    def resolve_lane(lane, default=LANE_INTERACTIVE):
+        """
+        リクエストで指定された優先度レーンを確認します。
+
+        Args:
+            lane (str): 指定された優先度レーン（Noneの場合は default）
+            default (str, optional): 指定がない場合の優先度レーン
+
+        Returns:
+            str: 優先度レーン
+
+        Raises:
+            ValueError: 不明な優先度レーンが指定された場合
+        """
+        if lane is None:
+            return default
+        if lane not in PRIORITY_LANES:
+            raise ValueError(f"不明な優先度の指定です: {lane}（{', '.join(PRIORITY_LANES)} のいずれかを指定してください）")
+        return lane
+
+    def retry_after(self):
+        """
+        再試行までの目安時間を見積もります。
+
+        受け付け中のリクエストがすべて処理されるまでの時間を、1リクエストあたりの
+        所要時間の移動平均と同時実行数から見積もります。
+
+        Returns:
+            int: 再試行までの目安時間（秒、1〜30）
+        """
+        with self._lock:
+            depth = sum(self._depth.values())
+            latency = self._latency_ema
+        if latency is None:
+            return 1
+        return int(min(30, max(1, math.ceil(latency * depth / self.concurrency))))
+
+    def acquire(self, lane):
+        """
+        リクエストを受け付けます。処理が終わったら release() を呼び出してください。
+
+        Args:
+            lane (str): 優先度レーン
+
+        Returns:
+            tuple: release() に渡す受け付け情報
+
+        Raises:
+            AdmissionRejectedError: 受け付け中のリクエストが上限に達している場合
+        """
+        with self._lock:
+            total = sum(self._depth.values())
+            if total >= self.max_depth or self._depth[lane] >= self.lane_limits[lane]:
+                self._rejected[lane] += 1
+                rejected = True
+            else:
+                self._depth[lane] += 1
+                self._max_depth_seen[lane] = max(self._max_depth_seen[lane], self._depth[lane])
+                self._admitted[lane] += 1
+                rejected = False
+        if rejected:
+            raise AdmissionRejectedError(
+                "翻訳サーバーが混雑しています。しばらくしてから再試行してください。",
+                self.retry_after()
+            )
+        return (lane, time.perf_counter())
+
+    def release(self, ticket):
+        """
+        受け付けたリクエストの処理の終了を記録します。
+
+        Args:
+            ticket (tuple): acquire() が返した受け付け情報
+        """
+        lane, admitted_at = ticket
+        elapsed = time.perf_counter() - admitted_at
+        with self._lock:
+            self._depth[lane] -= 1
+            self._completed[lane] += 1
+            self._total_latency[lane] += elapsed
+            if self._latency_ema is None:
+                self._latency_ema = elapsed
+            else:
+                self._latency_ema += self.ema_alpha * (elapsed - self._latency_ema)
+
+    def stats(self):
+        """
+        アドミッション制御の統計情報を取得します。
+
+        Returns:
+            dict: レーンごとの受け付け中の数、受け付け・拒否の件数、平均所要時間などを含む辞書
+        """
+        with self._lock:
+            lanes = {}
+            for lane in PRIORITY_LANES:
+                completed = self._completed[lane]
+                lanes[lane] = {
+                    "limit": self.lane_limits[lane],
+                    "depth": self._depth[lane],
+                    "max_depth_seen": self._max_depth_seen[lane],
+                    "admitted": self._admitted[lane],
+                    "rejected": self._rejected[lane],
+                    "avg_latency_ms": (
+                        round(self._total_latency[lane] / completed * 1000.0, 3)
+                        if completed else 0.0
+                    ),
+                }
+            return {
+                "max_depth": self.max_depth,
+                "depth": sum(self._depth.values()),
+                "lanes": lanes,
+            }
@@ -0,0 +1,244 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+支援付き生成モジュール
+
+このモジュールは、小さなドラフトモデルが提案したトークンを翻訳モデルがまとめて検証する
+支援付き生成（assisted generation、投機的デコード）の機能を提供します。
+ドラフトモデルの提案が翻訳モデルの予測と一致した分だけ、翻訳モデルのデコーダを逐次実行する
+回数が減るため、同じ翻訳結果をより短い時間で生成できます。
+貪欲法の結果は支援なしの場合と同じになります。
+
+主な機能:
+- モデルディレクトリにあるドラフトモデルの読み込みと、語彙の互換性の確認
+- 支援付き生成を使用する条件の判定（1件ずつの貪欲法のみ）
+- ドラフトモデルの提案の採用率と、翻訳モデルの1ステップあたりの生成トークン数の集計
+- 支援の有無による所要時間の比較
+"""
+
+import json
+import os
+import threading
+import time
+
+from timing import measure_ms
+
+# ドラフトモデルのディレクトリ名（翻訳モデルのディレクトリと同じ場所に置く）
+DRAFT_MODEL_DIR_NAME = "draft"
+
+
+def default_draft_model_dir(model_dir):
+    """
+    ドラフトモデルの既定のディレクトリを返します。
+
+    Args:
+        model_dir (str): 翻訳モデルのディレクトリのパス
+
+    Returns:
+        str: ドラフトモデルのディレクトリのパス（翻訳モデルのディレクトリの隣）
+    """
+    return os.path.join(os.path.dirname(os.path.normpath(model_dir)), DRAFT_MODEL_DIR_NAME)
+
+
+def check_draft_compatibility(draft_dir, draft_config, model_config, tokenizer):
+    """
+    ドラフトモデルが翻訳モデルと同じ語彙と特殊トークンを使用しているかどうかを確認します。
+
+    Args:
+        draft_dir (str): ドラフトモデルのディレクトリ
+        draft_config: ドラフトモデルの設定
+        model_config: 翻訳モデルの設定
+        tokenizer: 翻訳モデルのトークナイザー
+
+    Returns:
+        str: 互換性がない理由。互換性がある場合はNone
+    """
+    if draft_config.vocab_size != model_config.vocab_size:
+        return f"語彙のサイズが異なります（{draft_config.vocab_size} と {model_config.vocab_size}）"
+    for name in ("pad_token_id", "eos_token_id", "decoder_start_token_id"):
+        if getattr(draft_config, name, None) != getattr(model_config, name, None):
+            return f"{name} が異なります"
+    # 語彙のファイルがある場合は、トークンとIDの対応がすべて同じかどうかを確認する
+    vocab_file = os.path.join(draft_dir, "vocab.json")
+    encoder = getattr(tokenizer, "encoder", None)
+    if os.path.exists(vocab_file) and encoder is not None:
+        with open(vocab_file, "r", encoding="utf-8") as f:
+            if json.load(f) != encoder:
+                return "語彙のトークンとIDの対応が異なります"
+    return None
+
+
+def load_draft_model(draft_dir, model, tokenizer, device=None):
+    """
+    ドラフトモデルを読み込みます。
+
+    Args:
+        draft_dir (str): ドラフトモデルのディレクトリ
+        model: 翻訳モデル
+        tokenizer: 翻訳モデルのトークナイザー
+        device (torch.device, optional): 推論に使用するデバイス
+
+    Returns:
+        ドラフトモデル。ディレクトリにモデルがない場合や、翻訳モデルと互換性がない場合はNone
+    """
+    if not os.path.exists(os.path.join(draft_dir, "config.json")):
+        print(f"ドラフトモデルが見つからないため、支援付き生成を無効にします: {draft_dir}")
+        return None
+    try:
+        from transformers import AutoConfig, AutoModelForSeq2SeqLM
+
+        draft_config = AutoConfig.from_pretrained(draft_dir)
+        reason = check_draft_compatibility(draft_dir, draft_config, model.config, tokenizer)
+        if reason is not None:
+            print(f"ドラフトモデルが翻訳モデルと互換性がないため、支援付き生成を無効にします: {reason}")
+            return None
+        draft_model = AutoModelForSeq2SeqLM.from_pretrained(draft_dir)
+        if device is not None:
+            draft_model.to(device)
+        draft_model.eval()
+    except Exception as e:
+        print(f"ドラフトモデルの読み込みに失敗したため、支援付き生成を無効にします: {e}")
+        return None
+    parameters = sum(p.numel() for p in draft_model.parameters()) / 1e6
+    print(f"ドラフトモデルを読み込みました（{parameters:.0f}Mパラメータ）: {draft_dir}")
+    return draft_model
+
+
+class AssistedDecoding:
+    """
+    ドラフトモデルによる支援付き生成の設定と集計を行うクラス
+
+    翻訳モデルとドラフトモデルの forward の呼び出し回数をフックで数え、生成ごとに
+    ドラフトモデルの提案の採用数を推定します。翻訳モデルの1回の検証で、採用された提案と
+    翻訳モデル自身の1トークンが確定するため、採用数は「生成トークン数 - 翻訳モデルの呼び出し回数」です。
+
+    Attributes:
+        draft_model: ドラフトモデル
+        enabled (bool): 支援付き生成を使用するかどうか
+    """
+
+    def __init__(self, model, draft_model, num_assistant_tokens=0):
+        """
+        AssistedDecoding クラスの初期化
+
+        Args:
+            model: 翻訳モデル
+            draft_model: ドラフトモデル
+            num_assistant_tokens (int, optional): 1回に提案させるトークン数。0の場合は transformers の既定値
+        """
+        self.draft_model = draft_model
+        self.enabled = True
+        if num_assistant_tokens > 0:
+            draft_model.generation_config.num_assistant_tokens = int(num_assistant_tokens)
+        # 呼び出し回数は推論スレッドごとに数える
+        self._calls = threading.local()
+        model.register_forward_hook(lambda *_: self._count("target"))
+        draft_model.register_forward_hook(lambda *_: self._count("draft"))
+        self._lock = threading.Lock()
+        self._generations = 0
+        self._generated_tokens = 0
+        self._target_steps = 0
+        self._draft_tokens = 0
+        self._accepted_tokens = 0
+        self._seconds = 0.0
+
+    def _count(self, name):
+        """このスレッドの forward の呼び出し回数を数える"""
+        setattr(self._calls, name, getattr(self._calls, name, 0) + 1)
+
+    def applies(self, batch_size, generation_settings):
+        """
+        支援付き生成を使用できるかどうかを判定します。
+
+        transformers の支援付き生成は1件ずつの貪欲法（またはサンプリング）にのみ対応しています。
+
+        Args:
+            batch_size (int): バッチサイズ
+            generation_settings (dict): 生成設定
+
+        Returns:
+            bool: 使用できる場合はTrue
+        """
+        return self.enabled and batch_size == 1 and generation_settings.get("num_beams", 1) == 1
+
+    def begin(self):
+        """このスレッドの呼び出し回数を0に戻し、計測を始める"""
+        self._calls.target = 0
+        self._calls.draft = 0
+        self._calls.started_at = time.perf_counter()
+
+    def end(self, generated_tokens):
+        """
+        計測を終え、1回の生成の結果を集計します。
+
+        Args:
+            generated_tokens (int): 生成されたトークン数（デコーダの開始トークンを除く）
+        """
+        elapsed = time.perf_counter() - self._calls.started_at
+        target_steps = self._calls.target
+        draft_tokens = self._calls.draft
+        accepted = min(draft_tokens, max(0, generated_tokens - target_steps))
+        with self._lock:
+            self._generations += 1
+            self._generated_tokens += generated_tokens
+            self._target_steps += target_steps
+            self._draft_tokens += draft_tokens
+            self._accepted_tokens += accepted
+            self._seconds += elapsed
+
+    def stats(self):
+        """
+        支援付き生成の統計情報を取得します。
+
+        Returns:
+            dict: 生成回数、生成トークン数、翻訳モデルの呼び出し回数、提案・採用されたトークン数、
+                採用率、翻訳モデルの1ステップあたりの生成トークン数
+        """
+        with self._lock:
+            return {
+                "generations": self._generations,
+                "generated_tokens": self._generated_tokens,
+                "target_steps": self._target_steps,
+                "draft_tokens": self._draft_tokens,
+                "accepted_tokens": self._accepted_tokens,
+                "acceptance_rate": (
+                    round(self._accepted_tokens / self._draft_tokens, 3)
+                    if self._draft_tokens else None
+                ),
+                "tokens_per_target_step": (
+                    round(self._generated_tokens / self._target_steps, 3)
+                    if self._target_steps else None
+                ),
+                "tokens_per_sec": (
+                    round(self._generated_tokens / self._seconds, 1) if self._seconds > 0 else None
+                ),
+            }
+
+    def benchmark(self, run_samples, rounds=1):
+        """
+        支援の有無でサンプル文の翻訳の所要時間を比較します。
+
+        Args:
+            run_samples (callable): サンプル文を1件ずつ貪欲法で翻訳する関数
+            rounds (int, optional): 計測の繰り返し回数。デフォルトは1
+
+        Returns:
+            dict: 支援なし・支援付きの所要時間（ミリ秒）と速度の比
+        """
+        rounds = max(1, int(rounds))
+        enabled = self.enabled
+        try:
+            self.enabled = False
+            run_samples()
+            baseline_ms = round(measure_ms(run_samples, rounds), 1)
+            self.enabled = True
+            run_samples()
+            assisted_ms = round(measure_ms(run_samples, rounds), 1)
+        finally:
+            self.enabled = enabled
+        return {
+            "baseline_ms": baseline_ms,
+            "assisted_ms": assisted_ms,
+            "speedup": round(baseline_ms / assisted_ms, 2) if assisted_ms > 0 else None,
+        }
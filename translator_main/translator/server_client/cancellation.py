@@ -0,0 +1,205 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻訳キャンセルモジュール
+
+このモジュールは、実行中または実行待ちの翻訳を途中で止めるための仕組みを実装します。
+新しいキャプチャで不要になった翻訳や、クライアントが切断された翻訳の推論を止め、
+後続のリクエストが待たされないようにします。
+
+主な機能:
+- 推論スレッドから参照できるキャンセルトークン
+- リクエストIDとキャンセルトークンの対応付け（/cancel エンドポイント用）
+- バッチにまとめられた複数リクエストのキャンセル判定
+- model.generate を次のデコードステップで止める停止条件
+"""
+
+import threading
+import uuid
+
+
+class TranslationCancelledError(Exception):
+    """翻訳がキャンセルされたときに送出される例外"""
+
+
+class CancellationToken:
+    """
+    1件の翻訳リクエストのキャンセル状態
+
+    イベントループのスレッドから cancel() され、推論スレッドから is_cancelled が参照されます。
+
+    Attributes:
+        request_id (str): リクエストID
+    """
+
+    def __init__(self, request_id):
+        """
+        CancellationToken クラスの初期化
+
+        Args:
+            request_id (str): リクエストID
+        """
+        self.request_id = request_id
+        self._event = threading.Event()
+
+    @property
+    def is_cancelled(self):
+        """キャンセルされたかどうか"""
+        return self._event.is_set()
+
+    def cancel(self):
+        """翻訳をキャンセルする"""
+        self._event.set()
+
+    def raise_if_cancelled(self):
+        """
+        キャンセルされている場合は例外を送出します。
+
+        Raises:
+            TranslationCancelledError: キャンセルされている場合
+        """
+        if self.is_cancelled:
+            raise TranslationCancelledError(f"翻訳はキャンセルされました（request_id: {self.request_id}）")
+
+
+class BatchCancellation:
+    """
+    バッチにまとめられた複数リクエストのキャンセル状態
+
+    1つのバッチは複数のリクエストの結果を同時に計算するため、すべてのリクエストが
+    キャンセルされた場合にだけキャンセルされたものとして扱います。
+    """
+
+    def __init__(self, tokens):
+        """
+        BatchCancellation クラスの初期化
+
+        Args:
+            tokens (list[CancellationToken]): バッチ内のリクエストのキャンセルトークン
+        """
+        self.tokens = list(tokens)
+        self.request_id = ",".join(token.request_id for token in self.tokens)
+
+    def add(self, token):
+        """
+        後から同じ計算を共有することになったリクエストのキャンセルトークンを追加します。
+
+        Args:
+            token (CancellationToken): 追加するキャンセルトークン
+        """
+        self.tokens.append(token)
+        self.request_id = ",".join(t.request_id for t in self.tokens)
+
+    @property
+    def is_cancelled(self):
+        """バッチ内のすべてのリクエストがキャンセルされたかどうか"""
+        return bool(self.tokens) and all(token.is_cancelled for token in self.tokens)
+
+    def raise_if_cancelled(self):
+        """
+        すべてのリクエストがキャンセルされている場合は例外を送出します。
+
+        Raises:
+            TranslationCancelledError: すべてのリクエストがキャンセルされている場合
+        """
+        if self.is_cancelled:
+            raise TranslationCancelledError("バッチ内のすべての翻訳がキャンセルされました")
+
+
+class CancellationStoppingCriteria:
+    """
+    キャンセルされたときに model.generate を止める停止条件
+
+    transformers の StoppingCriteria と同じ呼び出し方で、StoppingCriteriaList に追加して使用します。
+    各デコードステップの後に呼び出されるため、キャンセルから1ステップ以内に生成が止まります。
+    """
+
+    def __init__(self, cancel_token):
+        """
+        CancellationStoppingCriteria クラスの初期化
+
+        Args:
+            cancel_token: CancellationToken または BatchCancellation
+        """
+        self.cancel_token = cancel_token
+
+    def __call__(self, input_ids, scores, **kwargs):
+        """キャンセルされていれば True を返して生成を止める"""
+        return self.cancel_token.is_cancelled
+
+
+class CancellationRegistry:
+    """
+    リクエストIDとキャンセルトークンの対応表
+
+    同じリクエストIDで複数の翻訳（例えば分割された文）が実行中の場合は、
+    cancel() ですべてキャンセルされます。
+    """
+
+    def __init__(self):
+        """CancellationRegistry クラスの初期化"""
+        self._lock = threading.Lock()
+        self._tokens = {}
+        self._cancelled = 0
+
+    def register(self, request_id=None):
+        """
+        リクエストのキャンセルトークンを作成して登録します。
+
+        Args:
+            request_id (str, optional): クライアントが指定したリクエストID。省略した場合は自動で採番します
+
+        Returns:
+            CancellationToken: 登録したキャンセルトークン
+        """
+        token = CancellationToken(request_id or uuid.uuid4().hex)
+        with self._lock:
+            self._tokens.setdefault(token.request_id, set()).add(token)
+        return token
+
+    def unregister(self, token):
+        """
+        完了したリクエストのキャンセルトークンを登録解除します。
+
+        Args:
+            token (CancellationToken): register() で作成したキャンセルトークン
+        """
+        with self._lock:
+            tokens = self._tokens.get(token.request_id)
+            if tokens is None:
+                return
+            tokens.discard(token)
+            if not tokens:
+                del self._tokens[token.request_id]
+
+    def cancel(self, request_id):
+        """
+        リクエストIDに対応する実行中の翻訳をキャンセルします。
+
+        Args:
+            request_id (str): キャンセルするリクエストID
+
+        Returns:
+            bool: キャンセルした翻訳があった場合はTrue
+        """
+        with self._lock:
+            tokens = list(self._tokens.get(request_id, ()))
+            if tokens:
+                self._cancelled += 1
+        for token in tokens:
+            token.cancel()
+        return bool(tokens)
+
+    def stats(self):
+        """
+        キャンセルの統計情報を取得します。
+
+        Returns:
+            dict: 実行中のリクエスト数とキャンセルされたリクエスト数を含む辞書
+        """
+        with self._lock:
+            return {
+                "active_requests": len(self._tokens),
+                "cancelled": self._cancelled,
+            }
@@ -0,0 +1,309 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+コンパイル済みデコードモジュール
+
+このモジュールは、翻訳モデルのエンコーダとデコーダの1ステップを torch.compile でコンパイルし、
+CPUでの推論のオーバーヘッドを減らす機能を提供します。短い文の翻訳では、デコーダの1ステップごとの
+Pythonと演算の呼び出しのオーバーヘッドが所要時間の大半を占めるため、コンパイルによって
+演算を融合し、呼び出しの回数を減らします。
+
+主な機能:
+- エンコーダとデコーダのステップの torch.compile によるコンパイル
+- 対応しているモデルでの静的なKVキャッシュの使用
+- コンパイル結果のディスクへのキャッシュ（次回以降の起動ではコンパイルの時間を省略）
+- コンパイルや実行に失敗した場合の通常の実行への切り戻し
+- コンパイル前後の所要時間の比較
+
+単体で実行すると、固定のサンプル文でコンパイル前後の所要時間を比較します:
+    python compiled_decoding.py [--model-dir モデルディレクトリ] [--mode dynamic]
+"""
+
+import argparse
+import os
+import sys
+import time
+
+import torch
+
+from timing import measure_ms
+
+# コンパイルのモード
+# "dynamic": 入力の長さやバッチサイズが変わっても再コンパイルしないよう、可変長の形状でコンパイルする
+# "static": 静的なKVキャッシュを使用し、固定の形状でコンパイルする（対応していないモデルでは "dynamic"）
+COMPILE_MODES = ("dynamic", "static")
+
+# コンパイル結果をまとめて保存するファイル（PyTorch 2.6 以降）
+ARTIFACTS_FILE = "compile_artifacts.bin"
+
+
+def compile_cache_dir(model_dir):
+    """
+    コンパイル結果のキャッシュディレクトリのパスを返します。
+
+    コンパイル結果は PyTorch のバージョンごとに異なるため、バージョンごとにディレクトリを分けます。
+
+    Args:
+        model_dir (str): モデルディレクトリのパス
+
+    Returns:
+        str: キャッシュディレクトリのパス（モデルディレクトリの隣）
+    """
+    version = torch.__version__.replace("+", "_")
+    return os.path.join(f"{os.path.normpath(model_dir)}_compile_cache", f"torch-{version}")
+
+
+def configure_compile_cache(cache_dir):
+    """
+    TorchInductor のコンパイル結果をディスクにキャッシュするよう設定します。
+
+    環境変数で既に設定されている場合は、その設定を優先します。
+
+    Args:
+        cache_dir (str): キャッシュディレクトリのパス
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    os.environ.setdefault("TORCHINDUCTOR_CACHE_DIR", cache_dir)
+    os.environ.setdefault("TORCHINDUCTOR_FX_GRAPH_CACHE", "1")
+    os.environ.setdefault("TORCHINDUCTOR_AUTOGRAD_CACHE", "1")
+    try:
+        import torch._inductor.config as inductor_config
+        inductor_config.fx_graph_cache = True
+    except Exception:
+        pass
+
+
+def load_compile_artifacts(cache_dir):
+    """
+    保存されたコンパイル結果を読み込みます（PyTorch 2.6 以降のみ）。
+
+    Args:
+        cache_dir (str): キャッシュディレクトリのパス
+
+    Returns:
+        bool: 読み込めた場合はTrue
+    """
+    path = os.path.join(cache_dir, ARTIFACTS_FILE)
+    load = getattr(getattr(torch, "compiler", None), "load_cache_artifacts", None)
+    if load is None or not os.path.exists(path):
+        return False
+    try:
+        with open(path, "rb") as f:
+            load(f.read())
+        return True
+    except Exception as e:
+        print(f"保存されたコンパイル結果を読み込めませんでした: {e}")
+        return False
+
+
+def save_compile_artifacts(cache_dir):
+    """
+    このプロセスでのコンパイル結果を保存します（PyTorch 2.6 以降のみ）。
+
+    Args:
+        cache_dir (str): キャッシュディレクトリのパス
+
+    Returns:
+        bool: 保存できた場合はTrue
+    """
+    save = getattr(getattr(torch, "compiler", None), "save_cache_artifacts", None)
+    if save is None:
+        return False
+    try:
+        artifacts = save()
+        if not artifacts:
+            return False
+        path = os.path.join(cache_dir, ARTIFACTS_FILE)
+        with open(path + ".tmp", "wb") as f:
+            f.write(artifacts[0])
+        os.replace(path + ".tmp", path)
+        return True
+    except Exception as e:
+        print(f"コンパイル結果を保存できませんでした: {e}")
+        return False
+
+
+def supports_static_cache(model):
+    """
+    モデルが静的なKVキャッシュに対応しているかどうかを確認します。
+
+    Args:
+        model: transformers のモデル
+
+    Returns:
+        bool: 対応している場合はTrue
+    """
+    return bool(
+        getattr(model, "_supports_static_cache", False)
+        or getattr(model, "_can_compile_fullgraph", False)
+    )
+
+
+class CompiledDecoding:
+    """
+    翻訳エンジンのモデルのエンコーダとデコーダのステップをコンパイルするクラス
+
+    コンパイルは最初の推論のときに行われます。モデルの forward をインスタンスの属性として
+    コンパイルした関数に差し替えるため、revert() で元の forward に戻せます。
+
+    Attributes:
+        mode (str): コンパイルのモード（"dynamic" または "static"）
+        cache_dir (str): コンパイル結果のキャッシュディレクトリ
+    """
+
+    def __init__(self, mode="dynamic", cache_dir=None):
+        """
+        CompiledDecoding クラスの初期化
+
+        Args:
+            mode (str, optional): コンパイルのモード。デフォルトは"dynamic"
+            cache_dir (str, optional): コンパイル結果のキャッシュディレクトリ（Noneの場合はキャッシュしない）
+
+        Raises:
+            ValueError: 不明なモードが指定された場合
+        """
+        if mode not in COMPILE_MODES:
+            raise ValueError(f"不明なコンパイルのモードです: {mode}（{'、'.join(COMPILE_MODES)} のいずれかを指定してください）")
+        self.mode = mode
+        self.cache_dir = cache_dir
+        self._modules = []
+
+    def _target_modules(self, model):
+        """コンパイルするモジュール（エンコーダと、デコーダのステップを実行するモデル全体）"""
+        return [model.get_encoder(), model]
+
+    def apply(self, engine):
+        """
+        翻訳エンジンのモデルをコンパイルし、生成設定を変更します。
+
+        Args:
+            engine (TorchEngine): PyTorchの翻訳エンジン
+
+        Returns:
+            str: 実際に使用したモード（静的なKVキャッシュに対応していない場合は "dynamic"）
+
+        Raises:
+            RuntimeError: torch.compile を使用できない場合
+        """
+        if not hasattr(torch, "compile"):
+            raise RuntimeError("このバージョンの PyTorch は torch.compile に対応していません")
+        mode = self.mode
+        if mode == "static" and not supports_static_cache(engine.model):
+            print("モデルが静的なKVキャッシュに対応していないため、可変長の形状でコンパイルします")
+            mode = "dynamic"
+
+        import torch._dynamo
+
+        # コンパイルに失敗したグラフは通常の実行に切り戻す（推論のリクエストを失敗させない）
+        torch._dynamo.config.suppress_errors = True
+        for module in self._target_modules(engine.model):
+            module.forward = torch.compile(module.forward, dynamic=(mode == "dynamic"))
+            self._modules.append(module)
+        if mode == "static":
+            engine.generation_overrides = {"cache_implementation": "static"}
+        return mode
+
+    def revert(self, engine):
+        """
+        コンパイルした forward と生成設定を元に戻します。
+
+        Args:
+            engine (TorchEngine): apply() を呼び出した翻訳エンジン
+        """
+        for module in self._modules:
+            module.__dict__.pop("forward", None)
+        self._modules = []
+        engine.generation_overrides = {}
+
+    def compile_with_benchmark(self, engine, run_samples, rounds=1):
+        """
+        コンパイル前後でサンプル文の翻訳の所要時間を比較しながら、翻訳エンジンのモデルをコンパイルします。
+
+        コンパイル前の所要時間は1回通常の実行で慣らしてから計測します。コンパイル後の最初の実行には
+        コンパイルの時間が含まれるため、別に記録します。コンパイルや実行に失敗した場合は元に戻します。
+
+        Args:
+            engine (TorchEngine): PyTorchの翻訳エンジン
+            run_samples (callable): サンプル文を翻訳する関数
+            rounds (int, optional): 計測の繰り返し回数。デフォルトは1
+
+        Returns:
+            dict: モード、コンパイルの所要時間、コンパイル前後の所要時間、有効かどうかを含む計測結果
+        """
+        rounds = max(1, int(rounds))
+        report = {"mode": self.mode, "enabled": False}
+        run_samples()
+        report["eager_ms"] = round(measure_ms(run_samples, rounds), 1)
+
+        if self.cache_dir:
+            configure_compile_cache(self.cache_dir)
+            report["cached_artifacts"] = load_compile_artifacts(self.cache_dir)
+        try:
+            report["mode"] = self.apply(engine)
+            started_at = time.perf_counter()
+            run_samples()
+            report["compile_sec"] = round(time.perf_counter() - started_at, 2)
+            report["compiled_ms"] = round(measure_ms(run_samples, rounds), 1)
+        except Exception as e:
+            self.revert(engine)
+            report["error"] = str(e)
+            print(f"モデルのコンパイルに失敗したため、通常の実行を使用します: {e}")
+            return report
+
+        if self.cache_dir:
+            save_compile_artifacts(self.cache_dir)
+        report["enabled"] = True
+        report["speedup"] = (
+            round(report["eager_ms"] / report["compiled_ms"], 2)
+            if report["compiled_ms"] > 0 else None
+        )
+        print(
+            f"モデルをコンパイルしました（{report['mode']}、{report['compile_sec']} 秒）: "
+            f"コンパイル前 {report['eager_ms']} ms / コンパイル後 {report['compiled_ms']} ms"
+        )
+        return report
+
+
+def main():
+    """
+    固定のサンプル文でコンパイル前後の所要時間を比較するメイン関数
+
+    Returns:
+        None
+    """
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from engines import TorchEngine
+    from sample_texts import SAMPLE_TEXTS
+
+    default_model_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "model", "m2m100_418M"
+    )
+    parser = argparse.ArgumentParser(description='torch.compileによるコンパイル前後の所要時間の比較')
+    parser.add_argument('--model-dir', default=default_model_dir, help='モデルディレクトリ')
+    parser.add_argument('--mode', default='dynamic', choices=COMPILE_MODES, help='コンパイルのモード')
+    parser.add_argument('--rounds', type=int, default=3, help='計測の繰り返し回数')
+    args = parser.parse_args()
+
+    tokenizer = M2M100Tokenizer.from_pretrained(args.model_dir)
+    model = M2M100ForConditionalGeneration.from_pretrained(args.model_dir)
+    model.eval()
+    engine = TorchEngine(model, tokenizer)
+    settings = {"max_length": 200, "num_beams": 5, "early_stopping": True}
+
+    def run_samples():
+        with torch.inference_mode():
+            for text in SAMPLE_TEXTS:
+                engine.translate_batch([text], "en", "ja", settings)
+
+    compiler = CompiledDecoding(args.mode, compile_cache_dir(args.model_dir))
+    report = compiler.compile_with_benchmark(engine, run_samples, args.rounds)
+    print("\n比較結果:")
+    for name, value in report.items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    # 同じディレクトリのモジュールをインポートできるようにパスを追加
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,1029 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻訳エンジンモジュール
+
+このモジュールは、翻訳サーバーが使用する推論エンジンの共通インターフェースと、
+その実装を提供します。エンジンは環境変数 TRANSLATION_ENGINE で切り替えます。
+
+主な機能:
+- 翻訳エンジンの共通インターフェース（TranslationEngine）
+- PyTorch の model.generate による推論（TorchEngine）
+- 出力の語彙をショートリストに絞り込んだ生成（TorchEngine）
+- ドラフトモデルによる支援付き生成（TorchEngine）
+- 貪欲法による速報とビームサーチによる改善の2段階の翻訳（TorchEngine ではエンコーダの出力を共有）
+- ONNX Runtime による推論（OnnxEngine）
+- CTranslate2 による推論（CTranslate2Engine）
+- 生成中のトークンの逐次デコード（IncrementalDetokenizer）
+- SentencePiece を直接呼び出す高速なトークナイズとデコード（有効な場合）
+- キャンセルトークンによる生成の中断
+- トークナイズ・生成・デコードの段階ごとの所要時間の計測
+- 推論ごとのテキストごとの生成トークン数の記録
+"""
+
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from quantization import is_quantized
+from file_lock import exclusive_file_lock, private_tmp_path, remove_stale_tmp, replace_dir
+from cancellation import CancellationStoppingCriteria
+
+
+class IncrementalDetokenizer:
+    """
+    生成中のトークンを逐次デコードし、新たに確定したテキストをコールバックに渡すクラス
+
+    transformers の generate に streamer として渡せるように put() と end() を実装しています。
+    トークンが追加されるたびにそれまでのトークン全体をデコードし、前回渡したテキストに続く部分だけを
+    コールバックに渡します。デコード結果が不完全な文字で終わる場合や、前回までのテキストと
+    食い違う場合は、次のトークンが追加されるまで待ちます。
+
+    Attributes:
+        text (str): これまでにコールバックに渡したテキスト全体
+    """
+
+    def __init__(self, tokenizer, on_text, skip_prompt=True, token_map=None):
+        """
+        IncrementalDetokenizer クラスの初期化
+
+        Args:
+            tokenizer: M2M100のトークナイザー
+            on_text (callable): 新たに確定したテキストを受け取る関数
+            skip_prompt (bool, optional): 最初の put() で渡されるデコーダの開始トークンを無視するかどうか
+            token_map (callable, optional): put() で渡されたトークンIDのテンソルを語彙のトークンIDに戻す関数
+        """
+        self.tokenizer = tokenizer
+        self.on_text = on_text
+        self.token_map = token_map
+        self.text = ""
+        self._token_ids = []
+        self._skip_next = skip_prompt
+
+    def put(self, value):
+        """
+        生成されたトークンを追加します（generate のストリーマーとして呼び出されます）。
+
+        Args:
+            value: トークンIDのテンソル（バッチサイズは1）
+        """
+        if self._skip_next:
+            self._skip_next = False
+            return
+        if self.token_map is not None:
+            value = self.token_map(value)
+        self.add(value.reshape(-1).tolist())
+
+    def add(self, token_ids):
+        """
+        生成されたトークンIDを追加し、確定したテキストがあればコールバックに渡します。
+
+        Args:
+            token_ids (list[int]): 追加するトークンIDのリスト
+        """
+        self._token_ids.extend(token_ids)
+        self._emit(final=False)
+
+    def end(self):
+        """生成の終了時に、残りのテキストをコールバックに渡す"""
+        self._emit(final=True)
+
+    def _emit(self, final):
+        """デコード結果のうち、まだ渡していない部分をコールバックに渡す"""
+        decoded = self.tokenizer.decode(self._token_ids, skip_special_tokens=True)
+        if not final and decoded.endswith("\ufffd"):
+            return
+        if not decoded.startswith(self.text):
+            if not final:
+                return
+            # 最後まで食い違う場合は、全文を差し替えとして渡す
+            self.text = ""
+        delta = decoded[len(self.text):]
+        if delta:
+            self.text = decoded
+            self.on_text(delta)
+
+
+class TranslationEngine:
+    """
+    翻訳エンジンの基底クラス
+
+    サブクラスは translate_batch() を実装します。translate_batch() は推論エグゼキュータの
+    ワーカースレッドから呼び出されます。
+    observer を設定すると、推論のたびに段階ごとの所要時間（"tokenize"、"generate"、"decode"、秒）と
+    入力トークン数（"input_tokens"）が observer(名前, 値) の形で渡されます。
+    fast_tokenizer を設定すると、トークナイズとデコードに M2M100Tokenizer の代わりに使用します。
+    各推論で生成したトークン数は、同じスレッドから last_generated_tokens() で取得できます。
+
+    Attributes:
+        name (str): エンジン名
+        tokenizer: M2M100のトークナイザー
+        observer (callable): 計測値を受け取る関数（Noneの場合は計測しない）
+        fast_tokenizer (SentencePieceBatchTokenizer): SentencePiece を直接呼び出すトークナイザー（Noneの場合は使用しない）
+    """
+
+    name = "base"
+
+    def __init__(self, tokenizer):
+        """
+        TranslationEngine クラスの初期化
+
+        Args:
+            tokenizer: M2M100のトークナイザー
+        """
+        self.tokenizer = tokenizer
+        # トークナイザーの src_lang 変更を保護するロック
+        self.tokenizer_lock = threading.Lock()
+        self.observer = None
+        self.fast_tokenizer = None
+        # 推論スレッドごとの直前の推論の生成トークン数
+        self._generated = threading.local()
+
+    @property
+    def cache_tag(self):
+        """
+        翻訳キャッシュのキーに含めるエンジンの識別子
+
+        エンジンや量子化の有無によって翻訳結果がわずかに異なるため、キャッシュを区別します。
+
+        Returns:
+            str: エンジンの識別子
+        """
+        return self.name
+
+    def tokenize(self, texts, src_lang):
+        """
+        テキストをトークナイズしてパディングしたテンソルを返します。
+
+        ソース言語の設定はトークナイザー全体の状態を変更するため、複数の推論スレッドから
+        同時に変更されないようにロックします。fast_tokenizer を使用する場合はロックしません。
+
+        Args:
+            texts (list[str]): トークナイズするテキストのリスト
+            src_lang (str): ソース言語
+
+        Returns:
+            dict: input_ids と attention_mask を含む辞書
+        """
+        if self.fast_tokenizer is not None:
+            return self.fast_tokenizer(texts, src_lang)
+        with self.tokenizer_lock:
+            self.tokenizer.src_lang = src_lang
+            return self.tokenizer(texts, return_tensors="pt", padding=True)
+
+    def encode(self, texts, src_lang):
+        """
+        テキストをパディングせずにトークンIDのリストへ変換します。
+
+        Args:
+            texts (list[str]): トークナイズするテキストのリスト
+            src_lang (str): ソース言語
+
+        Returns:
+            list[list[int]]: 言語トークンと終端トークンを含むトークンIDのリスト
+        """
+        if self.fast_tokenizer is not None:
+            return self.fast_tokenizer.encode(texts, src_lang)
+        with self.tokenizer_lock:
+            self.tokenizer.src_lang = src_lang
+            return self.tokenizer(texts)["input_ids"]
+
+    @property
+    def detokenizer(self):
+        """
+        トークンIDのデコードに使用するトークナイザー
+
+        Returns:
+            fast_tokenizer が設定されている場合はそのトークナイザー、それ以外は M2M100のトークナイザー
+        """
+        return self.fast_tokenizer if self.fast_tokenizer is not None else self.tokenizer
+
+    def record_generated_tokens(self, counts):
+        """
+        推論で生成したテキストごとのトークン数を、このスレッドの直前の推論の結果として記録します。
+
+        Args:
+            counts (list[int]): テキストごとの生成トークン数（ターゲット言語トークンを除き、終端トークンを含む）
+        """
+        self._generated.counts = [int(count) for count in counts]
+
+    def last_generated_tokens(self):
+        """
+        このスレッドで直前に実行した推論の、テキストごとの生成トークン数を取得します。
+
+        生成したトークンIDから数えるため、翻訳結果をトークナイズし直す必要はありません。
+
+        Returns:
+            list[int]: テキストごとの生成トークン数。推論を実行していない場合は空のリスト
+        """
+        return list(getattr(self._generated, "counts", ()))
+
+    def count_generated(self, sequences):
+        """
+        generate が返したトークンIDの列から、テキストごとの生成トークン数を数えます。
+
+        Args:
+            sequences (torch.Tensor): generate が返したトークンIDのテンソル
+
+        Returns:
+            list[int]: パディング、デコーダの開始トークン、ターゲット言語トークンを除いたトークン数
+        """
+        pad_token_id = self.tokenizer.pad_token_id
+        return [max(0, int((row != pad_token_id).sum()) - 2) for row in sequences]
+
+    def observe(self, name, value):
+        """
+        計測値を observer に渡します。observer が設定されていない場合は何もしません。
+
+        Args:
+            name (str): 計測値の名前
+            value (float): 計測値
+        """
+        if self.observer is not None:
+            self.observer(name, value)
+
+    @contextmanager
+    def timed(self, stage):
+        """
+        処理の所要時間を計測し、observer に渡します。
+
+        Args:
+            stage (str): 処理の段階の名前（"tokenize"、"generate"、"decode"）
+        """
+        if self.observer is None:
+            yield
+            return
+        started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observer(stage, time.perf_counter() - started_at)
+
+    @staticmethod
+    def stopping_criteria(cancel_token):
+        """
+        キャンセルトークンから model.generate に渡す停止条件を作成します。
+
+        Args:
+            cancel_token: キャンセルトークン（Noneの場合は停止条件を追加しない）
+
+        Returns:
+            StoppingCriteriaList: 停止条件のリスト。cancel_token が None の場合はNone
+        """
+        if cancel_token is None:
+            return None
+        from transformers import StoppingCriteriaList
+        return StoppingCriteriaList([CancellationStoppingCriteria(cancel_token)])
+
+    @staticmethod
+    def check_cancelled(cancel_token):
+        """
+        キャンセルされている場合は例外を送出します。
+
+        Args:
+            cancel_token: キャンセルトークン（Noneの場合は何もしない）
+
+        Raises:
+            TranslationCancelledError: キャンセルされている場合
+        """
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+
+    def translate_batch(self, texts, src_lang, tgt_lang, generation_settings, cancel_token=None):
+        """
+        複数のテキストを1回のバッチ推論でまとめて翻訳します。
+
+        Args:
+            texts (list[str]): 翻訳対象のテキストのリスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定（max_new_tokens、num_beams など）
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            list[str]: 入力と同じ順序の翻訳結果のリスト
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        raise NotImplementedError
+
+    def translate_stream(self, text, src_lang, tgt_lang, generation_settings, on_text,
+                         cancel_token=None):
+        """
+        1件のテキストを翻訳し、生成されたテキストを逐次コールバックに渡します。
+
+        逐次生成に対応していないエンジンでは、翻訳結果の全文を1回だけ渡します。
+
+        Args:
+            text (str): 翻訳対象のテキスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定（num_beams は1である必要があります）
+            on_text (callable): 新たに確定したテキストを受け取る関数。推論スレッドから呼び出されます
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            str: 翻訳結果の全文
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        result = self.translate_batch(
+            [text], src_lang, tgt_lang, generation_settings, cancel_token
+        )[0]
+        if result:
+            on_text(result)
+        return result
+
+    def translate_cascade(self, texts, src_lang, tgt_lang, draft_settings, refine_settings,
+                          on_draft, cancel_token=None):
+        """
+        複数のテキストを貪欲法で速報として翻訳し、続けてビームサーチで翻訳し直します。
+
+        速報の翻訳結果は、ビームサーチを始める前に on_draft に渡します。
+        エンコーダの出力を共有できないエンジンでは、2回の翻訳をそれぞれ実行します。
+
+        Args:
+            texts (list[str]): 翻訳対象のテキストのリスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            draft_settings (dict): 速報の生成設定（num_beams は1）
+            refine_settings (dict): 改善の生成設定
+            on_draft (callable): 速報の翻訳結果のリストを受け取る関数。推論スレッドから呼び出されます
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            list[str]: 入力と同じ順序の改善した翻訳結果のリスト
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        on_draft(self.translate_batch(texts, src_lang, tgt_lang, draft_settings, cancel_token))
+        self.check_cancelled(cancel_token)
+        return self.translate_batch(texts, src_lang, tgt_lang, refine_settings, cancel_token)
+
+
+class TorchEngine(TranslationEngine):
+    """
+    PyTorch の model.generate を使用する翻訳エンジン
+
+    shortlist を指定すると、モデルのデコーダの埋め込みと出力層をショートリストのトークンだけに切り出し、
+    生成されたトークンIDを元の語彙のIDに戻してからデコードします。
+    assistant を設定すると、1件ずつの貪欲法ではドラフトモデルによる支援付き生成を使用します。
+
+    Attributes:
+        model: M2M100ForConditionalGeneration のインスタンス
+        device (torch.device): 推論に使用するデバイス（Noneの場合はCPU）
+        shortlist (VocabShortlist): 出力の語彙のショートリスト（Noneの場合は全語彙で生成する）
+        generation_overrides (dict): 生成設定に上書きする項目（静的なKVキャッシュの指定など）
+        assistant (AssistedDecoding): ドラフトモデルによる支援付き生成（Noneの場合は使用しない）
+    """
+
+    name = "torch"
+
+    def __init__(self, model, tokenizer, device=None, shortlist=None):
+        """
+        TorchEngine クラスの初期化
+
+        Args:
+            model: M2M100ForConditionalGeneration のインスタンス
+            tokenizer: M2M100のトークナイザー
+            device (torch.device, optional): 推論に使用するデバイス
+            shortlist (VocabShortlist, optional): 出力の語彙のショートリスト
+
+        Raises:
+            ValueError: ショートリストをモデルに適用できない場合
+        """
+        super().__init__(tokenizer)
+        self.model = model
+        self.device = device
+        self.shortlist = shortlist
+        self.generation_overrides = {}
+        self.assistant = None
+        # 量子化されたモデルや bf16 / fp16 のモデルは別のキャッシュとして扱う
+        if is_quantized(model):
+            self._cache_tag = "torch-int8"
+        else:
+            dtype_name = str(next(model.parameters()).dtype).replace("torch.", "")
+            self._cache_tag = "torch" if dtype_name == "float32" else f"torch-{dtype_name}"
+        if shortlist is not None:
+            shortlist.apply(model)
+            # 語彙を絞り込むと翻訳結果がわずかに変わる場合があるため、別のキャッシュとして扱う
+            self._cache_tag += f"-vocab{len(shortlist)}"
+
+    @property
+    def cache_tag(self):
+        """量子化の有無と重みの数値型、語彙の絞り込みを含むエンジンの識別子"""
+        return self._cache_tag
+
+    def generate(self, inputs, tgt_lang, generation_settings, cancel_token=None, streamer=None,
+                 encoder_outputs=None):
+        """
+        model.generate で翻訳を生成します。
+
+        支援付き生成を使用できる場合は、ドラフトモデルを assistant_model として渡します。
+
+        Args:
+            inputs (dict): input_ids と attention_mask を含む辞書
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定
+            cancel_token (optional): キャンセルトークン
+            streamer (optional): 生成されたトークンを逐次受け取るストリーマー
+            encoder_outputs (optional): 計算済みのエンコーダの出力（Noneの場合は generate の中で計算する）
+
+        Returns:
+            torch.Tensor: 生成されたトークンIDのテンソル
+        """
+        from transformers import GenerationConfig
+
+        kwargs = {}
+        if streamer is not None:
+            kwargs["streamer"] = streamer
+        if encoder_outputs is not None:
+            kwargs["encoder_outputs"] = encoder_outputs
+        assisted = self.assistant is not None and self.assistant.applies(
+            len(inputs["input_ids"]), generation_settings
+        )
+        if assisted:
+            kwargs["assistant_model"] = self.assistant.draft_model
+            self.assistant.begin()
+        generated_tokens = self.model.generate(
+            **inputs,
+            forced_bos_token_id=self.forced_bos_token_id(tgt_lang),  # 強制的にターゲット言語で出力
+            generation_config=GenerationConfig(**generation_settings, **self.generation_overrides),
+            stopping_criteria=self.stopping_criteria(cancel_token),
+            **kwargs
+        )
+        if assisted:
+            # デコーダの開始トークンを除いたトークン数を集計する
+            self.assistant.end(generated_tokens.shape[-1] - 1)
+        return generated_tokens
+
+    def forced_bos_token_id(self, tgt_lang):
+        """
+        生成の先頭に強制するターゲット言語のトークンIDを取得します。
+
+        Args:
+            tgt_lang (str): ターゲット言語
+
+        Returns:
+            int: ターゲット言語のトークンID（語彙を絞り込んでいる場合は絞り込み後のID）
+        """
+        token_id = self.tokenizer.get_lang_id(tgt_lang)
+        if self.shortlist is not None:
+            token_id = self.shortlist.to_short(token_id)
+        return token_id
+
+    def translate_batch(self, texts, src_lang, tgt_lang, generation_settings, cancel_token=None):
+        """
+        複数のテキストを model.generate でまとめて翻訳します。
+
+        Args:
+            texts (list[str]): 翻訳対象のテキストのリスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            list[str]: 入力と同じ順序の翻訳結果のリスト
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        with self.timed("tokenize"):
+            inputs = self.tokenize(texts, src_lang)
+        self.observe("input_tokens", int(inputs["attention_mask"].sum()))
+
+        # GPUを使用する場合のみ、入力テンソルをデバイスに転送
+        if self.device is not None:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with self.timed("generate"):
+            generated_tokens = self.generate(inputs, tgt_lang, generation_settings, cancel_token)
+        # 停止条件で途中で止まった場合は結果を返さない
+        self.check_cancelled(cancel_token)
+        # トークンをテキストにデコード（ソース言語の設定には依存しない）
+        with self.timed("decode"):
+            if self.shortlist is not None:
+                generated_tokens = self.shortlist.to_full(generated_tokens)
+            self.record_generated_tokens(self.count_generated(generated_tokens))
+            return self.detokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+
+    def translate_stream(self, text, src_lang, tgt_lang, generation_settings, on_text,
+                         cancel_token=None):
+        """
+        1件のテキストを model.generate で翻訳し、生成されたテキストを逐次コールバックに渡します。
+
+        transformers のストリーマーはビームサーチに対応していないため、貪欲法で生成します。
+
+        Args:
+            text (str): 翻訳対象のテキスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定（num_beams は1である必要があります）
+            on_text (callable): 新たに確定したテキストを受け取る関数
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            str: 翻訳結果の全文
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        with self.timed("tokenize"):
+            inputs = self.tokenize([text], src_lang)
+        self.observe("input_tokens", int(inputs["attention_mask"].sum()))
+        if self.device is not None:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        # 逐次デコードは生成と並行して行われるため、生成の所要時間に含まれる
+        token_map = self.shortlist.to_full if self.shortlist is not None else None
+        streamer = IncrementalDetokenizer(self.detokenizer, on_text, token_map=token_map)
+        with self.timed("generate"):
+            generated_tokens = self.generate(
+                inputs, tgt_lang, generation_settings, cancel_token, streamer=streamer
+            )
+        self.check_cancelled(cancel_token)
+        self.record_generated_tokens(self.count_generated(generated_tokens))
+        return streamer.text
+
+    def translate_cascade(self, texts, src_lang, tgt_lang, draft_settings, refine_settings,
+                          on_draft, cancel_token=None):
+        """
+        複数のテキストを貪欲法で速報として翻訳し、続けてビームサーチで翻訳し直します。
+
+        エンコーダは1回だけ実行し、その出力を2回の model.generate で共有します。
+        ビームサーチでは、generate がエンコーダの出力をビーム数の分だけ複製して使用します。
+
+        Args:
+            texts (list[str]): 翻訳対象のテキストのリスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            draft_settings (dict): 速報の生成設定（num_beams は1）
+            refine_settings (dict): 改善の生成設定
+            on_draft (callable): 速報の翻訳結果のリストを受け取る関数。推論スレッドから呼び出されます
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            list[str]: 入力と同じ順序の改善した翻訳結果のリスト
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        import torch
+
+        with self.timed("tokenize"):
+            inputs = self.tokenize(texts, src_lang)
+        self.observe("input_tokens", int(inputs["attention_mask"].sum()))
+        if self.device is not None:
+            inputs = {k: v.to(self.device) for k, v in inputs.items()}
+
+        with self.timed("generate"):
+            with torch.no_grad():
+                encoder_outputs = self.model.get_encoder()(
+                    input_ids=inputs["input_ids"],
+                    attention_mask=inputs["attention_mask"],
+                    return_dict=True
+                )
+            draft_tokens = self.generate(
+                inputs, tgt_lang, draft_settings, cancel_token, encoder_outputs=encoder_outputs
+            )
+        self.check_cancelled(cancel_token)
+        with self.timed("decode"):
+            if self.shortlist is not None:
+                draft_tokens = self.shortlist.to_full(draft_tokens)
+            # on_draft から速報の生成トークン数を取得できるように、先に記録する
+            self.record_generated_tokens(self.count_generated(draft_tokens))
+            on_draft(self.detokenizer.batch_decode(draft_tokens, skip_special_tokens=True))
+
+        # ビームサーチの generate はエンコーダの出力をビーム数の分だけ複製して書き換えるため、速報の後に実行する
+        with self.timed("generate"):
+            refined_tokens = self.generate(
+                inputs, tgt_lang, refine_settings, cancel_token, encoder_outputs=encoder_outputs
+            )
+        self.check_cancelled(cancel_token)
+        with self.timed("decode"):
+            if self.shortlist is not None:
+                refined_tokens = self.shortlist.to_full(refined_tokens)
+            self.record_generated_tokens(self.count_generated(refined_tokens))
+            return self.detokenizer.batch_decode(refined_tokens, skip_special_tokens=True)
+
+
+class OnnxEngine(TranslationEngine):
+    """
+    ONNX Runtime を使用する翻訳エンジン
+
+    初回起動時にエンコーダと過去のキーバリューを受け取るデコーダをONNX形式にエクスポートし、
+    モデルディレクトリの隣にキャッシュします。ビームサーチの各ステップはONNX Runtimeの
+    CPU実行プロバイダで実行されます。optimum[onnxruntime] が必要です。
+
+    Attributes:
+        model: optimum の ORTModelForSeq2SeqLM のインスタンス
+        onnx_dir (str): エクスポートしたONNXモデルのディレクトリ
+    """
+
+    name = "onnx"
+
+    # エクスポート済みとみなすために必要なファイル
+    REQUIRED_FILES = ("encoder_model.onnx", "decoder_model.onnx", "decoder_with_past_model.onnx")
+    # エクスポート元のモデルのフィンガープリントを記録するファイル
+    FINGERPRINT_FILE = "source_fingerprint.txt"
+
+    def __init__(self, model_dir, tokenizer, onnx_dir, fingerprint, num_threads=0):
+        """
+        OnnxEngine クラスの初期化
+
+        Args:
+            model_dir (str): 元のPyTorchモデルのディレクトリ
+            tokenizer: M2M100のトークナイザー
+            onnx_dir (str): ONNXモデルを保存・読み込みするディレクトリ
+            fingerprint (str): 元のモデルのフィンガープリント。エクスポート時と異なる場合は再エクスポートします
+            num_threads (int, optional): ONNX Runtimeの演算スレッド数。0の場合は自動
+
+        Raises:
+            ImportError: optimum[onnxruntime] がインストールされていない場合
+        """
+        super().__init__(tokenizer)
+        import onnxruntime
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        self.onnx_dir = onnx_dir
+        session_options = onnxruntime.SessionOptions()
+        if num_threads > 0:
+            session_options.intra_op_num_threads = num_threads
+        session_options.graph_optimization_level = onnxruntime.GraphOptimizationLevel.ORT_ENABLE_ALL
+
+        load_kwargs = {
+            "use_cache": True,
+            "provider": "CPUExecutionProvider",
+            "session_options": session_options,
+        }
+        if not self.is_exported(onnx_dir, fingerprint):
+            # 複数のワーカーが同時に起動した場合は、1つのワーカーだけがエクスポートする
+            with exclusive_file_lock(onnx_dir):
+                if not self.is_exported(onnx_dir, fingerprint):
+                    self.export(model_dir, tokenizer, onnx_dir, fingerprint)
+        print(f"エクスポート済みのONNXモデルを読み込んでいます: {onnx_dir}")
+        self.model = ORTModelForSeq2SeqLM.from_pretrained(onnx_dir, use_merged=False, **load_kwargs)
+
+    @classmethod
+    def export(cls, model_dir, tokenizer, onnx_dir, fingerprint):
+        """
+        モデルをONNX形式にエクスポートして保存します。
+
+        書き込み途中で終了しても壊れたモデルが残らないよう、プロセスごとの一時ディレクトリに
+        書き込んでから置き換えます。exclusive_file_lock() でロックを取得してから呼び出してください。
+
+        Args:
+            model_dir (str): 元のPyTorchモデルのディレクトリ
+            tokenizer: M2M100のトークナイザー
+            onnx_dir (str): ONNXモデルの保存先のディレクトリ
+            fingerprint (str): 元のモデルのフィンガープリント
+        """
+        from optimum.onnxruntime import ORTModelForSeq2SeqLM
+
+        print("モデルをONNX形式にエクスポートしています（初回のみ）...")
+        remove_stale_tmp(onnx_dir)
+        tmp_dir = private_tmp_path(onnx_dir)
+        exported = ORTModelForSeq2SeqLM.from_pretrained(
+            model_dir, export=True, use_merged=False, use_cache=True
+        )
+        exported.save_pretrained(tmp_dir)
+        del exported
+        tokenizer.save_pretrained(tmp_dir)
+        with open(os.path.join(tmp_dir, cls.FINGERPRINT_FILE), 'w', encoding='utf-8') as f:
+            f.write(fingerprint)
+        replace_dir(tmp_dir, onnx_dir)
+        print(f"ONNXモデルを保存しました: {onnx_dir}")
+
+    @classmethod
+    def is_exported(cls, onnx_dir, fingerprint):
+        """
+        現在のモデルからエクスポートしたONNXモデルが存在するかどうかを確認します。
+
+        Args:
+            onnx_dir (str): ONNXモデルのディレクトリ
+            fingerprint (str): 元のモデルのフィンガープリント
+
+        Returns:
+            bool: 必要なファイルがすべて存在し、フィンガープリントが一致する場合はTrue
+        """
+        if not all(os.path.exists(os.path.join(onnx_dir, name)) for name in cls.REQUIRED_FILES):
+            return False
+        try:
+            with open(os.path.join(onnx_dir, cls.FINGERPRINT_FILE), 'r', encoding='utf-8') as f:
+                return f.read().strip() == fingerprint
+        except OSError:
+            return False
+
+    def translate_batch(self, texts, src_lang, tgt_lang, generation_settings, cancel_token=None):
+        """
+        複数のテキストをONNX Runtimeでまとめて翻訳します。
+
+        Args:
+            texts (list[str]): 翻訳対象のテキストのリスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            list[str]: 入力と同じ順序の翻訳結果のリスト
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        with self.timed("tokenize"):
+            inputs = self.tokenize(texts, src_lang)
+        self.observe("input_tokens", int(inputs["attention_mask"].sum()))
+        with self.timed("generate"):
+            generated_tokens = self.model.generate(
+                **inputs,
+                forced_bos_token_id=self.tokenizer.get_lang_id(tgt_lang),
+                stopping_criteria=self.stopping_criteria(cancel_token),
+                **generation_settings
+            )
+        self.check_cancelled(cancel_token)
+        with self.timed("decode"):
+            self.record_generated_tokens(self.count_generated(generated_tokens))
+            return self.detokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+
+    def translate_stream(self, text, src_lang, tgt_lang, generation_settings, on_text,
+                         cancel_token=None):
+        """
+        1件のテキストをONNX Runtimeで翻訳し、生成されたテキストを逐次コールバックに渡します。
+
+        Args:
+            text (str): 翻訳対象のテキスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定（num_beams は1である必要があります）
+            on_text (callable): 新たに確定したテキストを受け取る関数
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            str: 翻訳結果の全文
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        with self.timed("tokenize"):
+            inputs = self.tokenize([text], src_lang)
+        self.observe("input_tokens", int(inputs["attention_mask"].sum()))
+        streamer = IncrementalDetokenizer(self.detokenizer, on_text)
+        with self.timed("generate"):
+            generated_tokens = self.model.generate(
+                **inputs,
+                forced_bos_token_id=self.tokenizer.get_lang_id(tgt_lang),
+                stopping_criteria=self.stopping_criteria(cancel_token),
+                streamer=streamer,
+                **generation_settings
+            )
+        self.check_cancelled(cancel_token)
+        self.record_generated_tokens(self.count_generated(generated_tokens))
+        return streamer.text
+
+
+class CTranslate2Engine(TranslationEngine):
+    """
+    CTranslate2 を使用する翻訳エンジン
+
+    初回起動時にローカルのモデルファイルからCTranslate2形式のモデルへ変換し、
+    モデルディレクトリの隣にキャッシュします。int8/int16 の重みで推論するため、
+    PyTorchよりもメモリ使用量が少なく、バッチ処理されたビームサーチも高速です。
+    ctranslate2 が必要です。
+
+    Attributes:
+        translator: ctranslate2.Translator のインスタンス
+        ct2_dir (str): 変換したCTranslate2モデルのディレクトリ
+        compute_type (str): 推論に使用する数値型
+    """
+
+    name = "ctranslate2"
+
+    # 変換元のモデルのフィンガープリントを記録するファイル
+    FINGERPRINT_FILE = "source_fingerprint.txt"
+    # 対応している数値型
+    COMPUTE_TYPES = ("int8", "int8_float32", "int16", "float32")
+
+    def __init__(self, model_dir, tokenizer, ct2_dir, fingerprint, compute_type="int8",
+                 inter_threads=1, intra_threads=0):
+        """
+        CTranslate2Engine クラスの初期化
+
+        Args:
+            model_dir (str): 元のPyTorchモデルのディレクトリ
+            tokenizer: M2M100のトークナイザー
+            ct2_dir (str): CTranslate2モデルを保存・読み込みするディレクトリ
+            fingerprint (str): 元のモデルのフィンガープリント。変換時と異なる場合は再変換します
+            compute_type (str, optional): 推論に使用する数値型。デフォルトは"int8"
+            inter_threads (int, optional): 同時に実行できる翻訳の数。デフォルトは1
+            intra_threads (int, optional): 1つの翻訳に使用するスレッド数。0の場合は自動
+
+        Raises:
+            ImportError: ctranslate2 がインストールされていない場合
+            ValueError: 対応していない数値型が指定された場合
+        """
+        super().__init__(tokenizer)
+        import ctranslate2
+
+        if compute_type not in self.COMPUTE_TYPES:
+            raise ValueError(f"対応していない数値型です: {compute_type}（{', '.join(self.COMPUTE_TYPES)}）")
+        self.ct2_dir = ct2_dir
+        self.compute_type = compute_type
+
+        if not self.is_converted(ct2_dir, fingerprint):
+            # 複数のワーカーが同時に起動した場合は、1つのワーカーだけが変換する
+            with exclusive_file_lock(ct2_dir):
+                if not self.is_converted(ct2_dir, fingerprint):
+                    self.convert(model_dir, ct2_dir, fingerprint, compute_type)
+        print(f"変換済みのCTranslate2モデルを読み込んでいます: {ct2_dir}")
+
+        self.translator = ctranslate2.Translator(
+            ct2_dir,
+            device="cpu",
+            compute_type=compute_type,
+            inter_threads=max(1, int(inter_threads)),
+            intra_threads=max(0, int(intra_threads))
+        )
+
+    @classmethod
+    def convert(cls, model_dir, ct2_dir, fingerprint, compute_type):
+        """
+        モデルをCTranslate2形式に変換して保存します。
+
+        書き込み途中で終了しても壊れたモデルが残らないよう、プロセスごとの一時ディレクトリに
+        書き込んでから置き換えます。exclusive_file_lock() でロックを取得してから呼び出してください。
+
+        Args:
+            model_dir (str): 元のPyTorchモデルのディレクトリ
+            ct2_dir (str): CTranslate2モデルの保存先のディレクトリ
+            fingerprint (str): 元のモデルのフィンガープリント
+            compute_type (str): 推論に使用する数値型
+        """
+        import ctranslate2
+
+        print("モデルをCTranslate2形式に変換しています（初回のみ）...")
+        remove_stale_tmp(ct2_dir)
+        tmp_dir = private_tmp_path(ct2_dir)
+        # 重みは推論時と同じ数値型で保存し、読み込み時の変換を省く
+        weight_type = "int8" if compute_type.startswith("int8") else compute_type
+        converter = ctranslate2.converters.TransformersConverter(model_dir)
+        converter.convert(tmp_dir, quantization=weight_type, force=True)
+        with open(os.path.join(tmp_dir, cls.FINGERPRINT_FILE), 'w', encoding='utf-8') as f:
+            f.write(fingerprint)
+        replace_dir(tmp_dir, ct2_dir)
+        print(f"CTranslate2モデルを保存しました: {ct2_dir}")
+
+    @property
+    def cache_tag(self):
+        """数値型を含むエンジンの識別子"""
+        return f"{self.name}-{self.compute_type}"
+
+    @classmethod
+    def is_converted(cls, ct2_dir, fingerprint):
+        """
+        現在のモデルから変換したCTranslate2モデルが存在するかどうかを確認します。
+
+        Args:
+            ct2_dir (str): CTranslate2モデルのディレクトリ
+            fingerprint (str): 元のモデルのフィンガープリント
+
+        Returns:
+            bool: モデルファイルが存在し、フィンガープリントが一致する場合はTrue
+        """
+        if not os.path.exists(os.path.join(ct2_dir, "model.bin")):
+            return False
+        try:
+            with open(os.path.join(ct2_dir, cls.FINGERPRINT_FILE), 'r', encoding='utf-8') as f:
+                return f.read().strip() == fingerprint
+        except OSError:
+            return False
+
+    def translate_batch(self, texts, src_lang, tgt_lang, generation_settings, cancel_token=None):
+        """
+        複数のテキストをCTranslate2のバッチビームサーチでまとめて翻訳します。
+
+        CTranslate2のビームサーチは途中で止められないため、キャンセルは推論の開始前と終了後に確認します。
+
+        Args:
+            texts (list[str]): 翻訳対象のテキストのリスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定（max_length / max_new_tokens と num_beams を使用）
+            cancel_token (optional): キャンセルトークン
+
+        Returns:
+            list[str]: 入力と同じ順序の翻訳結果のリスト
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        self.check_cancelled(cancel_token)
+        with self.timed("tokenize"):
+            source_tokens = [
+                self.tokenizer.convert_ids_to_tokens(ids) for ids in self.encode(texts, src_lang)
+            ]
+        self.observe("input_tokens", sum(len(tokens) for tokens in source_tokens))
+        target_token = self.tokenizer.get_lang_token(tgt_lang)
+        max_length = (
+            generation_settings.get("max_new_tokens") or generation_settings.get("max_length", 200)
+        )
+
+        with self.timed("generate"):
+            results = self.translator.translate_batch(
+                source_tokens,
+                target_prefix=[[target_token]] * len(texts),  # 強制的にターゲット言語で出力
+                beam_size=generation_settings.get("num_beams", 1),
+                max_decoding_length=max_length
+            )
+        self.check_cancelled(cancel_token)
+
+        # 仮説は先頭のターゲット言語トークンを含み、終端トークンを含まないため、長さが生成トークン数になる
+        self.record_generated_tokens([len(result.hypotheses[0]) for result in results])
+        translations = []
+        with self.timed("decode"):
+            for result in results:
+                # 先頭のターゲット言語トークンを除いてデコードする
+                tokens = result.hypotheses[0][1:]
+                ids = self.tokenizer.convert_tokens_to_ids(tokens)
+                translations.append(self.detokenizer.decode(ids, skip_special_tokens=True))
+        return translations
+
+    def translate_stream(self, text, src_lang, tgt_lang, generation_settings, on_text,
+                         cancel_token=None):
+        """
+        1件のテキストをCTranslate2の generate_tokens で翻訳し、生成されたテキストを逐次コールバックに渡します。
+
+        generate_tokens は貪欲法でトークンを1つずつ生成します。
+
+        Args:
+            text (str): 翻訳対象のテキスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            generation_settings (dict): 生成設定（max_new_tokens を使用）
+            on_text (callable): 新たに確定したテキストを受け取る関数
+            cancel_token (optional): キャンセルトークン。キャンセルされると次のデコードステップで生成を止めます
+
+        Returns:
+            str: 翻訳結果の全文
+
+        Raises:
+            TranslationCancelledError: 翻訳がキャンセルされた場合
+        """
+        with self.timed("tokenize"):
+            source_tokens = self.tokenizer.convert_ids_to_tokens(self.encode([text], src_lang)[0])
+        self.observe("input_tokens", len(source_tokens))
+        max_length = (
+            generation_settings.get("max_new_tokens") or generation_settings.get("max_length", 200)
+        )
+
+        detokenizer = IncrementalDetokenizer(self.detokenizer, on_text, skip_prompt=False)
+        steps = 0
+        with self.timed("generate"):
+            for step in self.translator.generate_tokens(
+                source_tokens,
+                target_prefix=[self.tokenizer.get_lang_token(tgt_lang)],
+                max_decoding_length=max_length
+            ):
+                # ジェネレータを途中で閉じると、CTranslate2は次のステップで生成を止める
+                if cancel_token is not None and cancel_token.is_cancelled:
+                    break
+                detokenizer.add([step.token_id])
+                steps += 1
+        self.check_cancelled(cancel_token)
+        self.record_generated_tokens([steps])
+        detokenizer.end()
+        return detokenizer.text
+
+
+def onnx_cache_dir(model_dir):
+    """
+    ONNXモデルのキャッシュディレクトリのパスを返します。
+
+    Args:
+        model_dir (str): 元のPyTorchモデルのディレクトリ
+
+    Returns:
+        str: モデルディレクトリの隣にあるONNXモデルのディレクトリ
+    """
+    return model_dir.rstrip("\\/") + "_onnx"
+
+
+def ctranslate2_cache_dir(model_dir, compute_type):
+    """
+    CTranslate2モデルのキャッシュディレクトリのパスを返します。
+
+    Args:
+        model_dir (str): 元のPyTorchモデルのディレクトリ
+        compute_type (str): 推論に使用する数値型
+
+    Returns:
+        str: モデルディレクトリの隣にある、数値型ごとのCTranslate2モデルのディレクトリ
+    """
+    weight_type = "int8" if compute_type.startswith("int8") else compute_type
+    return model_dir.rstrip("\\/") + f"_ct2_{weight_type}"
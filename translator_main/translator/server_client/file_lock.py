@@ -0,0 +1,126 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ファイルロックモジュール
+
+このモジュールは、複数のワーカープロセスが同時に起動したときに、モデルの変換
+（スナップショット、量子化済みモデルのキャッシュ、ONNXエクスポート、CTranslate2変換）を
+1つのプロセスだけが行うためのプロセス間の排他制御を実装します。
+
+主な機能:
+- ロックファイルによるプロセス間の排他（POSIX は fcntl、Windows は msvcrt）
+- プロセスごとに異なる一時ファイル名の作成
+- 書き込み途中で終了したプロセスが残した一時ファイルの削除
+"""
+
+import glob
+import os
+import shutil
+import time
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:
+    # Windows
+    fcntl = None
+    import msvcrt
+
+
+def _try_lock(fd):
+    """ロックの取得を試み、取得できた場合はTrueを返す"""
+    try:
+        if fcntl is not None:
+            fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        else:
+            msvcrt.locking(fd, msvcrt.LK_NBLCK, 1)
+        return True
+    except OSError:
+        return False
+
+
+def _unlock(fd):
+    """ロックを解放する"""
+    if fcntl is not None:
+        fcntl.flock(fd, fcntl.LOCK_UN)
+    else:
+        os.lseek(fd, 0, os.SEEK_SET)
+        msvcrt.locking(fd, msvcrt.LK_UNLCK, 1)
+
+
+@contextmanager
+def exclusive_file_lock(path, poll_interval=0.2):
+    """
+    path に対応するロックファイルで、ほかのプロセスと排他します。
+
+    ロックはプロセスが終了すると OS によって解放されるため、変換中にプロセスが
+    異常終了しても、ほかのプロセスが待ち続けることはありません。
+
+    Args:
+        path (str): 排他する対象のファイルまたはディレクトリのパス（ロックファイルは path + ".lock"）
+        poll_interval (float, optional): ロックの取得を再試行する間隔（秒）。デフォルトは0.2
+
+    Yields:
+        None
+    """
+    lock_path = path + ".lock"
+    directory = os.path.dirname(lock_path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    fd = os.open(lock_path, os.O_RDWR | os.O_CREAT, 0o644)
+    try:
+        if not _try_lock(fd):
+            print(f"別のプロセスが作成中のため、完了を待っています: {path}")
+            while not _try_lock(fd):
+                time.sleep(poll_interval)
+        try:
+            yield
+        finally:
+            _unlock(fd)
+    finally:
+        os.close(fd)
+
+
+def private_tmp_path(path):
+    """
+    プロセスごとに異なる一時ファイル名を作成します。
+
+    Args:
+        path (str): 最終的な保存先のパス
+
+    Returns:
+        str: 保存先と同じディレクトリの一時ファイルのパス
+    """
+    return f"{path}.tmp{os.getpid()}"
+
+
+def remove_stale_tmp(path):
+    """
+    以前に書き込み途中で終了したプロセスが残した一時ファイルを削除します。
+
+    exclusive_file_lock() でロックを取得してから呼び出してください。
+
+    Args:
+        path (str): 最終的な保存先のパス
+    """
+    for tmp_path in glob.glob(glob.escape(path) + ".tmp*"):
+        if os.path.isdir(tmp_path):
+            shutil.rmtree(tmp_path, ignore_errors=True)
+        else:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+
+
+def replace_dir(tmp_dir, out_dir):
+    """
+    書き込みが完了した一時ディレクトリを保存先に置き換えます。
+
+    Args:
+        tmp_dir (str): private_tmp_path() で作成した一時ディレクトリ
+        out_dir (str): 保存先のディレクトリ
+    """
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp_dir, out_dir)
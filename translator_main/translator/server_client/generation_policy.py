@@ -0,0 +1,216 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+生成ポリシーモジュール
+
+このモジュールは、翻訳ごとの生成設定（出力トークン数の上限とビーム数）を
+入力の長さと遅延の目標値から決定する生成ポリシーを実装します。
+
+主な機能:
+- 入力トークン数に応じた max_new_tokens の決定（短い文で無駄に待たず、長い文を途中で切らない）
+- 遅延の目標値（サーバー全体またはリクエストごと）に収まるビーム数の選択
+- 品質/速度のヒント（"fast" / "balanced" / "quality"）への対応
+- 実測した生成速度（トークン/秒）の指数移動平均による見積もりの更新
+"""
+
+import math
+import threading
+
+# 品質/速度のヒントとして受け付ける値
+QUALITY_HINTS = ("fast", "balanced", "quality")
+
+
+class GenerationPolicy:
+    """
+    翻訳ごとの生成設定を決定するポリシー
+
+    生成速度は「1件のリクエストから見たビーム1本あたりのデコードトークン数/秒」として記録します。
+    マイクロバッチでまとめて推論した場合も、バッチ全体のスループットではなく1件あたりの速度を記録するため、
+    混雑してバッチが大きくなると見積もりの所要時間も長くなります。
+    ビームサーチの計算量はビーム数にほぼ比例するため、予想される出力トークン数と
+    ビーム数からおおよその所要時間を見積もり、遅延の目標値に収まる最大のビーム数を選びます。
+    生成速度の実測値がまだない場合は、既定のビーム数を使用します。
+
+    Attributes:
+        base_settings (dict): 基本の生成設定（num_beams は最大ビーム数として使用）
+        latency_budget_ms (float): サーバー全体の遅延の目標値（ミリ秒、0の場合は目標なし）
+        max_new_tokens_cap (int): max_new_tokens の上限
+    """
+
+    def __init__(self, base_settings, latency_budget_ms=0.0, max_new_tokens_cap=512,
+                 length_ratio=2.0, length_margin=10, min_new_tokens=16, ema_alpha=0.2):
+        """
+        GenerationPolicy クラスの初期化
+
+        Args:
+            base_settings (dict): 基本の生成設定。max_length は max_new_tokens に置き換えられます
+            latency_budget_ms (float, optional): 遅延の目標値（ミリ秒）。デフォルトは0（目標なし）
+            max_new_tokens_cap (int, optional): max_new_tokens の上限。デフォルトは512
+            length_ratio (float, optional): 入力トークン数に対する出力トークン数の上限の倍率。デフォルトは2.0
+            length_margin (int, optional): 出力トークン数の上限に加える余裕。デフォルトは10
+            min_new_tokens (int, optional): max_new_tokens の下限。デフォルトは16
+            ema_alpha (float, optional): 生成速度の指数移動平均の係数。デフォルトは0.2
+        """
+        self.base_settings = {k: v for k, v in base_settings.items() if k != "max_length"}
+        self.max_beams = max(1, int(self.base_settings.get("num_beams", 1)))
+        self.latency_budget_ms = max(0.0, float(latency_budget_ms))
+        self.max_new_tokens_cap = max(1, int(max_new_tokens_cap))
+        self.length_ratio = max(0.1, float(length_ratio))
+        self.length_margin = max(0, int(length_margin))
+        self.min_new_tokens = max(1, min(int(min_new_tokens), self.max_new_tokens_cap))
+        self.ema_alpha = min(1.0, max(0.01, float(ema_alpha)))
+
+        self._lock = threading.Lock()
+        self._beam_tokens_per_sec = None
+        self._observations = 0
+        self._beam_counts = {}
+
+    def max_new_tokens(self, input_tokens):
+        """
+        入力トークン数から出力トークン数の上限を決定します。
+
+        Args:
+            input_tokens (int): 入力のトークン数（言語トークンと終端トークンを含む）
+
+        Returns:
+            int: max_new_tokens
+        """
+        limit = math.ceil(max(0, input_tokens) * self.length_ratio) + self.length_margin
+        return min(self.max_new_tokens_cap, max(self.min_new_tokens, limit))
+
+    def estimate_latency_ms(self, input_tokens, num_beams):
+        """
+        指定したビーム数で翻訳したときのおおよその所要時間を見積もります。
+
+        出力トークン数は入力トークン数と同程度と仮定します。
+
+        Args:
+            input_tokens (int): 入力のトークン数
+            num_beams (int): ビーム数
+
+        Returns:
+            float: 見積もった所要時間（ミリ秒）。生成速度の実測値がない場合はNone
+        """
+        with self._lock:
+            speed = self._beam_tokens_per_sec
+        if not speed:
+            return None
+        expected_tokens = max(1, input_tokens)
+        return expected_tokens * num_beams / speed * 1000
+
+    def choose_beams(self, input_tokens, quality=None, latency_budget_ms=None):
+        """
+        品質/速度のヒントと遅延の目標値からビーム数を選びます。
+
+        Args:
+            input_tokens (int): 入力のトークン数
+            quality (str, optional): "fast"（貪欲法）、"quality"（最大ビーム数）、
+                "balanced" または None（遅延の目標値に従う）
+            latency_budget_ms (float, optional): このリクエストの遅延の目標値（ミリ秒）。
+                None の場合はサーバー全体の設定を使用します
+
+        Returns:
+            int: ビーム数
+        """
+        if quality == "fast":
+            return 1
+        if quality == "quality":
+            return self.max_beams
+
+        budget = (
+            self.latency_budget_ms if latency_budget_ms is None
+            else max(0.0, float(latency_budget_ms))
+        )
+        if budget <= 0:
+            return self.max_beams
+        for num_beams in range(self.max_beams, 0, -1):
+            estimate = self.estimate_latency_ms(input_tokens, num_beams)
+            if estimate is None or estimate <= budget:
+                return num_beams
+        return 1
+
+    def resolve(self, input_tokens, quality=None, latency_budget_ms=None):
+        """
+        翻訳に使用する生成設定を決定します。
+
+        Args:
+            input_tokens (int): 入力のトークン数
+            quality (str, optional): 品質/速度のヒント
+            latency_budget_ms (float, optional): このリクエストの遅延の目標値（ミリ秒）
+
+        Returns:
+            dict: 生成設定（max_new_tokens と num_beams を含む）
+
+        Raises:
+            ValueError: 不明な品質/速度のヒントが指定された場合
+        """
+        if quality is not None and quality not in QUALITY_HINTS:
+            raise ValueError(f"不明な品質の指定です: {quality}（{', '.join(QUALITY_HINTS)} のいずれかを指定してください）")
+        num_beams = self.choose_beams(input_tokens, quality, latency_budget_ms)
+        settings = dict(self.base_settings)
+        settings["num_beams"] = num_beams
+        settings["max_new_tokens"] = self.max_new_tokens(input_tokens)
+        if num_beams == 1:
+            # 貪欲法では意味を持たない設定
+            settings.pop("early_stopping", None)
+        return settings
+
+    @staticmethod
+    def merge(settings_list):
+        """
+        同じバッチで翻訳する複数の生成設定を1つにまとめます。
+
+        ビーム数が同じ設定だけがまとめられる前提で、max_new_tokens は最大値を使用します。
+
+        Args:
+            settings_list (list[dict]): resolve() で決定した生成設定のリスト
+
+        Returns:
+            dict: バッチ全体の生成設定
+        """
+        merged = dict(settings_list[0])
+        merged["max_new_tokens"] = max(s["max_new_tokens"] for s in settings_list)
+        return merged
+
+    def record(self, generated_tokens, num_beams, elapsed_sec, batch_size=1):
+        """
+        実測した生成速度を記録します。
+
+        バッチ内の各リクエストは推論全体の時間だけ待つため、1件あたりの生成トークン数を
+        推論にかかった時間で割った値を記録します。
+
+        Args:
+            generated_tokens (int): 生成されたトークン数（バッチ内の合計）
+            num_beams (int): 使用したビーム数
+            elapsed_sec (float): 推論にかかった時間（秒）
+            batch_size (int, optional): バッチ内のテキストの数。デフォルトは1
+        """
+        if generated_tokens <= 0 or elapsed_sec <= 0:
+            return
+        speed = generated_tokens / max(1, int(batch_size)) * max(1, num_beams) / elapsed_sec
+        with self._lock:
+            if self._beam_tokens_per_sec is None:
+                self._beam_tokens_per_sec = speed
+            else:
+                self._beam_tokens_per_sec += self.ema_alpha * (speed - self._beam_tokens_per_sec)
+            self._observations += 1
+            self._beam_counts[num_beams] = self._beam_counts.get(num_beams, 0) + 1
+
+    def stats(self):
+        """
+        生成ポリシーの統計情報を取得します。
+
+        Returns:
+            dict: 遅延の目標値、実測した生成速度、ビーム数ごとの推論回数などを含む辞書
+        """
+        with self._lock:
+            speed = self._beam_tokens_per_sec
+            return {
+                "latency_budget_ms": self.latency_budget_ms,
+                "max_beams": self.max_beams,
+                "max_new_tokens_cap": self.max_new_tokens_cap,
+                "beam_tokens_per_sec": round(speed, 1) if speed is not None else None,
+                "observations": self._observations,
+                "batches_by_beams": {str(k): v for k, v in sorted(self._beam_counts.items())},
+            }
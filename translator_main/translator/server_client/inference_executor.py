@@ -0,0 +1,211 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+推論実行モジュール
+
+このモジュールは、model.generate のようなブロッキングする推論処理を
+asyncio のイベントループの外で実行する専用のエグゼキュータを実装します。
+
+主な機能:
+- 同時実行数を制限した専用ワーカースレッドでの推論
+- 上限付きの待ち行列と、あふれた場合の即時拒否
+- 優先度付きの待ち行列（優先度の高い処理から実行）
+- torch.inference_mode での推論実行
+- 実行状況と優先度ごとの待ち時間の統計情報
+"""
+
+import asyncio
+import itertools
+import queue
+import threading
+import time
+
+import torch
+
+
+class InferenceQueueFullError(Exception):
+    """推論の待ち行列が上限に達しているときに送出される例外"""
+
+
+def _set_future_result(future, result):
+    """イベントループのスレッドで Future に結果を設定する"""
+    if not future.done():
+        future.set_result(result)
+
+
+def _set_future_exception(future, exception):
+    """イベントループのスレッドで Future に例外を設定する"""
+    if not future.done():
+        future.set_exception(exception)
+
+
+class InferenceExecutor:
+    """
+    推論専用エグゼキュータ
+
+    max_workers 個のワーカースレッドで推論関数を実行します。実行待ちの処理が
+    max_queue_size 件に達している場合、新しい処理は InferenceQueueFullError で拒否されます。
+    実行待ちの処理は優先度の値が小さいものから、同じ優先度の中では登録順に実行されます。
+    推論関数は torch.inference_mode の中で呼び出されます。
+
+    Attributes:
+        max_workers (int): 同時に実行できる推論の数
+        max_queue_size (int): 実行待ちにできる処理の最大数
+    """
+
+    def __init__(self, max_workers=1, max_queue_size=32, name="inference", priority_names=None,
+                 wait_observer=None):
+        """
+        InferenceExecutor クラスの初期化
+
+        Args:
+            max_workers (int, optional): 同時に実行できる推論の数。デフォルトは1
+            max_queue_size (int, optional): 実行待ちにできる処理の最大数。デフォルトは32
+            name (str, optional): ワーカースレッド名の接頭辞。デフォルトは"inference"
+            priority_names (sequence, optional): 統計情報で優先度の代わりに表示する名前（優先度の値の順）
+            wait_observer (callable, optional): 処理を取り出すたびに (優先度, 待ち時間（秒）) で呼び出される関数
+        """
+        self.max_workers = max(1, int(max_workers))
+        self.max_queue_size = max(0, int(max_queue_size))
+        self.priority_names = tuple(priority_names or ())
+        self.wait_observer = wait_observer
+
+        self._queue = queue.PriorityQueue()
+        self._sequence = itertools.count()
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._queued_by_priority = {}
+        self._wait_totals = {}
+        self._wait_counts = {}
+        self._wait_max = {}
+        self._active = 0
+        self._completed = 0
+        self._failed = 0
+        self._rejected = 0
+
+        self._threads = []
+        for i in range(self.max_workers):
+            thread = threading.Thread(target=self._worker, name=f"{name}-{i}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, fn, *args, priority=0, **kwargs):
+        """
+        推論関数を実行待ちに登録します。イベントループ上から呼び出してください。
+
+        Args:
+            fn (callable): ワーカースレッドで実行する関数
+            *args: fn に渡す位置引数
+            priority (int, optional): 優先度（小さいほど先に実行される）。デフォルトは0
+            **kwargs: fn に渡すキーワード引数
+
+        Returns:
+            asyncio.Future: fn の戻り値が設定される Future
+
+        Raises:
+            InferenceQueueFullError: 実行待ちの処理が上限に達している場合
+        """
+        with self._lock:
+            # 実行中の処理とあわせて、ワーカー数 + 待ち行列の上限を超える場合は拒否する
+            if self._queued + self._active >= self.max_workers + self.max_queue_size:
+                self._rejected += 1
+                raise InferenceQueueFullError("推論の待ち行列が上限に達しています。しばらくしてから再試行してください。")
+            self._queued += 1
+            self._queued_by_priority[priority] = self._queued_by_priority.get(priority, 0) + 1
+
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        item = (fn, args, kwargs, future, loop, priority, time.perf_counter())
+        self._queue.put((priority, next(self._sequence), item))
+        return future
+
+    async def run(self, fn, *args, priority=0, **kwargs):
+        """
+        推論関数をワーカースレッドで実行し、結果を待ちます。
+
+        Args:
+            fn (callable): ワーカースレッドで実行する関数
+            *args: fn に渡す位置引数
+            priority (int, optional): 優先度（小さいほど先に実行される）。デフォルトは0
+            **kwargs: fn に渡すキーワード引数
+
+        Returns:
+            fn の戻り値
+
+        Raises:
+            InferenceQueueFullError: 実行待ちの処理が上限に達している場合
+        """
+        return await self.submit(fn, *args, priority=priority, **kwargs)
+
+    def _worker(self):
+        """実行待ちの処理を取り出して実行し続けるワーカースレッド"""
+        while True:
+            item = self._queue.get()[2]
+            if item is None:
+                break
+            fn, args, kwargs, future, loop, priority, enqueued_at = item
+
+            wait = time.perf_counter() - enqueued_at
+            with self._lock:
+                self._queued -= 1
+                self._queued_by_priority[priority] -= 1
+                self._wait_totals[priority] = self._wait_totals.get(priority, 0.0) + wait
+                self._wait_counts[priority] = self._wait_counts.get(priority, 0) + 1
+                self._wait_max[priority] = max(self._wait_max.get(priority, 0.0), wait)
+                self._active += 1
+            if self.wait_observer is not None:
+                self.wait_observer(priority, wait)
+            try:
+                with torch.inference_mode():
+                    result = fn(*args, **kwargs)
+                loop.call_soon_threadsafe(_set_future_result, future, result)
+                with self._lock:
+                    self._completed += 1
+            except Exception as e:
+                loop.call_soon_threadsafe(_set_future_exception, future, e)
+                with self._lock:
+                    self._failed += 1
+            finally:
+                with self._lock:
+                    self._active -= 1
+
+    def stats(self):
+        """
+        エグゼキュータの統計情報を取得します。
+
+        Returns:
+            dict: 実行中・実行待ちの数、完了・失敗・拒否の件数、優先度ごとの待ち時間（ミリ秒）を含む辞書
+        """
+        with self._lock:
+            by_priority = {}
+            for priority in sorted(set(self._queued_by_priority) | set(self._wait_counts)):
+                count = self._wait_counts.get(priority, 0)
+                if 0 <= priority < len(self.priority_names):
+                    label = self.priority_names[priority]
+                else:
+                    label = str(priority)
+                by_priority[label] = {
+                    "queued": self._queued_by_priority.get(priority, 0),
+                    "started": count,
+                    "avg_wait_ms": (
+                        round(self._wait_totals[priority] / count * 1000.0, 3) if count else 0.0
+                    ),
+                    "max_wait_ms": round(self._wait_max.get(priority, 0.0) * 1000.0, 3),
+                }
+            return {
+                "max_workers": self.max_workers,
+                "max_queue_size": self.max_queue_size,
+                "active": self._active,
+                "queued": self._queued,
+                "completed": self._completed,
+                "failed": self._failed,
+                "rejected": self._rejected,
+                "by_priority": by_priority,
+            }
+
+    def shutdown(self):
+        """ワーカースレッドを終了させる"""
+        for _ in self._threads:
+            # 実行待ちの処理をすべて実行してから終了するよう、最も低い優先度で登録する
+            self._queue.put((float("inf"), next(self._sequence), None))
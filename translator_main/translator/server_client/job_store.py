@@ -0,0 +1,231 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻訳ジョブ管理モジュール
+
+このモジュールは、翻訳をジョブとして受け付け、結果を後から取得するためのジョブ管理を実装します。
+クライアントは翻訳の完了を1回のHTTPリクエストで待つ必要がなくなるため、
+タイムアウト後の再試行で同じ翻訳がサーバー上で二重に実行されることがなくなります。
+
+主な機能:
+- ジョブの登録とバックグラウンドでの実行
+- 同じ内容のジョブの重複排除（実行中または完了済みのジョブを共有）
+- 結果を待つロングポーリング
+- 完了したジョブの結果の一定時間（TTL）の保持
+"""
+
+import asyncio
+import time
+import uuid
+from collections import OrderedDict
+
+from cancellation import BatchCancellation
+
+# ジョブの状態
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+class TranslationJob:
+    """
+    1件の翻訳ジョブ
+
+    Attributes:
+        job_id (str): ジョブID
+        key (tuple): 重複排除に使用するキー（翻訳キャッシュのキー）
+        future (asyncio.Future): 翻訳結果が設定される Future
+        created_at (float): ジョブを登録した時刻
+        finished_at (float): ジョブが完了した時刻（実行中の場合はNone）
+        attached (int): このジョブを共有したリクエストの数
+        cancel_token (BatchCancellation): ジョブを共有するすべてのリクエストがキャンセルされたときにキャンセルされるトークン
+    """
+
+    def __init__(self, key, loop, job_id=None):
+        """
+        TranslationJob クラスの初期化
+
+        Args:
+            key (tuple): 重複排除に使用するキー
+            loop (asyncio.AbstractEventLoop): ジョブを実行するイベントループ
+            job_id (str, optional): ジョブID。省略した場合は自動で採番します
+        """
+        self.job_id = job_id or uuid.uuid4().hex
+        self.key = key
+        self.future = loop.create_future()
+        self.created_at = time.monotonic()
+        self.finished_at = None
+        self.attached = 1
+        self.cancel_token = BatchCancellation([])
+
+    @property
+    def status(self):
+        """ジョブの状態（pending / done / failed）"""
+        if not self.future.done():
+            return JOB_PENDING
+        if self.future.cancelled() or self.future.exception() is not None:
+            return JOB_FAILED
+        return JOB_DONE
+
+
+class TranslationJobStore:
+    """
+    翻訳ジョブの管理
+
+    同じキーのジョブが実行中、または完了してから ttl_sec 秒以内の場合は、新しいジョブを作らずに
+    既存のジョブを返します。失敗したジョブは重複排除の対象から外すため、再登録すると翻訳し直されます。
+    イベントループのスレッドからのみ使用してください。
+
+    Attributes:
+        ttl_sec (float): 完了したジョブの結果を保持する秒数
+        max_jobs (int): 保持する最大ジョブ数
+    """
+
+    def __init__(self, ttl_sec=60.0, max_jobs=1024):
+        """
+        TranslationJobStore クラスの初期化
+
+        Args:
+            ttl_sec (float, optional): 完了したジョブの結果を保持する秒数。デフォルトは60
+            max_jobs (int, optional): 保持する最大ジョブ数。デフォルトは1024
+        """
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.max_jobs = max(1, int(max_jobs))
+        self._jobs = OrderedDict()
+        self._by_key = {}
+
+        # 統計情報
+        self._submitted = 0
+        self._deduplicated = 0
+        self._expired = 0
+
+    def submit(self, key, compute, cancel_token=None, job_id=None):
+        """
+        ジョブを登録し、バックグラウンドで実行を開始します。
+
+        Args:
+            key (tuple): 重複排除に使用するキー
+            compute (callable): ジョブを引数に取り、翻訳結果を返すコルーチンを作成する関数
+            cancel_token (CancellationToken, optional): 登録したリクエストのキャンセルトークン
+            job_id (str, optional): 新しく登録する場合のジョブID。省略した場合は自動で採番します
+
+        Returns:
+            tuple: (TranslationJob, bool) 登録したジョブと、既存のジョブを共有した場合はTrue
+        """
+        job = self.find(key)
+        if job is not None:
+            job.attached += 1
+            if cancel_token is not None:
+                job.cancel_token.add(cancel_token)
+            self._deduplicated += 1
+            return job, True
+
+        job = TranslationJob(key, asyncio.get_running_loop(), job_id)
+        if cancel_token is not None:
+            job.cancel_token.add(cancel_token)
+        self._jobs[job.job_id] = job
+        self._by_key[key] = job
+        self._submitted += 1
+        asyncio.ensure_future(self._run(job, compute))
+        return job, False
+
+    def find(self, key):
+        """
+        重複排除の対象となる同じキーのジョブを取得します。
+
+        Args:
+            key (tuple): 重複排除に使用するキー
+
+        Returns:
+            TranslationJob: 実行中または保持期間内の完了したジョブ。存在しない場合はNone
+        """
+        self._purge()
+        job = self._by_key.get(key)
+        if job is None or job.status == JOB_FAILED:
+            return None
+        return job
+
+    async def _run(self, job, compute):
+        """ジョブを実行し、結果または例外を Future に設定する"""
+        try:
+            result = await compute(job)
+        except Exception as e:
+            job.future.set_exception(e)
+            # 待機者がいない場合に例外が警告として出力されないようにする
+            job.future.exception()
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+        else:
+            job.future.set_result(result)
+        finally:
+            job.finished_at = time.monotonic()
+
+    def get(self, job_id):
+        """
+        ジョブIDからジョブを取得します。
+
+        Args:
+            job_id (str): ジョブID
+
+        Returns:
+            TranslationJob: ジョブ。存在しないか保持期間を過ぎた場合はNone
+        """
+        self._purge()
+        return self._jobs.get(job_id)
+
+    async def wait(self, job, timeout):
+        """
+        ジョブの完了を最大 timeout 秒待ちます。
+
+        Args:
+            job (TranslationJob): 待機するジョブ
+            timeout (float): 最大待ち時間（秒）
+        """
+        if job.future.done() or timeout <= 0:
+            return
+        try:
+            await asyncio.wait_for(asyncio.shield(job.future), timeout)
+        except asyncio.TimeoutError:
+            pass
+        except Exception:
+            # ジョブの失敗は呼び出し元が job.status で確認する
+            pass
+
+    def _purge(self):
+        """保持期間を過ぎたジョブと上限を超えた古い完了済みジョブを削除する"""
+        now = time.monotonic()
+        expired = [
+            job for job in self._jobs.values()
+            if job.finished_at is not None and now - job.finished_at > self.ttl_sec
+        ]
+        overflow = len(self._jobs) - len(expired) - self.max_jobs
+        if overflow > 0:
+            expired_ids = {job.job_id for job in expired}
+            finished = [
+                job for job in self._jobs.values()
+                if job.finished_at is not None and job.job_id not in expired_ids
+            ]
+            expired.extend(finished[:overflow])
+        for job in expired:
+            del self._jobs[job.job_id]
+            if self._by_key.get(job.key) is job:
+                del self._by_key[job.key]
+            self._expired += 1
+
+    def stats(self):
+        """
+        ジョブの統計情報を取得します。
+
+        Returns:
+            dict: 保持中・実行中のジョブ数、重複排除された件数などを含む辞書
+        """
+        pending = sum(1 for job in self._jobs.values() if job.finished_at is None)
+        return {
+            "ttl_sec": self.ttl_sec,
+            "jobs": len(self._jobs),
+            "pending": pending,
+            "submitted": self._submitted,
+            "deduplicated": self._deduplicated,
+            "expired": self._expired,
+        }
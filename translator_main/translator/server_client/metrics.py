@@ -0,0 +1,287 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+メトリクスモジュール
+
+このモジュールは、翻訳サーバーの計測値を Prometheus のテキスト形式で出力するための
+軽量なメトリクスを実装します。外部ライブラリに依存せず、計測1回あたりの処理は
+ロックの取得と数回の加算だけなので、常時有効にしておけます。
+
+主な機能:
+- カウンター（累積値）
+- ヒストグラム（バケットごとの件数、合計、件数）
+- 出力時に値を取得するコールバック形式のゲージ・カウンター
+- Prometheus テキスト形式（バージョン 0.0.4）での出力
+"""
+
+import bisect
+import math
+import threading
+
+# Prometheus テキスト形式の Content-Type
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# 処理時間（秒）のヒストグラムのデフォルトのバケット
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0
+)
+
+
+def _escape_label_value(value):
+    """ラベルの値をエスケープする"""
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=None):
+    """ラベルを {name="value",...} の形式に変換する"""
+    pairs = [f'{name}="{_escape_label_value(value)}"' for name, value in zip(names, values)]
+    if extra is not None:
+        pairs.append(f'{extra[0]}="{extra[1]}"')
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value):
+    """数値を Prometheus の形式に変換する"""
+    if value is None:
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    if float(value).is_integer():
+        return str(int(value))
+    return repr(float(value))
+
+
+class Counter:
+    """
+    累積値を数えるカウンター
+
+    Attributes:
+        name (str): メトリクス名
+        description (str): メトリクスの説明
+        labelnames (tuple): ラベル名
+    """
+
+    type_name = "counter"
+
+    def __init__(self, name, description, labelnames=()):
+        """
+        Counter クラスの初期化
+
+        Args:
+            name (str): メトリクス名
+            description (str): メトリクスの説明
+            labelnames (tuple, optional): ラベル名
+        """
+        self.name = name
+        self.description = description
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        self._values = {}
+
+    def inc(self, amount=1.0, labels=()):
+        """
+        カウンターを増やします。
+
+        Args:
+            amount (float, optional): 増やす量。デフォルトは1
+            labels (tuple, optional): ラベルの値（labelnames と同じ順序）
+        """
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def samples(self):
+        """出力するサンプルの (名前, ラベル, 値) のリストを返す"""
+        with self._lock:
+            values = sorted(self._values.items())
+        if not values and not self.labelnames:
+            # ラベルのないカウンターは、まだ増えていなくても0として出力する
+            values = [((), 0.0)]
+        return [
+            (self.name, _format_labels(self.labelnames, labels), value) for labels, value in values
+        ]
+
+
+class Histogram:
+    """
+    値の分布をバケットごとに数えるヒストグラム
+
+    Attributes:
+        name (str): メトリクス名
+        description (str): メトリクスの説明
+        buckets (tuple): バケットの上限値（昇順）
+        labelnames (tuple): ラベル名
+    """
+
+    type_name = "histogram"
+
+    def __init__(self, name, description, buckets=LATENCY_BUCKETS, labelnames=()):
+        """
+        Histogram クラスの初期化
+
+        Args:
+            name (str): メトリクス名
+            description (str): メトリクスの説明
+            buckets (tuple, optional): バケットの上限値。デフォルトは LATENCY_BUCKETS
+            labelnames (tuple, optional): ラベル名
+        """
+        self.name = name
+        self.description = description
+        self.buckets = tuple(sorted(float(b) for b in buckets))
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+        # ラベルの値ごとの [バケットごとの件数（累積しない）, 合計, 件数]
+        self._series = {}
+
+    def observe(self, value, labels=()):
+        """
+        値を記録します。
+
+        Args:
+            value (float): 記録する値
+            labels (tuple, optional): ラベルの値（labelnames と同じ順序）
+        """
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            series[0][index] += 1
+            series[1] += value
+            series[2] += 1
+
+    def samples(self):
+        """出力するサンプルの (名前, ラベル, 値) のリストを返す"""
+        with self._lock:
+            snapshot = sorted(
+                (labels, list(series[0]), series[1], series[2])
+                for labels, series in self._series.items()
+            )
+        samples = []
+        for labels, counts, total, count in snapshot:
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets + (math.inf,), counts):
+                cumulative += bucket_count
+                le = ("le", _format_value(bound))
+                samples.append(
+                    (f"{self.name}_bucket", _format_labels(self.labelnames, labels, le), cumulative)
+                )
+            samples.append((f"{self.name}_sum", _format_labels(self.labelnames, labels), total))
+            samples.append((f"{self.name}_count", _format_labels(self.labelnames, labels), count))
+        return samples
+
+
+class CallbackMetric:
+    """
+    出力時に関数を呼び出して値を取得するメトリクス
+
+    他のコンポーネントが既に数えている値（キャッシュのヒット数やメモリ使用量など）を
+    二重に数えずに出力するために使用します。
+
+    Attributes:
+        name (str): メトリクス名
+        description (str): メトリクスの説明
+        type_name (str): メトリクスの種類（"gauge" または "counter"）
+        labelnames (tuple): ラベル名
+    """
+
+    def __init__(self, name, description, fn, type_name="gauge", labelnames=()):
+        """
+        CallbackMetric クラスの初期化
+
+        Args:
+            name (str): メトリクス名
+            description (str): メトリクスの説明
+            fn (callable): 値を返す関数。labelnames を指定した場合は {ラベルの値のタプル: 値} の辞書を返します
+            type_name (str, optional): メトリクスの種類。デフォルトは"gauge"
+            labelnames (tuple, optional): ラベル名
+        """
+        self.name = name
+        self.description = description
+        self.fn = fn
+        self.type_name = type_name
+        self.labelnames = tuple(labelnames)
+
+    def samples(self):
+        """出力するサンプルの (名前, ラベル, 値) のリストを返す"""
+        try:
+            value = self.fn()
+        except Exception as e:
+            print(f"メトリクス {self.name} の取得中にエラーが発生しました: {e}")
+            return []
+        if value is None:
+            return []
+        if not self.labelnames:
+            return [(self.name, "", value)]
+        return [
+            (self.name, _format_labels(self.labelnames, labels), v)
+            for labels, v in sorted(value.items()) if v is not None
+        ]
+
+
+class MetricsRegistry:
+    """
+    メトリクスの登録と出力
+
+    Attributes:
+        prefix (str): すべてのメトリクス名に付ける接頭辞
+    """
+
+    def __init__(self, prefix=""):
+        """
+        MetricsRegistry クラスの初期化
+
+        Args:
+            prefix (str, optional): すべてのメトリクス名に付ける接頭辞
+        """
+        self.prefix = prefix
+        self._metrics = []
+
+    def counter(self, name, description, labelnames=()):
+        """
+        カウンターを登録します。
+
+        Returns:
+            Counter: 登録したカウンター
+        """
+        return self._register(Counter(self.prefix + name, description, labelnames))
+
+    def histogram(self, name, description, buckets=LATENCY_BUCKETS, labelnames=()):
+        """
+        ヒストグラムを登録します。
+
+        Returns:
+            Histogram: 登録したヒストグラム
+        """
+        return self._register(Histogram(self.prefix + name, description, buckets, labelnames))
+
+    def callback(self, name, description, fn, type_name="gauge", labelnames=()):
+        """
+        出力時に値を取得するメトリクスを登録します。
+
+        Returns:
+            CallbackMetric: 登録したメトリクス
+        """
+        return self._register(
+            CallbackMetric(self.prefix + name, description, fn, type_name, labelnames)
+        )
+
+    def _register(self, metric):
+        """メトリクスを登録する"""
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        """
+        登録されたすべてのメトリクスを Prometheus テキスト形式で出力します。
+
+        Returns:
+            str: Prometheus テキスト形式の文字列
+        """
+        lines = []
+        for metric in self._metrics:
+            lines.append(f"# HELP {metric.name} {metric.description}")
+            lines.append(f"# TYPE {metric.name} {metric.type_name}")
+            for name, labels, value in metric.samples():
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
@@ -0,0 +1,209 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+マイクロバッチ処理モジュール
+
+このモジュールは、翻訳サーバーに同時に届いたリクエストを短い時間窓の間だけ集め、
+1回のバッチ推論にまとめて実行するスケジューラを実装します。
+
+主な機能:
+- 時間窓（ミリ秒）と最大バッチサイズによるリクエストの収集
+- 生成設定ごとのグルーピング
+- 優先度の高いリクエストからのバッチ作成
+- 呼び出し元ごとの結果の振り分け
+- バッチサイズと待ち時間の統計情報
+"""
+
+import asyncio
+import itertools
+import time
+
+
+class MicroBatcher:
+    """
+    マイクロバッチスケジューラ
+
+    submit() で登録されたリクエストをキューに溜め、最初のリクエストが届いてから
+    window_ms ミリ秒経過するか、max_batch_size 件に達した時点でバッチとして
+    process_batch に渡します。同じバッチ内でも group_key が異なるものは
+    別々に処理されます。バッチ待ちのリクエストは優先度の値が小さいものから取り出されます。
+
+    Attributes:
+        max_batch_size (int): 1バッチあたりの最大リクエスト数
+        window_ms (float): バッチを集める時間窓（ミリ秒）
+        max_inflight_batches (int): 同時に実行できるバッチ数
+        max_queue_size (int): バッチ待ちにできるリクエストの最大数（0の場合は無制限）
+    """
+
+    def __init__(self, process_batch, max_batch_size=8, window_ms=10.0, max_inflight_batches=1,
+                 max_queue_size=0, wait_observer=None):
+        """
+        MicroBatcher クラスの初期化
+
+        Args:
+            process_batch (callable): ペイロードのリストを受け取り、同じ順序で結果のリストを返す
+                コルーチン関数。結果に Exception を含めると、その呼び出し元にだけ例外が送られます。
+            max_batch_size (int, optional): 1バッチあたりの最大リクエスト数。デフォルトは8
+            window_ms (float, optional): バッチを集める時間窓（ミリ秒）。デフォルトは10
+            max_inflight_batches (int, optional): 同時に実行できるバッチ数。デフォルトは1
+            max_queue_size (int, optional): バッチ待ちにできるリクエストの最大数。デフォルトは0（無制限）
+            wait_observer (callable, optional): バッチを開始するたびにリクエストごとの待ち時間（秒）で呼び出される関数
+        """
+        self.process_batch = process_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.window_ms = max(0.0, float(window_ms))
+        self.max_inflight_batches = max(1, int(max_inflight_batches))
+        self.max_queue_size = max(0, int(max_queue_size))
+        self.wait_observer = wait_observer
+
+        self._queue = None
+        self._sequence = itertools.count()
+        self._worker_task = None
+        self._inflight = None
+        self._batch_tasks = set()
+
+        # 統計情報
+        self._total_requests = 0
+        self._total_batches = 0
+        self._max_batch_seen = 0
+        self._batch_size_histogram = {}
+        self._total_queue_wait = 0.0
+        self._max_queue_wait = 0.0
+
+    def _ensure_started(self):
+        """イベントループ上でバッチ収集タスクを起動する（初回のみ）"""
+        if self._worker_task is None or self._worker_task.done():
+            self._queue = asyncio.PriorityQueue(maxsize=self.max_queue_size)
+            self._inflight = asyncio.Semaphore(self.max_inflight_batches)
+            self._worker_task = asyncio.get_running_loop().create_task(self._collect_loop())
+
+    async def submit(self, payload, group_key=None, priority=0):
+        """
+        リクエストをキューに登録し、バッチ処理の結果を待ちます。
+
+        Args:
+            payload: process_batch に渡すデータ
+            group_key (hashable, optional): 同じバッチにまとめられる条件を表すキー
+            priority (int, optional): 優先度（小さいほど先にバッチに入る）。デフォルトは0
+
+        Returns:
+            process_batch がこのペイロードに対して返した結果
+
+        Raises:
+            asyncio.QueueFull: バッチ待ちのリクエストが上限に達している場合
+            Exception: process_batch がこのペイロードに対して返した、または送出した例外
+        """
+        self._ensure_started()
+        future = asyncio.get_running_loop().create_future()
+        item = (payload, group_key, future, time.perf_counter(), priority)
+        self._queue.put_nowait((priority, next(self._sequence), item))
+        return await future
+
+    async def _collect_loop(self):
+        """キューからリクエストを集めてバッチを作成し続けるループ"""
+        while True:
+            await self._inflight.acquire()
+            try:
+                # 最初の1件が届くまで待機
+                batch = [(await self._queue.get())[2]]
+                deadline = time.perf_counter() + self.window_ms / 1000.0
+
+                # 時間窓の間、最大バッチサイズまでリクエストを集める
+                while len(batch) < self.max_batch_size:
+                    remaining = deadline - time.perf_counter()
+                    if remaining <= 0:
+                        # 時間切れでも、既に届いている分は取り込む
+                        if self._queue.empty():
+                            break
+                        batch.append(self._queue.get_nowait()[2])
+                        continue
+                    try:
+                        item = await asyncio.wait_for(self._queue.get(), timeout=remaining)
+                        batch.append(item[2])
+                    except asyncio.TimeoutError:
+                        break
+            except asyncio.CancelledError:
+                self._inflight.release()
+                raise
+
+            task = asyncio.get_running_loop().create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch):
+        """
+        集めたリクエストを group_key ごとに分けて実行し、結果を振り分けます。
+
+        Args:
+            batch (list): (payload, group_key, future, enqueued_at, priority) のリスト
+        """
+        try:
+            started_at = time.perf_counter()
+            groups = {}
+            for item in batch:
+                groups.setdefault(item[1], []).append(item)
+
+            # 時間窓の間に届いた優先度の高いリクエストのグループから実行する
+            for items in sorted(groups.values(), key=lambda items: min(item[4] for item in items)):
+                # 既にキャンセルされたリクエストは処理しない
+                items = [item for item in items if not item[2].done()]
+                if not items:
+                    continue
+                self._record_batch(items, started_at)
+
+                try:
+                    results = await self.process_batch([item[0] for item in items])
+                except Exception as e:
+                    results = [e] * len(items)
+
+                for (_, _, future, _, _), result in zip(items, results):
+                    if future.done():
+                        continue
+                    if isinstance(result, Exception):
+                        future.set_exception(result)
+                    else:
+                        future.set_result(result)
+        finally:
+            self._inflight.release()
+
+    def _record_batch(self, items, started_at):
+        """バッチサイズと待ち時間の統計情報を更新する"""
+        size = len(items)
+        self._total_batches += 1
+        self._total_requests += size
+        self._max_batch_seen = max(self._max_batch_seen, size)
+        self._batch_size_histogram[size] = self._batch_size_histogram.get(size, 0) + 1
+        for item in items:
+            wait = started_at - item[3]
+            self._total_queue_wait += wait
+            self._max_queue_wait = max(self._max_queue_wait, wait)
+            if self.wait_observer is not None:
+                self.wait_observer(wait)
+
+    def stats(self):
+        """
+        バッチ処理の統計情報を取得します。
+
+        Returns:
+            dict: バッチ数、平均・最大バッチサイズ、キュー待ち時間（ミリ秒）などを含む辞書
+        """
+        batches = self._total_batches
+        requests = self._total_requests
+        return {
+            "window_ms": self.window_ms,
+            "max_batch_size": self.max_batch_size,
+            "max_queue_size": self.max_queue_size,
+            "total_requests": requests,
+            "total_batches": batches,
+            "avg_batch_size": round(requests / batches, 3) if batches else 0.0,
+            "max_batch_size_seen": self._max_batch_seen,
+            "batch_size_histogram": {
+                str(k): v for k, v in sorted(self._batch_size_histogram.items())
+            },
+            "avg_queue_wait_ms": (
+                round(self._total_queue_wait / requests * 1000.0, 3) if requests else 0.0
+            ),
+            "max_queue_wait_ms": round(self._max_queue_wait * 1000.0, 3),
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+        }
@@ -0,0 +1,321 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+永続翻訳キャッシュモジュール
+
+このモジュールは、翻訳結果をSQLiteデータベースに保存し、サーバーを再起動しても
+再利用できるようにする永続キャッシュを実装します。
+
+主な機能:
+- テキストと翻訳設定をキーとした翻訳結果の保存と取得
+- バックグラウンドスレッドでのまとめ書き込み（リクエスト処理を待たせない）
+- 件数上限と保存期間による古いエントリの削除
+- モデルディレクトリが変更された場合の自動無効化
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+
+def compute_model_fingerprint(model_dir):
+    """
+    モデルディレクトリの内容を表すフィンガープリントを計算します。
+
+    ディレクトリ直下のファイル名、サイズ、更新日時からハッシュ値を作成します。
+    モデルファイルが置き換えられるとフィンガープリントも変わります。
+
+    Args:
+        model_dir (str): モデルディレクトリのパス
+
+    Returns:
+        str: フィンガープリント（16進文字列）
+    """
+    digest = hashlib.sha256()
+    try:
+        names = sorted(os.listdir(model_dir))
+    except OSError:
+        names = []
+    for name in names:
+        path = os.path.join(model_dir, name)
+        if not os.path.isfile(path):
+            continue
+        stat = os.stat(path)
+        digest.update(f"{name}\0{stat.st_size}\0{stat.st_mtime_ns}\n".encode("utf-8"))
+    return digest.hexdigest()
+
+
+def _serialize_key(key):
+    """キャッシュキーをデータベース用の文字列に変換する"""
+    raw = json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class PersistentTranslationCache:
+    """
+    SQLiteを使用した永続翻訳キャッシュ
+
+    読み込みは呼び出し元のスレッドで行い、書き込みとアクセス日時の更新は
+    バックグラウンドスレッドでまとめて行います。件数が max_entries を超えると
+    最も長くアクセスされていないエントリから削除され、max_age_days より古い
+    エントリも削除されます。
+
+    Attributes:
+        db_path (str): データベースファイルのパス
+        max_entries (int): 保存する最大件数
+        max_age_days (float): エントリを保持する日数（0の場合は無期限）
+    """
+
+    def __init__(self, db_path, model_fingerprint, max_entries=100000, max_age_days=30,
+                 flush_interval=1.0, flush_batch_size=64):
+        """
+        PersistentTranslationCache クラスの初期化
+
+        Args:
+            db_path (str): データベースファイルのパス
+            model_fingerprint (str): 現在のモデルのフィンガープリント。保存済みの値と異なる場合、
+                キャッシュはすべて削除されます
+            max_entries (int, optional): 保存する最大件数。デフォルトは100000
+            max_age_days (float, optional): エントリを保持する日数。デフォルトは30
+            flush_interval (float, optional): 書き込みをまとめる間隔（秒）。デフォルトは1.0
+            flush_batch_size (int, optional): この件数が溜まったら間隔を待たずに書き込む。デフォルトは64
+        """
+        self.db_path = db_path
+        self.max_entries = max(1, int(max_entries))
+        self.max_age_days = max(0.0, float(max_age_days))
+        self.flush_interval = max(0.01, float(flush_interval))
+        self.flush_batch_size = max(1, int(flush_batch_size))
+
+        self._lock = threading.Lock()
+        self._pending_puts = {}
+        self._pending_touches = {}
+        self._wakeup = threading.Event()
+        self._closed = False
+
+        # 統計情報
+        self._hits = 0
+        self._misses = 0
+        self._written = 0
+        self._deleted = 0
+        self._invalidated = False
+        # 件数は削除のたびに数え直し、統計情報ではこの値を返す（メトリクスの取得ごとに数えない）
+        self._entries = 0
+
+        directory = os.path.dirname(db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS entries ("
+            "key TEXT PRIMARY KEY, value TEXT NOT NULL, "
+            "created_at REAL NOT NULL, last_access REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE INDEX IF NOT EXISTS idx_entries_last_access ON entries(last_access)"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS meta (name TEXT PRIMARY KEY, value TEXT NOT NULL)"
+        )
+        self._check_fingerprint(model_fingerprint)
+        self._evict()
+
+        self._writer = threading.Thread(
+            target=self._writer_loop, name="persistent-cache-writer", daemon=True
+        )
+        self._writer.start()
+
+    def _check_fingerprint(self, model_fingerprint):
+        """保存済みのフィンガープリントと比較し、異なる場合はキャッシュを削除する"""
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT value FROM meta WHERE name = 'model_fingerprint'"
+            ).fetchone()
+            if row is not None and row[0] == model_fingerprint:
+                return
+            if row is not None:
+                print("モデルが変更されたため、永続翻訳キャッシュを削除します")
+                self._invalidated = True
+            self._conn.execute("DELETE FROM entries")
+            self._conn.execute(
+                "INSERT OR REPLACE INTO meta (name, value) VALUES ('model_fingerprint', ?)",
+                (model_fingerprint,)
+            )
+
+    def get(self, key):
+        """
+        翻訳結果を取得します。
+
+        Args:
+            key (tuple): TranslationCache.make_key() で作成したキャッシュキー
+
+        Returns:
+            str: 保存されている翻訳結果。存在しない場合はNone
+        """
+        return self.get_many([key])[0]
+
+    def get_many(self, keys):
+        """
+        複数の翻訳結果を1回の問い合わせで取得します。
+
+        Args:
+            keys (list[tuple]): TranslationCache.make_key() で作成したキャッシュキーのリスト
+
+        Returns:
+            list: keys と同じ順序の翻訳結果のリスト。存在しない要素はNone
+        """
+        if not keys:
+            return []
+        serialized = [_serialize_key(key) for key in keys]
+        found = {}
+        now = time.time()
+        with self._lock:
+            # 書き込み待ちのエントリも参照する
+            for db_key in serialized:
+                if db_key in self._pending_puts:
+                    found[db_key] = self._pending_puts[db_key][0]
+            missing = [db_key for db_key in serialized if db_key not in found]
+            # SQLiteのパラメータ数の上限を超えないように分割して問い合わせる
+            for start in range(0, len(missing), 500):
+                chunk = missing[start:start + 500]
+                placeholders = ",".join("?" * len(chunk))
+                rows = self._conn.execute(
+                    f"SELECT key, value FROM entries WHERE key IN ({placeholders})", chunk
+                ).fetchall()
+                found.update(rows)
+
+            results = []
+            for db_key in serialized:
+                value = found.get(db_key)
+                if value is None:
+                    self._misses += 1
+                else:
+                    self._hits += 1
+                    self._pending_touches[db_key] = now
+                results.append(value)
+        return results
+
+    def put(self, key, value):
+        """
+        翻訳結果を保存します。書き込みはバックグラウンドで行われます。
+
+        Args:
+            key (tuple): TranslationCache.make_key() で作成したキャッシュキー
+            value (str): 翻訳結果
+        """
+        if value is None or self._closed:
+            return
+        with self._lock:
+            self._pending_puts[_serialize_key(key)] = (value, time.time())
+            pending = len(self._pending_puts)
+        if pending >= self.flush_batch_size:
+            self._wakeup.set()
+
+    def _writer_loop(self):
+        """書き込み待ちのエントリを定期的にまとめて書き込むループ"""
+        while not self._closed:
+            self._wakeup.wait(self.flush_interval)
+            self._wakeup.clear()
+            try:
+                self.flush()
+            except Exception as e:
+                print(f"永続翻訳キャッシュの書き込み中にエラーが発生しました: {e}")
+
+    def flush(self):
+        """書き込み待ちのエントリとアクセス日時の更新をデータベースに反映する"""
+        with self._lock:
+            puts = self._pending_puts
+            touches = self._pending_touches
+            self._pending_puts = {}
+            self._pending_touches = {}
+            if not puts and not touches:
+                return
+
+            self._conn.execute("BEGIN")
+            try:
+                self._conn.executemany(
+                    "INSERT OR REPLACE INTO entries (key, value, created_at, last_access) "
+                    "VALUES (?, ?, ?, ?)",
+                    [
+                        (db_key, value, stored_at, stored_at)
+                        for db_key, (value, stored_at) in puts.items()
+                    ]
+                )
+                self._conn.executemany(
+                    "UPDATE entries SET last_access = ? WHERE key = ?",
+                    [(accessed_at, db_key) for db_key, accessed_at in touches.items()]
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+            self._written += len(puts)
+
+        if puts:
+            self._evict()
+
+    def _evict(self):
+        """保存期間を過ぎたエントリと、件数上限を超えたエントリを削除する"""
+        with self._lock:
+            deleted = 0
+            if self.max_age_days > 0:
+                cutoff = time.time() - self.max_age_days * 86400
+                deleted += self._conn.execute(
+                    "DELETE FROM entries WHERE last_access < ?", (cutoff,)
+                ).rowcount
+            count = self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+            if count > self.max_entries:
+                evicted = self._conn.execute(
+                    "DELETE FROM entries WHERE key IN "
+                    "(SELECT key FROM entries ORDER BY last_access ASC LIMIT ?)",
+                    (count - self.max_entries,)
+                ).rowcount
+                deleted += evicted
+                count -= max(0, evicted)
+            self._deleted += max(0, deleted)
+            self._entries = count
+
+    def close(self):
+        """書き込み待ちのエントリを反映してデータベースを閉じる"""
+        if self._closed:
+            return
+        self._closed = True
+        self._wakeup.set()
+        self._writer.join(timeout=5)
+        try:
+            self.flush()
+        except Exception as e:
+            print(f"永続翻訳キャッシュの書き込み中にエラーが発生しました: {e}")
+        with self._lock:
+            self._conn.close()
+
+    def stats(self):
+        """
+        永続キャッシュの統計情報を取得します。
+
+        件数はデータベースに問い合わせず、最後の書き込み（または起動時の削除）の後に数えた値を返します。
+
+        Returns:
+            dict: 件数、ヒット数、ミス数、書き込み数、削除数などを含む辞書
+        """
+        with self._lock:
+            entries = None if self._closed else self._entries
+            lookups = self._hits + self._misses
+            return {
+                "db_path": self.db_path,
+                "max_entries": self.max_entries,
+                "max_age_days": self.max_age_days,
+                "entries": entries,
+                "pending_writes": len(self._pending_puts),
+                "hits": self._hits,
+                "misses": self._misses,
+                "written": self._written,
+                "deleted": self._deleted,
+                "invalidated_on_startup": self._invalidated,
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
@@ -0,0 +1,326 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+モデル量子化モジュール
+
+このモジュールは、CPU推論を高速化するために翻訳モデルのLinear層へ
+動的int8量子化を適用する機能を提供します。
+
+主な機能:
+- Linear層への動的int8量子化
+- 量子化済みモデルのディスクキャッシュ（次回以降の起動で再量子化を省略）
+- fp32モデルとの速度・メモリ使用量・出力の差異の比較
+
+単体で実行すると、固定のサンプル文でfp32モデルとint8モデルを比較します:
+    python quantization.py [--model-dir モデルディレクトリ]
+"""
+
+import argparse
+import difflib
+import gc
+import io
+import os
+import sys
+import time
+
+import torch
+
+from file_lock import private_tmp_path
+
+# キャッシュファイルの形式が変わった場合に更新する
+QUANTIZED_CACHE_VERSION = 1
+
+
+def get_process_rss_mb():
+    """
+    現在のプロセスの常駐メモリサイズ（RSS）を取得します。
+
+    psutil が利用できない場合は取得できません。
+
+    Returns:
+        float: RSS（MB）。取得できない場合はNone
+    """
+    try:
+        import psutil
+        return psutil.Process(os.getpid()).memory_info().rss / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def get_peak_rss_mb():
+    """
+    現在のプロセスの常駐メモリサイズ（RSS）の最大値を取得します。
+
+    Returns:
+        float: ピークRSS（MB）。取得できない場合はNone
+    """
+    try:
+        import resource
+        # Linux ではキロバイト、macOS ではバイト単位
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+    except ImportError:
+        pass
+    try:
+        import psutil
+        # Windows ではワーキングセットの最大値を取得できる
+        return psutil.Process(os.getpid()).memory_info().peak_wset / (1024 * 1024)
+    except Exception:
+        return None
+
+
+def quantize_model_dynamic(model):
+    """
+    モデルのLinear層に動的int8量子化を適用します。
+
+    Args:
+        model (torch.nn.Module): fp32の翻訳モデル
+
+    Returns:
+        torch.nn.Module: 量子化されたモデル（元のモデルとは別のオブジェクト）
+    """
+    try:
+        from torch.ao.quantization import quantize_dynamic
+    except ImportError:
+        # 古いバージョンのPyTorch
+        from torch.quantization import quantize_dynamic
+    quantized = quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    quantized.eval()
+    return quantized
+
+
+def is_quantized(model):
+    """
+    モデルが動的量子化済みかどうかを確認します。
+
+    Args:
+        model (torch.nn.Module): 確認するモデル
+
+    Returns:
+        bool: 量子化されたLinear層を含む場合はTrue
+    """
+    for module in model.modules():
+        if "quantized" in type(module).__module__:
+            return True
+    return False
+
+
+def make_quantization_fingerprint(model_fingerprint):
+    """
+    量子化キャッシュの有効性を判定するフィンガープリントを作成します。
+
+    モデルファイルに加えて、PyTorchとtransformersのバージョンが変わった場合も
+    キャッシュを作り直します。
+
+    Args:
+        model_fingerprint (str): モデルディレクトリのフィンガープリント
+
+    Returns:
+        str: 量子化キャッシュのフィンガープリント
+    """
+    import transformers
+    return (
+        f"v{QUANTIZED_CACHE_VERSION}:{model_fingerprint}"
+        f":torch-{torch.__version__}:transformers-{transformers.__version__}"
+    )
+
+
+def load_quantized_model(cache_path, fingerprint):
+    """
+    ディスクにキャッシュされた量子化済みモデルを読み込みます。
+
+    Args:
+        cache_path (str): キャッシュファイルのパス
+        fingerprint (str): make_quantization_fingerprint() で作成したフィンガープリント
+
+    Returns:
+        torch.nn.Module: 量子化済みモデル。キャッシュが存在しないか古い場合はNone
+    """
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        # 自分で作成したローカルファイルなので、モデル全体を読み込む
+        try:
+            checkpoint = torch.load(cache_path, map_location="cpu", weights_only=False)
+        except TypeError:
+            # weights_only 引数がない古いバージョンのPyTorch
+            checkpoint = torch.load(cache_path, map_location="cpu")
+        if checkpoint.get("fingerprint") != fingerprint:
+            print("量子化済みモデルのキャッシュが古いため、作り直します")
+            return None
+        model = checkpoint["model"]
+        model.eval()
+        print(f"量子化済みモデルをキャッシュから読み込みました: {cache_path}")
+        return model
+    except Exception as e:
+        print(f"量子化済みモデルのキャッシュの読み込みに失敗しました: {e}")
+        return None
+
+
+def save_quantized_model(model, cache_path, fingerprint):
+    """
+    量子化済みモデルをディスクにキャッシュします。
+
+    書き込み途中で終了しても壊れたキャッシュが残らないよう、プロセスごとの一時ファイルに
+    書き込んでから置き換えます。
+
+    Args:
+        model (torch.nn.Module): 量子化済みモデル
+        cache_path (str): キャッシュファイルのパス
+        fingerprint (str): make_quantization_fingerprint() で作成したフィンガープリント
+    """
+    tmp_path = private_tmp_path(cache_path)
+    try:
+        os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+        torch.save({"fingerprint": fingerprint, "model": model}, tmp_path)
+        os.replace(tmp_path, cache_path)
+        print(f"量子化済みモデルをキャッシュに保存しました: {cache_path}")
+    except Exception as e:
+        print(f"量子化済みモデルのキャッシュの保存に失敗しました: {e}")
+        try:
+            os.remove(tmp_path)
+        except OSError:
+            pass
+
+
+def get_model_size_mb(model):
+    """
+    モデルの重みをシリアライズしたときのサイズを取得します。
+
+    Args:
+        model (torch.nn.Module): 対象のモデル
+
+    Returns:
+        float: state_dict のサイズ（MB）
+    """
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell() / (1024 * 1024)
+
+
+def _translate_all(model, tokenizer, texts, src_lang, tgt_lang, generation_kwargs):
+    """テキストを1件ずつ翻訳し、結果とそれぞれの所要時間を返す"""
+    results = []
+    latencies = []
+    tokenizer.src_lang = src_lang
+    with torch.inference_mode():
+        for text in texts:
+            started_at = time.perf_counter()
+            inputs = tokenizer(text, return_tensors="pt")
+            generated_tokens = model.generate(
+                **inputs,
+                forced_bos_token_id=tokenizer.get_lang_id(tgt_lang),
+                **generation_kwargs
+            )
+            results.append(tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0])
+            latencies.append(time.perf_counter() - started_at)
+    return results, latencies
+
+
+def compare_with_fp32(fp32_model, tokenizer, texts, src_lang="en", tgt_lang="ja",
+                      generation_kwargs=None):
+    """
+    fp32モデルと動的int8量子化モデルの速度・メモリ・出力を比較します。
+
+    fp32モデルから量子化モデルを作成し、同じテキストを両方で翻訳します。
+    最初の1件は初回実行のオーバーヘッドを除くため計測前に一度実行します。
+
+    Args:
+        fp32_model (torch.nn.Module): fp32の翻訳モデル
+        tokenizer: 翻訳モデルのトークナイザー
+        texts (list[str]): 比較に使用するテキストのリスト
+        src_lang (str, optional): ソース言語。デフォルトは"en"
+        tgt_lang (str, optional): ターゲット言語。デフォルトは"ja"
+        generation_kwargs (dict, optional): model.generate に渡す設定
+
+    Returns:
+        dict: 平均レイテンシ、モデルサイズ、RSS、出力の一致率と類似度を含む比較結果
+    """
+    generation_kwargs = generation_kwargs or {
+        "max_length": 200, "num_beams": 5, "early_stopping": True
+    }
+
+    rss_fp32 = get_process_rss_mb()
+    size_fp32 = get_model_size_mb(fp32_model)
+    _translate_all(fp32_model, tokenizer, texts[:1], src_lang, tgt_lang, generation_kwargs)
+    fp32_results, fp32_latencies = _translate_all(
+        fp32_model, tokenizer, texts, src_lang, tgt_lang, generation_kwargs
+    )
+
+    int8_model = quantize_model_dynamic(fp32_model)
+    size_int8 = get_model_size_mb(int8_model)
+    _translate_all(int8_model, tokenizer, texts[:1], src_lang, tgt_lang, generation_kwargs)
+    int8_results, int8_latencies = _translate_all(
+        int8_model, tokenizer, texts, src_lang, tgt_lang, generation_kwargs
+    )
+
+    # 出力の差異（完全一致率と文字単位の類似度）
+    exact_matches = sum(1 for a, b in zip(fp32_results, int8_results) if a == b)
+    similarities = [
+        difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(fp32_results, int8_results)
+    ]
+
+    samples = []
+    rows = zip(texts, fp32_results, int8_results, fp32_latencies, int8_latencies)
+    for text, a, b, t_a, t_b in rows:
+        samples.append({
+            "text": text,
+            "fp32": a,
+            "int8": b,
+            "fp32_ms": round(t_a * 1000, 1),
+            "int8_ms": round(t_b * 1000, 1),
+        })
+
+    avg_fp32 = sum(fp32_latencies) / len(fp32_latencies)
+    avg_int8 = sum(int8_latencies) / len(int8_latencies)
+    return {
+        "fp32_avg_latency_ms": round(avg_fp32 * 1000, 1),
+        "int8_avg_latency_ms": round(avg_int8 * 1000, 1),
+        "speedup": round(avg_fp32 / avg_int8, 2) if avg_int8 > 0 else None,
+        "fp32_model_size_mb": round(size_fp32, 1),
+        "int8_model_size_mb": round(size_int8, 1),
+        "rss_fp32_loaded_mb": round(rss_fp32, 1) if rss_fp32 is not None else None,
+        "rss_both_loaded_mb": round(get_process_rss_mb(), 1) if rss_fp32 is not None else None,
+        "exact_match_rate": round(exact_matches / len(texts), 3),
+        "avg_similarity": round(sum(similarities) / len(similarities), 3),
+        "samples": samples,
+    }
+
+
+def main():
+    """
+    fp32モデルとint8量子化モデルを比較して結果を表示するメイン関数
+
+    Returns:
+        None
+    """
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from sample_texts import SAMPLE_TEXTS
+
+    default_model_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "model", "m2m100_418M"
+    )
+    parser = argparse.ArgumentParser(description='fp32モデルとint8量子化モデルの比較')
+    parser.add_argument('--model-dir', default=default_model_dir, help='モデルディレクトリ')
+    args = parser.parse_args()
+
+    print(f"モデルを読み込んでいます: {args.model_dir}")
+    tokenizer = M2M100Tokenizer.from_pretrained(args.model_dir)
+    model = M2M100ForConditionalGeneration.from_pretrained(args.model_dir)
+    gc.collect()
+
+    report = compare_with_fp32(model, tokenizer, SAMPLE_TEXTS)
+    for sample in report.pop("samples"):
+        print(f"\n入力: {sample['text']}")
+        print(f"  fp32 ({sample['fp32_ms']} ms): {sample['fp32']}")
+        print(f"  int8 ({sample['int8_ms']} ms): {sample['int8']}")
+    print("\n比較結果:")
+    for name, value in report.items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    # 同じディレクトリのモジュールをインポートできるようにパスを追加
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,131 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+サーバー準備状態モジュール
+
+このモジュールは、翻訳サーバーの起動処理（モデルの読み込み、ウォームアップ）の進行状況を
+記録し、/health エンドポイントで返すための準備状態を実装します。
+
+主な機能:
+- 起動処理の状態（loading / warming / ready / failed）の管理
+- 起動処理の段階ごとの所要時間の記録
+- 起動処理が失敗した場合のエラー内容の保持
+- ウォームアップの計測結果などの付加情報の保持
+"""
+
+import threading
+import time
+from contextlib import contextmanager
+
+# 起動処理の状態
+STATE_LOADING = "loading"
+STATE_WARMING = "warming"
+STATE_READY = "ready"
+STATE_FAILED = "failed"
+
+
+class ServerReadiness:
+    """
+    翻訳サーバーの準備状態
+
+    起動処理はバックグラウンドスレッドで実行されるため、状態の更新と参照はロックで保護します。
+    stage() で囲んだ処理の所要時間が段階ごとに記録されます。
+
+    Attributes:
+        state (str): 現在の状態
+        stage_name (str): 実行中の段階の名前（実行中の段階がない場合はNone）
+        error (str): 起動処理が失敗した場合のエラー内容
+    """
+
+    def __init__(self):
+        """ServerReadiness クラスの初期化"""
+        self._lock = threading.Lock()
+        self._started_at = time.perf_counter()
+        self._stage_started_at = None
+        self._ready_after = None
+        self._timings = {}
+        self._details = {}
+        self.state = STATE_LOADING
+        self.stage_name = None
+        self.error = None
+
+    @property
+    def is_ready(self):
+        """翻訳リクエストを受け付けられる状態かどうか"""
+        return self.state == STATE_READY
+
+    @contextmanager
+    def stage(self, name, state=None):
+        """
+        起動処理の1つの段階を実行し、その所要時間を記録します。
+
+        Args:
+            name (str): 段階の名前（例: "model_load"）
+            state (str, optional): 段階の開始時に設定する状態
+        """
+        with self._lock:
+            if state is not None:
+                self.state = state
+            self.stage_name = name
+            self._stage_started_at = time.perf_counter()
+        try:
+            yield
+        finally:
+            with self._lock:
+                self._timings[name] = round(time.perf_counter() - self._stage_started_at, 3)
+                self.stage_name = None
+                self._stage_started_at = None
+
+    def set_detail(self, name, value):
+        """
+        /health で返す付加情報を記録します。
+
+        Args:
+            name (str): 付加情報の名前（例: "warmup"）
+            value: JSONに変換できる値
+        """
+        with self._lock:
+            self._details[name] = value
+
+    def set_ready(self):
+        """起動処理の完了を記録する"""
+        with self._lock:
+            self.state = STATE_READY
+            self._ready_after = round(time.perf_counter() - self._started_at, 3)
+        print(f"翻訳サーバーの準備が完了しました（{self._ready_after}秒）")
+
+    def set_failed(self, error):
+        """
+        起動処理の失敗を記録します。
+
+        Args:
+            error (Exception): 発生した例外
+        """
+        with self._lock:
+            self.state = STATE_FAILED
+            self.error = str(error)
+        print(f"翻訳サーバーの起動処理に失敗しました: {error}")
+
+    def snapshot(self):
+        """
+        現在の準備状態を取得します。
+
+        Returns:
+            dict: 状態、実行中の段階とその経過時間、段階ごとの所要時間、付加情報などを含む辞書
+        """
+        now = time.perf_counter()
+        with self._lock:
+            return {
+                "status": self.state,
+                "stage": self.stage_name,
+                "stage_elapsed_sec": (
+                    round(now - self._stage_started_at, 3)
+                    if self._stage_started_at is not None else None
+                ),
+                "uptime_sec": round(now - self._started_at, 3),
+                "ready_after_sec": self._ready_after,
+                "timings_sec": dict(self._timings),
+                "error": self.error,
+                "details": dict(self._details),
+            }
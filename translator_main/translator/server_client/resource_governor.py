@@ -0,0 +1,261 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+リソース配分モジュール
+
+このモジュールは、同じPCで動作する翻訳サーバー（torch）、OCR（Tesseract）、画像の前処理（OpenCV）と
+GUIの間で、CPUコアとスレッド数を分け合うための設定を行います。
+それぞれがすべてのコアを使おうとするとスレッドが奪い合いになり、翻訳やOCRの所要時間が不安定になるため、
+config.json の "resource_governor" の設定に従って各処理が使うコアとスレッド数を決めます。
+
+主な機能:
+- プリセット（GUI用にコアを残す "reserve_gui" など）と個別の設定の読み込み
+- CPUコアのGUI・OCR・翻訳サーバーへの割り当て
+- torch の演算スレッド数、OpenCV のスレッド数、Tesseract の OMP_THREAD_LIMIT の設定
+- プロセスのCPUアフィニティと優先度の設定（psutil が利用できる場合）
+
+config.json の設定例:
+    "resource_governor": {
+        "preset": "reserve_gui",
+        "gui_reserved_cores": 2
+    }
+"""
+
+import json
+import os
+
+# config.json のパス（プロジェクトのルートディレクトリ）
+CONFIG_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))),
+    "config.json"
+)
+
+# リソース配分のプリセット
+# 値が None の項目は、コアの割り当てから自動で決定する
+RESOURCE_PRESETS = {
+    # 何も変更しない（各ライブラリのデフォルトのまま）
+    "none": {
+        "enabled": False,
+    },
+    # GUI用にコアを残し、OCRと翻訳サーバーに残りのコアを分ける
+    "reserve_gui": {
+        "enabled": True,
+        "gui_reserved_cores": 2,  # GUIとOSのために残すコアの数
+        "ocr_cores": 2,  # OCR（Tesseract、OpenCV）に割り当てるコアの数
+        "pin_affinity": True,  # プロセスを割り当てたコアに固定する
+        "server": {
+            "torch_threads": None,  # 翻訳サーバーの演算スレッド数（Noneで割り当てたコア数）
+            "torch_interop_threads": 1,  # 演算間の並列実行に使用するスレッド数
+            "priority": "below_normal",  # 翻訳サーバーのプロセスの優先度
+        },
+        "ocr": {
+            "tesseract_threads": None,  # Tesseract の OMP_THREAD_LIMIT（Noneで割り当てたコア数）
+            "opencv_threads": None,  # cv2.setNumThreads に渡すスレッド数（Noneで割り当てたコア数）
+            "priority": "normal",  # GUIとOCRのプロセスの優先度
+        },
+    },
+}
+
+# 優先度の名前と、Windows の優先度クラスの属性名・Unix の nice 値の対応
+PRIORITY_LEVELS = {
+    "idle": ("IDLE_PRIORITY_CLASS", 19),
+    "below_normal": ("BELOW_NORMAL_PRIORITY_CLASS", 10),
+    "normal": ("NORMAL_PRIORITY_CLASS", 0),
+    "above_normal": ("ABOVE_NORMAL_PRIORITY_CLASS", -5),
+}
+
+
+def _merge(base, override):
+    """辞書を再帰的に結合する（override の値が優先される）"""
+    merged = dict(base)
+    for key, value in override.items():
+        if isinstance(value, dict) and isinstance(merged.get(key), dict):
+            merged[key] = _merge(merged[key], value)
+        else:
+            merged[key] = value
+    return merged
+
+
+def load_resource_settings(config=None, config_path=CONFIG_PATH):
+    """
+    config.json の "resource_governor" の設定を読み込み、プリセットと結合します。
+
+    Args:
+        config (dict, optional): 読み込み済みの設定。省略した場合は config_path から読み込みます
+        config_path (str, optional): config.json のパス
+
+    Returns:
+        dict: プリセットと個別の設定を結合したリソース配分の設定。無効な場合はNone
+    """
+    if config is None:
+        try:
+            with open(config_path, 'r', encoding='utf-8') as f:
+                config = json.load(f)
+        except FileNotFoundError:
+            return None
+        except Exception as e:
+            print(f"リソース配分の設定の読み込み中にエラーが発生しました: {e}")
+            return None
+
+    settings = config.get("resource_governor")
+    if not settings:
+        return None
+    preset_name = settings.get("preset", "reserve_gui")
+    preset = RESOURCE_PRESETS.get(preset_name)
+    if preset is None:
+        print(f"不明なリソース配分のプリセットです: {preset_name}（{', '.join(RESOURCE_PRESETS)} のいずれかを指定してください）")
+        return None
+    # プリセットの既定値に個別の設定を上書きする（未指定の項目は reserve_gui の値を使う）
+    merged = _merge(_merge(RESOURCE_PRESETS["reserve_gui"], preset), settings)
+    if not merged.get("enabled", True):
+        return None
+    return merged
+
+
+def plan_resources(settings, cpu_count=None):
+    """
+    CPUコアをGUI・OCR・翻訳サーバーに割り当て、それぞれのスレッド数を決定します。
+
+    コアは番号の小さい順に GUI、OCR、翻訳サーバーの順で割り当てます。
+    コアが足りない場合は、GUI用のコアを残すことを優先し、OCRと翻訳サーバーは同じコアを使います。
+
+    Args:
+        settings (dict): load_resource_settings() で読み込んだ設定
+        cpu_count (int, optional): CPUコア数。省略した場合は os.cpu_count()
+
+    Returns:
+        dict: "gui_cores"、"ocr"、"server" をキーとする割り当て結果の辞書
+    """
+    cpu_count = max(1, int(cpu_count or os.cpu_count() or 1))
+    cores = list(range(cpu_count))
+    gui_reserved = min(max(0, int(settings.get("gui_reserved_cores", 0))), cpu_count - 1)
+    ocr_count = max(1, int(settings.get("ocr_cores", 1)))
+
+    gui_cores = cores[:gui_reserved]
+    rest = cores[gui_reserved:]
+    if len(rest) > ocr_count:
+        ocr_cores = rest[:ocr_count]
+        server_cores = rest[ocr_count:]
+    else:
+        # 分けるほどコアがない場合は、OCRと翻訳サーバーで残りのコアを共有する
+        ocr_cores = rest
+        server_cores = rest
+
+    server_settings = settings.get("server", {})
+    ocr_settings = settings.get("ocr", {})
+    pin_affinity = bool(settings.get("pin_affinity", False))
+    return {
+        "cpu_count": cpu_count,
+        "gui_cores": gui_cores,
+        "server": {
+            "cores": server_cores if pin_affinity else None,
+            "torch_threads": int(server_settings.get("torch_threads") or len(server_cores)),
+            "torch_interop_threads": int(server_settings.get("torch_interop_threads") or 1),
+            "priority": server_settings.get("priority"),
+        },
+        "ocr": {
+            # GUIとOCRは同じプロセスで動作するため、GUI用のコアも含める
+            "cores": gui_cores + ocr_cores if pin_affinity else None,
+            "tesseract_threads": int(ocr_settings.get("tesseract_threads") or len(ocr_cores)),
+            "opencv_threads": int(ocr_settings.get("opencv_threads") or len(ocr_cores)),
+            "priority": ocr_settings.get("priority"),
+        },
+    }
+
+
+def set_process_affinity(cores):
+    """
+    このプロセスを指定したコアに固定します。子プロセスにも引き継がれます。
+
+    Args:
+        cores (list[int]): 使用するコアの番号
+
+    Returns:
+        bool: 設定できた場合はTrue
+    """
+    try:
+        if hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, cores)
+        else:
+            import psutil
+            psutil.Process().cpu_affinity(cores)
+        return True
+    except Exception as e:
+        print(f"CPUアフィニティを設定できませんでした: {e}")
+        return False
+
+
+def set_process_priority(priority):
+    """
+    このプロセスの優先度を設定します。
+
+    Args:
+        priority (str): 優先度（"idle"、"below_normal"、"normal"、"above_normal"）
+
+    Returns:
+        bool: 設定できた場合はTrue
+    """
+    if priority not in PRIORITY_LEVELS:
+        print(f"不明な優先度です: {priority}（{', '.join(PRIORITY_LEVELS)} のいずれかを指定してください）")
+        return False
+    windows_class, nice_value = PRIORITY_LEVELS[priority]
+    try:
+        import psutil
+        process = psutil.Process()
+        if hasattr(psutil, windows_class):
+            process.nice(getattr(psutil, windows_class))
+        else:
+            process.nice(nice_value)
+        return True
+    except Exception as e:
+        print(f"プロセスの優先度を設定できませんでした: {e}")
+        return False
+
+
+def _apply_process_settings(plan):
+    """アフィニティと優先度を設定する"""
+    if plan["cores"]:
+        set_process_affinity(plan["cores"])
+    if plan["priority"]:
+        set_process_priority(plan["priority"])
+
+
+def apply_server_limits(plan):
+    """
+    翻訳サーバーのプロセスにリソース配分を適用します。
+
+    アフィニティと優先度を設定します。torch のスレッド数は、ワーカー数に応じて
+    呼び出し元が plan["torch_threads"] を分け合って設定します。
+
+    Args:
+        plan (dict): plan_resources() の結果の "server"
+    """
+    _apply_process_settings(plan)
+    cores = f"コア {plan['cores'][0]}〜{plan['cores'][-1]}" if plan["cores"] else "すべてのコア"
+    print(f"リソース配分（翻訳サーバー）: {cores}、演算スレッド数 {plan['torch_threads']}、"
+          f"優先度 {plan['priority'] or '変更なし'}")
+
+
+def apply_ocr_limits(plan):
+    """
+    GUIとOCRのプロセスにリソース配分を適用します。
+
+    Tesseract は pytesseract が起動する子プロセスで動作するため、環境変数 OMP_THREAD_LIMIT で
+    スレッド数を制限します。アフィニティも子プロセスに引き継がれます。
+
+    Args:
+        plan (dict): plan_resources() の結果の "ocr"
+    """
+    os.environ["OMP_THREAD_LIMIT"] = str(plan["tesseract_threads"])
+    try:
+        import cv2
+        cv2.setNumThreads(plan["opencv_threads"])
+    except Exception as e:
+        print(f"OpenCVのスレッド数を設定できませんでした: {e}")
+    _apply_process_settings(plan)
+    cores = f"コア {plan['cores'][0]}〜{plan['cores'][-1]}" if plan["cores"] else "すべてのコア"
+    print(
+        f"リソース配分（OCR）: {cores}、Tesseract {plan['tesseract_threads']}スレッド、"
+        f"OpenCV {plan['opencv_threads']}スレッド、優先度 {plan['priority'] or '変更なし'}"
+    )
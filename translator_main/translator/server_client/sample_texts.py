@@ -0,0 +1,27 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+サンプルテキストモジュール
+
+このモジュールは、翻訳サーバーの性能比較や動作確認に使用する固定の英文サンプルを提供します。
+ゲーム画面のOCR結果を想定し、短いUIラベルから長めの段落までさまざまな長さの文を含みます。
+"""
+
+# 長さの異なる固定サンプル（短い順）
+SAMPLE_TEXTS = [
+    "Start",
+    "Save and quit",
+    "Are you sure you want to delete this file?",
+    "The door is locked. You need a key to open it.",
+    "Press the button on the left side of the screen to open the inventory menu.",
+    "Welcome back, traveler. The village has been quiet since you left, "
+    "but strange lights have been seen near the old tower every night.",
+    "Your progress will be saved automatically at each checkpoint. "
+    "If you turn off the power while the save icon is displayed, your data may be lost. "
+    "Please wait until the icon disappears before closing the game.",
+    "Long ago, the kingdom was protected by seven guardians who kept the ancient seal intact. "
+    "When the last guardian disappeared, monsters began to appear in the forests and mountains, "
+    "and the king sent out a call for brave adventurers to find the missing guardians "
+    "and restore the seal before it was too late.",
+]
@@ -0,0 +1,292 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+SentencePiece トークナイザーモジュール
+
+このモジュールは、M2M100のトークナイザーが内部で使用する SentencePiece のモデルを直接呼び出し、
+複数のテキストをまとめてトークナイズ・デコードする機能を提供します。
+transformers の M2M100Tokenizer は Python で実装された低速なトークナイザーで、ソース言語を
+トークナイザー全体の状態として持つため、呼び出しのたびにロックが必要です。
+このモジュールは言語トークンを自前で付加し、M2M100Tokenizer と同じトークンIDを返します。
+
+主な機能:
+- SentencePiece のバッチ呼び出しによるトークナイズ（言語トークンと終端トークンの付加を含む）
+- 言語トークンのIDのキャッシュ
+- パディングした入力テンソルの作成
+- 生成されたトークンIDのデコード
+- M2M100Tokenizer と結果が一致することの確認
+
+単体で実行すると、M2M100Tokenizer との結果の一致と所要時間を比較します:
+    python sentencepiece_tokenizer.py [--model-dir モデルディレクトリ]
+"""
+
+import argparse
+import os
+import re
+import sys
+
+import torch
+
+from timing import measure_ms
+
+# M2M100Tokenizer と結果が一致することを確認するテキスト（言語, テキスト）
+VERIFY_TEXTS = [
+    ("en", ""),
+    ("en", "  Leading and trailing spaces  "),
+    ("en", "Don't stop! It's 9:30 p.m., isn't it?"),
+    ("en", "HP +100 / MP -20 (x3) [Lv.42] 50% off"),
+    ("en", "Café, naïve, résumé — “quoted” ‘text’ …"),
+    ("ja", "ゲームを保存しますか？"),
+    ("ja", "HPが100回復した。「次へ」を押してください。"),
+    ("ja", "勇者は古い塔へ向かった…"),
+]
+
+
+class SentencePieceBatchTokenizer:
+    """
+    SentencePiece のモデルを直接呼び出す M2M100 用のトークナイザー
+
+    テキストに特殊トークン（</s> や __ja__ など）の文字列が含まれる場合は、
+    M2M100Tokenizer と同じ分割になるよう、そのテキストだけ M2M100Tokenizer でトークナイズします。
+    decode() と batch_decode() は M2M100Tokenizer と同じ引数で呼び出せます。
+
+    Attributes:
+        tokenizer: 元の M2M100Tokenizer
+    """
+
+    def __init__(self, tokenizer, tokenizer_lock):
+        """
+        SentencePieceBatchTokenizer クラスの初期化
+
+        Args:
+            tokenizer: M2M100Tokenizer のインスタンス
+            tokenizer_lock (threading.Lock): M2M100Tokenizer の src_lang の変更を保護するロック
+
+        Raises:
+            ValueError: SentencePiece のモデルや語彙を取得できないトークナイザーの場合
+        """
+        sp_model = getattr(tokenizer, "sp_model", None)
+        encoder = getattr(tokenizer, "encoder", None)
+        decoder = getattr(tokenizer, "decoder", None)
+        if sp_model is None or encoder is None or decoder is None:
+            raise ValueError("SentencePiece のモデルと語彙を持つ M2M100Tokenizer ではありません")
+        sp_model_kwargs = getattr(tokenizer, "sp_model_kwargs", None)
+        if sp_model_kwargs and sp_model_kwargs.get("enable_sampling"):
+            raise ValueError("サブワードのサンプリングが有効なトークナイザーでは同じ結果になりません")
+
+        self.tokenizer = tokenizer
+        self.tokenizer_lock = tokenizer_lock
+        self._sp_model = sp_model
+        self._encoder = encoder
+        self._decoder = decoder
+        self._unk_token_id = encoder[tokenizer.unk_token]
+        self._eos_token_id = tokenizer.eos_token_id
+        self._pad_token_id = tokenizer.pad_token_id
+        self._special_ids = frozenset(tokenizer.all_special_ids)
+        self._clean_up = bool(getattr(tokenizer, "clean_up_tokenization_spaces", False))
+        self._lang_ids = {}
+        # M2M100Tokenizer が分割の前に切り出す文字列（特殊トークンと追加されたトークン）
+        added_tokens = set(tokenizer.all_special_tokens) | set(tokenizer.get_added_vocab())
+        self._added_token_pattern = re.compile(
+            "|".join(re.escape(token) for token in sorted(added_tokens, key=len, reverse=True))
+        )
+
+    def lang_id(self, lang):
+        """
+        言語トークンのIDを取得します（キャッシュします）。
+
+        Args:
+            lang (str): 言語コード
+
+        Returns:
+            int: 言語トークンのID
+        """
+        token_id = self._lang_ids.get(lang)
+        if token_id is None:
+            token_id = self._lang_ids[lang] = self.tokenizer.get_lang_id(lang)
+        return token_id
+
+    def encode(self, texts, lang):
+        """
+        テキストをトークンIDのリストへ変換します。
+
+        Args:
+            texts (list[str]): トークナイズするテキストのリスト
+            lang (str): テキストの言語
+
+        Returns:
+            list[list[int]]: 言語トークンと終端トークンを含むトークンIDのリスト（M2M100Tokenizer と同じ）
+        """
+        prefix = self.lang_id(lang)
+        encoder = self._encoder
+        unk_token_id = self._unk_token_id
+        results = []
+        for text, pieces in zip(texts, self._sp_model.encode(list(texts), out_type=str)):
+            if self._added_token_pattern.search(text):
+                results.append(self._encode_slow(text, lang))
+                continue
+            ids = [prefix]
+            ids.extend(encoder.get(piece, unk_token_id) for piece in pieces)
+            ids.append(self._eos_token_id)
+            results.append(ids)
+        return results
+
+    def _encode_slow(self, text, lang):
+        """M2M100Tokenizer でトークナイズする"""
+        with self.tokenizer_lock:
+            self.tokenizer.src_lang = lang
+            return self.tokenizer(text)["input_ids"]
+
+    def pad(self, sequences):
+        """
+        トークンIDのリストを右側にパディングし、入力テンソルを作成します。
+
+        Args:
+            sequences (list[list[int]]): encode() の結果
+
+        Returns:
+            dict: input_ids と attention_mask のテンソルを含む辞書
+        """
+        max_length = max(len(ids) for ids in sequences)
+        input_ids = torch.full((len(sequences), max_length), self._pad_token_id, dtype=torch.long)
+        attention_mask = torch.zeros((len(sequences), max_length), dtype=torch.long)
+        for i, ids in enumerate(sequences):
+            input_ids[i, :len(ids)] = torch.tensor(ids, dtype=torch.long)
+            attention_mask[i, :len(ids)] = 1
+        return {"input_ids": input_ids, "attention_mask": attention_mask}
+
+    def __call__(self, texts, lang):
+        """
+        テキストをトークナイズしてパディングした入力テンソルを返します。
+
+        Args:
+            texts (list[str]): トークナイズするテキストのリスト
+            lang (str): テキストの言語
+
+        Returns:
+            dict: input_ids と attention_mask のテンソルを含む辞書
+        """
+        return self.pad(self.encode(texts, lang))
+
+    def decode(self, token_ids, skip_special_tokens=True):
+        """
+        トークンIDをテキストにデコードします。
+
+        Args:
+            token_ids (list[int] または torch.Tensor): トークンID
+            skip_special_tokens (bool, optional): 特殊トークンを除くかどうか。False の場合は M2M100Tokenizer でデコードします
+
+        Returns:
+            str: デコードしたテキスト
+        """
+        if hasattr(token_ids, "tolist"):
+            token_ids = token_ids.tolist()
+        if not skip_special_tokens:
+            return self.tokenizer.decode(token_ids, skip_special_tokens=False)
+        special_ids = self._special_ids
+        decoder = self._decoder
+        pieces = [
+            decoder[token_id] for token_id in token_ids
+            if token_id not in special_ids and token_id in decoder
+        ]
+        text = self._sp_model.decode(pieces).strip()
+        if self._clean_up:
+            text = self.tokenizer.clean_up_tokenization(text)
+        return text
+
+    def batch_decode(self, sequences, skip_special_tokens=True):
+        """
+        複数のトークンIDの列をテキストにデコードします。
+
+        Args:
+            sequences (list[list[int]] または torch.Tensor): トークンIDの列
+            skip_special_tokens (bool, optional): 特殊トークンを除くかどうか
+
+        Returns:
+            list[str]: デコードしたテキストのリスト
+        """
+        if hasattr(sequences, "tolist"):
+            sequences = sequences.tolist()
+        return [self.decode(ids, skip_special_tokens) for ids in sequences]
+
+    def verify(self, samples=None):
+        """
+        M2M100Tokenizer とトークナイズ・デコードの結果が一致することを確認します。
+
+        Args:
+            samples (list[tuple[str, str]], optional): (言語, テキスト) のリスト。省略した場合は VERIFY_TEXTS
+
+        Returns:
+            list[dict]: 結果が一致しなかったテキストと両方の結果のリスト（すべて一致した場合は空）
+        """
+        mismatches = []
+        for lang, text in samples or VERIFY_TEXTS:
+            expected_ids = self._encode_slow(text, lang)
+            actual_ids = self.encode([text], lang)[0]
+            if actual_ids != expected_ids:
+                mismatches.append({
+                    "text": text, "stage": "encode", "expected": expected_ids, "actual": actual_ids
+                })
+                continue
+            expected_text = self.tokenizer.decode(expected_ids, skip_special_tokens=True)
+            actual_text = self.decode(expected_ids)
+            if actual_text != expected_text:
+                mismatches.append({
+                    "text": text, "stage": "decode",
+                    "expected": expected_text, "actual": actual_text
+                })
+        return mismatches
+
+
+def main():
+    """
+    M2M100Tokenizer との結果の一致とトークナイズ・デコードの所要時間を比較するメイン関数
+
+    Returns:
+        None
+    """
+    import threading
+    from transformers import M2M100Tokenizer
+    from sample_texts import SAMPLE_TEXTS
+
+    default_model_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "model", "m2m100_418M"
+    )
+    parser = argparse.ArgumentParser(description='SentencePieceの直接呼び出しとM2M100Tokenizerの比較')
+    parser.add_argument('--model-dir', default=default_model_dir, help='モデルディレクトリ')
+    parser.add_argument('--rounds', type=int, default=200, help='計測の繰り返し回数')
+    args = parser.parse_args()
+
+    tokenizer = M2M100Tokenizer.from_pretrained(args.model_dir)
+    fast = SentencePieceBatchTokenizer(tokenizer, threading.Lock())
+
+    samples = VERIFY_TEXTS + [("en", text) for text in SAMPLE_TEXTS]
+    mismatches = fast.verify(samples)
+    for mismatch in mismatches:
+        print(f"不一致（{mismatch['stage']}）: {mismatch['text']}")
+        print(f"  M2M100Tokenizer: {mismatch['expected']}")
+        print(f"  SentencePiece: {mismatch['actual']}")
+    print(f"結果の一致: {len(samples) - len(mismatches)} / {len(samples)}")
+
+    # OCRの結果を想定した短いテキストのバッチ
+    texts = SAMPLE_TEXTS[:5]
+    tokenizer.src_lang = "en"
+    encoded = tokenizer(texts)["input_ids"]
+    timings = {
+        "tokenize_ms (M2M100Tokenizer)": measure_ms(
+            lambda: tokenizer(texts, return_tensors="pt", padding=True), args.rounds),
+        "tokenize_ms (SentencePiece)": measure_ms(lambda: fast(texts, "en"), args.rounds),
+        "decode_ms (M2M100Tokenizer)": measure_ms(
+            lambda: tokenizer.batch_decode(encoded, skip_special_tokens=True), args.rounds),
+        "decode_ms (SentencePiece)": measure_ms(lambda: fast.batch_decode(encoded), args.rounds),
+    }
+    print(f"\n所要時間（{len(texts)}件のバッチ、{args.rounds}回の平均）:")
+    for name, value in timings.items():
+        print(f"  {name}: {value:.3f}")
+
+
+if __name__ == "__main__":
+    # 同じディレクトリのモジュールをインポートできるようにパスを追加
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
@@ -0,0 +1,193 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+共有重みモジュール
+
+このモジュールは、複数のサーバーワーカープロセスで1つのモデルの重みを共有するための機能を提供します。
+model.safetensors をメモリマップし、重みのテンソルをファイルの内容を直接参照する形で作成するため、
+各ワーカーは重みのコピーを持たず、OSのページキャッシュ上の同じページを読み取ります。
+
+主な機能:
+- safetensors のヘッダーの読み取り
+- メモリマップした safetensors からの state_dict の作成（コピーなし）
+- meta デバイス上で重みを確保せずにモデルを作成し、メモリマップした重みを割り当てる読み込み
+- ワーカーごとの torch のスレッド数の設定
+"""
+
+import json
+import os
+import struct
+
+import torch
+
+# safetensors のデータ型と torch のデータ型の対応
+SAFETENSORS_DTYPES = {
+    "F64": torch.float64,
+    "F32": torch.float32,
+    "F16": torch.float16,
+    "BF16": torch.bfloat16,
+    "I64": torch.int64,
+    "I32": torch.int32,
+    "I16": torch.int16,
+    "I8": torch.int8,
+    "U8": torch.uint8,
+    "BOOL": torch.bool,
+}
+
+
+def read_safetensors_header(path):
+    """
+    safetensors ファイルのヘッダーを読み取ります。
+
+    Args:
+        path (str): safetensors ファイルのパス
+
+    Returns:
+        tuple: (ヘッダーの辞書（"__metadata__" を含む）, データ部の開始位置（バイト）)
+    """
+    with open(path, "rb") as f:
+        header_size = struct.unpack("<Q", f.read(8))[0]
+        header = json.loads(f.read(header_size))
+    return header, 8 + header_size
+
+
+def read_safetensors_metadata(path):
+    """
+    safetensors ファイルに保存されたメタデータを読み取ります。
+
+    Args:
+        path (str): safetensors ファイルのパス
+
+    Returns:
+        dict: メタデータ（保存されていない場合は空の辞書）
+    """
+    header, _ = read_safetensors_header(path)
+    return header.get("__metadata__") or {}
+
+
+def load_safetensors_mmap(path):
+    """
+    safetensors ファイルをメモリマップし、ファイルの内容を直接参照するテンソルの state_dict を作成します。
+
+    ファイルはコピーオンライトでマップされるため、重みを書き換えない限り
+    同じファイルをマップしたすべてのプロセスで物理メモリが共有されます。
+
+    Args:
+        path (str): safetensors ファイルのパス
+
+    Returns:
+        dict: パラメータ名とテンソルの辞書
+    """
+    header, data_start = read_safetensors_header(path)
+    header.pop("__metadata__", None)
+    size = os.path.getsize(path)
+    storage = torch.UntypedStorage.from_file(path, shared=False, nbytes=size)
+    flat = torch.empty(0, dtype=torch.uint8).set_(storage)
+
+    state_dict = {}
+    for name, info in header.items():
+        dtype = SAFETENSORS_DTYPES[info["dtype"]]
+        start, end = info["data_offsets"]
+        data = flat[data_start + start:data_start + end]
+        try:
+            tensor = data.view(dtype)
+        except RuntimeError:
+            # 開始位置がデータ型の境界に揃っていない場合はコピーする
+            tensor = data.clone().view(dtype)
+        state_dict[name] = tensor.reshape(info["shape"])
+    return state_dict
+
+
+def load_model_mmap(model_cls, model_dir, dtype=None):
+    """
+    meta デバイス上でモデルを作成し、メモリマップした model.safetensors の重みを割り当てます。
+
+    モデルの作成時にはパラメータのメモリを確保しないため、使用するメモリはメモリマップした重みだけです。
+    ファイルに保存されないバッファ（正弦波の位置埋め込みなど）は、重みを割り当てた後に計算し直します。
+    読み込めない場合は呼び出し元が通常の from_pretrained() にフォールバックできるよう、Noneを返します。
+
+    Args:
+        model_cls: モデルのクラス（M2M100ForConditionalGeneration など）
+        model_dir (str): モデルディレクトリのパス
+        dtype (torch.dtype, optional): 重みの数値型。bf16 / fp16 のスナップショットを読み込む場合に指定します
+
+    Returns:
+        モデル。読み込めない場合はNone
+    """
+    model_file = os.path.join(model_dir, "model.safetensors")
+    if not os.path.exists(model_file):
+        return None
+    try:
+        from transformers import AutoConfig
+        from transformers.modeling_utils import no_init_weights
+
+        config = AutoConfig.from_pretrained(model_dir)
+        with no_init_weights(), torch.device("meta"):
+            model = model_cls(config)
+        state_dict = load_safetensors_mmap(model_file)
+        # 共有された重み（埋め込みと出力層など）はファイルに1つだけ保存されているため、後で結び付け直す
+        _, unexpected = model.load_state_dict(state_dict, strict=False, assign=True)
+        model.tie_weights()
+        _materialize_buffers(model)
+        missing = [name for name, param in model.named_parameters() if param.is_meta]
+        if missing or unexpected:
+            print(f"メモリマップした重みがモデルと一致しません（不足: {missing[:5]}、余分: {unexpected[:5]}）")
+            return None
+        if dtype is not None:
+            # 重みは既に dtype のため、ファイルに含まれないバッファ（位置埋め込みなど）だけが変換される
+            model.to(dtype)
+        model.eval()
+        return model
+    except Exception as e:
+        print(f"重みのメモリマップに失敗しました: {e}")
+        return None
+
+
+def _materialize_buffers(model):
+    """meta デバイスに残ったバッファ（ファイルに保存されない位置埋め込み）を計算し直す"""
+    for module_name, module in model.named_modules():
+        for name, buffer in list(module.named_buffers(recurse=False)):
+            if not buffer.is_meta:
+                continue
+            if name != "weights" or not hasattr(module, "get_embedding"):
+                raise ValueError(f"meta デバイスのバッファを作成できません: {module_name}.{name}")
+            # M2M100SinusoidalPositionalEmbedding の位置埋め込みはモデルの設定だけから決まる
+            num_embeddings, embedding_dim = buffer.shape
+            weights = module.get_embedding(num_embeddings, embedding_dim, module.padding_idx)
+            module.register_buffer(name, weights.to(buffer.dtype), persistent=False)
+
+
+def resolve_worker_threads(workers, threads=0):
+    """
+    ワーカー1つあたりの演算スレッド数を決定します。
+
+    Args:
+        workers (int): ワーカープロセスの数
+        threads (int, optional): 指定されたスレッド数。0の場合はCPUコア数をワーカー数で割った値
+
+    Returns:
+        int: ワーカー1つあたりの演算スレッド数
+    """
+    if threads > 0:
+        return int(threads)
+    return max(1, (os.cpu_count() or 1) // max(1, int(workers)))
+
+
+def configure_torch_threads(num_threads, interop_threads=1):
+    """
+    このプロセスの torch の演算スレッド数を設定します。
+
+    複数のワーカーがそれぞれすべてのコアを使おうとすると、スレッドの奪い合いで遅くなるため、
+    ワーカーごとにコアを分け合うスレッド数に固定します。
+
+    Args:
+        num_threads (int): 演算スレッド数
+        interop_threads (int, optional): 演算間の並列実行に使用するスレッド数。デフォルトは1
+    """
+    torch.set_num_threads(num_threads)
+    try:
+        # 並列処理が一度でも始まった後は変更できない
+        torch.set_num_interop_threads(interop_threads)
+    except RuntimeError:
+        pass
@@ -0,0 +1,189 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+テキスト分割モジュール
+
+このモジュールは、長いテキストを文の区切りでトークン数の上限以下のチャンクに分割し、
+チャンクごとの翻訳結果を元の段落構成に戻して結合する機能を提供します。
+長い段落を1つの系列として翻訳すると遅く、モデルが扱える長さを超えると訳抜けが起きるため、
+チャンクに分けて1つのバッチとしてまとめて翻訳します。
+
+主な機能:
+- 改行による行の区切りの維持（OCRによる行の折り返しは1つの文としてつなげる）
+- 英文の文単位の分割（Mr. や e.g. などの略語では区切らない）
+- トークン数の上限を超える文の句読点・単語単位での分割
+- チャンクの翻訳結果の結合
+"""
+
+import re
+
+# 文末の記号の後に空白があり、次の文が大文字・数字・引用符で始まる位置を文の区切りとする
+SENTENCE_BOUNDARY = re.compile(r'[.!?]+["\'”’)\]]*\s+(?=["\'“‘(\[]?[A-Z0-9])')
+
+# 文の区切りとして扱わない略語（小文字で比較する）
+ABBREVIATIONS = {
+    "mr", "mrs", "ms", "dr", "prof", "st", "vs", "etc", "e.g", "i.e", "no", "fig", "vol", "approx",
+    "jr", "sr",
+}
+
+# 長い文を分割するときの区切り（句読点の後の空白）
+CLAUSE_BOUNDARY = re.compile(r'(?<=[,;:])\s+')
+
+# 行末がこれらの文字で終わる行は、次の行とつなげない
+LINE_TERMINATORS = tuple('.!?:;"”’)]')
+
+
+class ChunkedText:
+    """
+    チャンクに分割したテキスト
+
+    Attributes:
+        chunks (list[str]): 翻訳するチャンクのリスト
+        prefixes (list[str]): 各チャンクの翻訳結果の前に付ける文字列（改行やチャンク同士の区切り）
+    """
+
+    def __init__(self, chunks, prefixes):
+        """
+        ChunkedText クラスの初期化
+
+        Args:
+            chunks (list[str]): 翻訳するチャンクのリスト
+            prefixes (list[str]): 各チャンクの翻訳結果の前に付ける文字列
+        """
+        self.chunks = chunks
+        self.prefixes = prefixes
+
+    def join(self, translations):
+        """
+        チャンクごとの翻訳結果を元の行の構成に戻して結合します。
+
+        Args:
+            translations (list[str]): chunks と同じ順序の翻訳結果
+
+        Returns:
+            str: 結合した翻訳結果
+        """
+        return "".join(prefix + text.strip() for prefix, text in zip(self.prefixes, translations))
+
+
+def _is_soft_line_break(line, next_line):
+    """行の折り返し（文の途中での改行）かどうかを判定する"""
+    return not line.endswith(LINE_TERMINATORS) and next_line[:1].islower()
+
+
+def split_lines(text):
+    """
+    テキストを行に分割します。
+
+    文の途中で折り返された行は空白でつなげて1行にします。
+    空行を含む改行は、そのままの数だけ区切りとして残します。
+
+    Args:
+        text (str): 分割するテキスト
+
+    Returns:
+        tuple: (行のリスト, 各行の前の改行のリスト（先頭の行は空文字列）)
+    """
+    parts = re.split(r'([ \t\r\f\v]*\n\s*)', text.strip())
+    lines = [parts[0]]
+    separators = [""]
+    for separator, line in zip(parts[1::2], parts[2::2]):
+        newlines = separator.count("\n")
+        if newlines == 1 and _is_soft_line_break(lines[-1], line):
+            lines[-1] = f"{lines[-1]} {line}"
+        else:
+            lines.append(line)
+            separators.append("\n" * newlines)
+    return lines, separators
+
+
+def split_sentences(text):
+    """
+    英文を文に分割します。
+
+    Args:
+        text (str): 分割するテキスト（改行を含まない1行）
+
+    Returns:
+        list[str]: 文のリスト
+    """
+    sentences = []
+    start = 0
+    for match in SENTENCE_BOUNDARY.finditer(text):
+        words = text[start:match.start()].split()
+        if words and words[-1].lower().rstrip(".") in ABBREVIATIONS:
+            continue
+        sentences.append(text[start:match.end()].strip())
+        start = match.end()
+    rest = text[start:].strip()
+    if rest:
+        sentences.append(rest)
+    return sentences
+
+
+def _split_long_sentence(sentence, count_tokens, max_tokens):
+    """トークン数の上限を超える文を句読点の区切り、それでも長い場合は単語の区切りで分割する"""
+    pieces = []
+    for clause in _pack(CLAUSE_BOUNDARY.split(sentence), " ", count_tokens, max_tokens):
+        if count_tokens(clause) <= max_tokens:
+            pieces.append(clause)
+        else:
+            pieces.extend(_pack(clause.split(), " ", count_tokens, max_tokens))
+    return pieces
+
+
+def _pack(parts, separator, count_tokens, max_tokens):
+    """トークン数の上限を超えない範囲で、隣り合う部分をつなげる"""
+    packed = []
+    current = None
+    current_tokens = 0
+    for part in parts:
+        tokens = count_tokens(part)
+        if current is not None and current_tokens + tokens <= max_tokens:
+            current = f"{current}{separator}{part}"
+            current_tokens += tokens
+        else:
+            if current is not None:
+                packed.append(current)
+            current = part
+            current_tokens = tokens
+    if current is not None:
+        packed.append(current)
+    return packed
+
+
+def chunk_text(text, count_tokens, max_tokens=160, joiner=""):
+    """
+    テキストを行と文の区切りでトークン数の上限以下のチャンクに分割します。
+
+    1つのチャンクには同じ行の連続した文だけをまとめるため、改行の位置は翻訳結果でも維持されます。
+
+    Args:
+        text (str): 分割するテキスト
+        count_tokens (callable): 文字列のトークン数（特殊トークンを除く）を返す関数
+        max_tokens (int, optional): 1チャンクあたりの最大トークン数。デフォルトは160
+        joiner (str, optional): 同じ行のチャンクの翻訳結果をつなぐ文字列。日本語の場合は空文字列
+
+    Returns:
+        ChunkedText: チャンクに分割したテキスト
+    """
+    max_tokens = max(1, int(max_tokens))
+    chunks = []
+    prefixes = []
+    lines, separators = split_lines(text)
+    for line, separator in zip(lines, separators):
+        if count_tokens(line) <= max_tokens:
+            line_chunks = [line]
+        else:
+            sentences = []
+            for sentence in split_sentences(line):
+                if count_tokens(sentence) <= max_tokens:
+                    sentences.append(sentence)
+                else:
+                    sentences.extend(_split_long_sentence(sentence, count_tokens, max_tokens))
+            line_chunks = _pack(sentences, " ", count_tokens, max_tokens)
+        for i, chunk in enumerate(line_chunks):
+            chunks.append(chunk)
+            prefixes.append(separator if i == 0 else joiner)
+    return ChunkedText(chunks, prefixes)
@@ -0,0 +1,29 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+所要時間計測モジュール
+
+このモジュールは、トークナイザーやデコードの高速化の効果を起動時やコマンドラインで
+比較するための、所要時間の計測を実装します。
+"""
+
+import time
+
+
+def measure_ms(fn, rounds=1):
+    """
+    関数を繰り返し実行し、1回あたりの平均所要時間を計測します。
+
+    Args:
+        fn (callable): 計測する引数なしの関数
+        rounds (int, optional): 繰り返し回数。デフォルトは1
+
+    Returns:
+        float: 1回あたりの平均所要時間（ミリ秒）
+    """
+    rounds = max(1, int(rounds))
+    started_at = time.perf_counter()
+    for _ in range(rounds):
+        fn()
+    return (time.perf_counter() - started_at) * 1000 / rounds
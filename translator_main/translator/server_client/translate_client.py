@@ -11,7 +11,10 @@
 - 翻訳サーバーへのHTTPリクエスト
 - リトライ機能
 - 内部翻訳機能（パッケージ化されている場合）
-- 改行の維持機能
+- 複数テキストの一括翻訳
+- 生成中の翻訳結果を逐次受け取るストリーミング翻訳
+- 速報の翻訳結果の後にビームサーチの翻訳結果を受け取る2段階翻訳
+- 新しい翻訳で不要になった翻訳のキャンセル
 """
 
 import requests
@@ -19,6 +22,8 @@ import json
 import time
 import sys
 import os
+import threading
+import uuid
 
 # PyInstallerでパッケージ化されているかどうかを確認する関数
 def is_packaged():
@@ -39,8 +44,15 @@ class TranslateClient:
     
     Attributes:
         server_url (str): 翻訳サーバーのURL
+        batch_url (str): 一括翻訳エンドポイントのURL
+        stream_url (str): ストリーミング翻訳エンドポイントのURL
+        cascade_url (str): 2段階翻訳エンドポイントのURL
+        cancel_url (str): キャンセルエンドポイントのURL
+        jobs_url (str): 翻訳ジョブエンドポイントのURL
         max_retries (int): 接続試行回数
         retry_delay (int): 再試行の間隔（秒）
+        poll_wait (float): ロングポーリングで1回に待つ秒数
+        job_timeout (float): 翻訳ジョブの結果を待つ最大秒数
         internal_translator (TranslatorModel, optional): 内部翻訳モデルのインスタンス
     """
     def __init__(self, server_url: str = "http://127.0.0.1:11451/translate"):
@@ -51,9 +63,20 @@ class TranslateClient:
             server_url (str, optional): 翻訳サーバーのURL。デフォルトは"http://127.0.0.1:11451/translate"
         """
         self.server_url = server_url
+        # 一括翻訳・ストリーミング翻訳エンドポイントは /translate と同じ階層にある
+        self.batch_url = server_url.rsplit("/", 1)[0] + "/translate_batch"
+        self.stream_url = server_url.rsplit("/", 1)[0] + "/translate_stream"
+        self.cascade_url = server_url.rsplit("/", 1)[0] + "/translate_cascade"
+        self.cancel_url = server_url.rsplit("/", 1)[0] + "/cancel"
+        self.jobs_url = server_url.rsplit("/", 1)[0] + "/jobs"
         self.max_retries = 3
         self.retry_delay = 2  # 秒
+        self.poll_wait = 15  # 秒
+        self.job_timeout = 120  # 秒
         self.internal_translator = None
+        # 実行中の翻訳のリクエストID（新しい翻訳を始めるときにキャンセルする）
+        self._request_lock = threading.Lock()
+        self._active_request_id = None
         
         # パッケージ化されている場合は内部翻訳機能を初期化
         if is_packaged():
@@ -70,17 +93,102 @@ class TranslateClient:
                 print("サーバー接続モードで動作します")
                 self.internal_translator = None
 
-    def translate(self, text: str) -> str:
+    def cancel(self, request_id: str) -> bool:
+        """
+        実行中の翻訳をサーバー側でキャンセルします。
+
+        Args:
+            request_id (str): キャンセルする翻訳のリクエストID
+
+        Returns:
+            bool: キャンセルされた翻訳があった場合はTrue。サーバーに接続できなかった場合はFalse
+        """
+        try:
+            response = requests.post(self.cancel_url, json={"request_id": request_id}, timeout=2)
+            response.raise_for_status()
+            return bool(response.json().get("cancelled"))
+        except (requests.RequestException, ValueError) as e:
+            print(f"翻訳のキャンセルに失敗しました: {e}")
+            return False
+
+    def _begin_request(self) -> str:
+        """
+        新しい翻訳のリクエストIDを作成し、実行中の前の翻訳があればキャンセルします。
+
+        Returns:
+            str: 新しい翻訳のリクエストID
+        """
+        request_id = uuid.uuid4().hex
+        with self._request_lock:
+            previous = self._active_request_id
+            self._active_request_id = request_id
+        if previous is not None and self.cancel(previous):
+            print(f"新しい翻訳を始めるため、前の翻訳をキャンセルしました（request_id: {previous}）")
+        return request_id
+
+    def _end_request(self, request_id: str):
+        """
+        翻訳の完了を記録します。
+
+        Args:
+            request_id (str): _begin_request() で作成したリクエストID
+        """
+        with self._request_lock:
+            if self._active_request_id == request_id:
+                self._active_request_id = None
+
+    def cancel_active(self) -> bool:
+        """
+        実行中の翻訳があれば、サーバー側でキャンセルします。
+
+        アプリケーションの終了時など、翻訳の完了を待たずに止めたい場合に使用します。
+        キャンセルされた翻訳は、translate() などの呼び出し元にエラーメッセージを返して終了します。
+
+        Returns:
+            bool: キャンセルされた翻訳があった場合はTrue
+        """
+        with self._request_lock:
+            request_id = self._active_request_id
+        return request_id is not None and self.cancel(request_id)
+
+    def _retry_wait(self, error) -> float:
+        """
+        再試行までに待つ秒数を決定します。
+
+        サーバーが混雑していて Retry-After ヘッダー付きで拒否された場合は、その秒数だけ待ちます。
+
+        Args:
+            error (Exception): 発生した例外
+
+        Returns:
+            float: 再試行までに待つ秒数
+        """
+        response = getattr(error, "response", None)
+        if response is not None and response.status_code == 429:
+            try:
+                return max(self.retry_delay, float(response.headers.get("Retry-After", 0)))
+            except ValueError:
+                pass
+        return self.retry_delay
+
+    def translate(self, text: str, quality: str = None, priority: str = None) -> str:
         """
         同期的に翻訳リクエストを送信し、結果を取得します。
 
         翻訳処理は以下の優先順で行われます：
         1. パッケージ化されていて内部翻訳機能が利用可能な場合は、それを使用
-        2. 内部翻訳機能が利用できない場合は、翻訳サーバーに接続して翻訳を行う
-        3. 接続に失敗した場合は、指定された回数まで再試行
+        2. 内部翻訳機能が利用できない場合は、翻訳サーバーに翻訳ジョブを登録して結果を待つ
+        3. 接続に失敗した場合は、指定された回数まで再試行（登録済みのジョブの結果を待ち直す）
+
+        前の translate() または translate_stream() の翻訳がまだ実行中の場合は、
+        新しい翻訳を送る前にサーバー側で前の翻訳をキャンセルします。
 
         Args:
             text (str): 翻訳したいテキスト
+            quality (str, optional): 品質/速度のヒント（"fast"、"balanced"、"quality"）。
+                指定しない場合はサーバーの設定に従います
+            priority (str, optional): 優先度レーン（"interactive"、"bulk"）。
+                指定しない場合は "interactive"（ユーザーが結果を待っている翻訳）として扱われます
 
         Returns:
             str: 翻訳結果の文字列。翻訳に失敗した場合はエラーメッセージ
@@ -88,34 +196,152 @@ class TranslateClient:
         if not text or text.strip() == "":
             return "翻訳するテキストが空です。"
         
-        # 改行を特殊なマーカーに置き換え（翻訳サーバーが改行を維持しない場合の対策）
-        NEWLINE_MARKER = "[NEWLINE_MARKER_XYZ]"
-        text_with_markers = text.replace("\n", NEWLINE_MARKER)
-        
+        # 改行はサーバーがテキストを行と文の単位に分割して維持する
         # パッケージ化されていて内部翻訳機能が利用可能な場合
         if is_packaged() and self.internal_translator:
             try:
-                result = self.internal_translator.translate(text_with_markers)
-                # 翻訳結果の特殊マーカーを改行に戻す
-                return result.replace(NEWLINE_MARKER, "\n")
+                return self.internal_translator.translate(text)
             except Exception as e:
                 print(f"内部翻訳処理でエラーが発生しました: {e}")
                 print("サーバー接続モードにフォールバックします")
         
+        request_id = self._begin_request()
+        try:
+            return self._request_translation(text, quality, priority, request_id)
+        finally:
+            self._end_request(request_id)
+
+    def _request_translation(self, text: str, quality: str, priority: str, request_id: str) -> str:
+        """
+        翻訳ジョブを登録し、ロングポーリングで翻訳結果を取得します。
+
+        タイムアウトや接続エラーで再試行する場合は、登録済みのジョブの結果を待ち直すため、
+        サーバー上で同じ翻訳が二重に実行されることはありません。
+        ジョブが見つからない場合（保持期間切れやサーバーの再起動）や、待ち行列があふれて
+        ジョブが失敗した場合は、ジョブを登録し直します。
+        ジョブはサーバーのワーカープロセスごとに管理されるため、登録と結果の取得は同じ接続で行います。
+
+        Args:
+            text (str): 翻訳したいテキスト
+            quality (str): 品質/速度のヒント
+            priority (str): 優先度レーン
+            request_id (str): 翻訳のリクエストID
+
+        Returns:
+            str: 翻訳結果の文字列。翻訳に失敗した場合はエラーメッセージ
+        """
+        payload = {"text": text, "request_id": request_id}
+        if quality:
+            payload["quality"] = quality
+        if priority:
+            payload["priority"] = priority
+        job_id = None
+        deadline = time.monotonic() + self.job_timeout
+
+        # 複数ワーカーのサーバーでも同じワーカーに問い合わせるよう、ジョブの登録から結果の取得まで同じ接続を使う
+        with requests.Session() as session:
+            # リトライ処理を実装（結果を待っている間のポーリングは試行回数に数えない）
+            for attempt in range(self.max_retries):
+                try:
+                    if job_id is None:
+                        print(f"翻訳サーバーに翻訳ジョブを登録しています... (試行 {attempt + 1}/{self.max_retries})")
+                        response = session.post(self.jobs_url, json=payload, timeout=10)
+                        response.raise_for_status()
+                        job = response.json()
+                        job_id = job.get("job_id")
+                        if job_id is None:
+                            return job.get("error", "翻訳結果が取得できませんでした。")
+                    else:
+                        print(f"翻訳ジョブの結果を待ち直しています... "
+                              f"(job_id: {job_id}, 試行 {attempt + 1}/{self.max_retries})")
+                        job = {"status": "pending"}
+
+                    while job.get("status") == "pending":
+                        if time.monotonic() > deadline:
+                            self.cancel(request_id)
+                            return "翻訳がタイムアウトしました。"
+                        response = session.get(
+                            f"{self.jobs_url}/{job_id}",
+                            params={"wait": self.poll_wait},
+                            timeout=self.poll_wait + 10
+                        )
+                        if response.status_code in (404, 429):
+                            # ジョブが失われたか待ち行列があふれたため、次の試行で登録し直す
+                            job_id = None
+                        response.raise_for_status()
+                        job = response.json()
+
+                    if "error" in job:
+                        return job["error"]
+                    return job.get("result", "翻訳結果が取得できませんでした。")
+                except requests.Timeout:
+                    print(f"リクエストがタイムアウトしました。再試行します... ({attempt + 1}/{self.max_retries})")
+                    if attempt < self.max_retries - 1:
+                        time.sleep(self.retry_delay)
+                except requests.ConnectionError as e:
+                    print(f"サーバー接続エラー: {e}")
+                    print(f"翻訳サーバーが起動していない可能性があります。再試行します... ({attempt + 1}/{self.max_retries})")
+                    if attempt < self.max_retries - 1:
+                        time.sleep(self.retry_delay)
+                except (requests.RequestException, ValueError) as e:
+                    print(f"リクエスト中にエラーが発生しました: {e}")
+                    if attempt < self.max_retries - 1:
+                        print(f"再試行します... ({attempt + 1}/{self.max_retries})")
+                        time.sleep(self._retry_wait(e))
+            
+        # すべての試行が失敗した場合
+        return "翻訳サーバーに接続できませんでした。サーバーが起動しているか確認してください。"
+
+    def translate_many(self, texts: list, quality: str = None, priority: str = None) -> list:
+        """
+        複数のテキストを1回のリクエストでまとめて翻訳します。
+
+        翻訳履歴の再翻訳やOCR結果の一括翻訳など、多数のテキストを翻訳する場合に使用します。
+        サーバー側では1回のバッチ推論で処理されるため、translate() を繰り返し呼び出すよりも高速です。
+        一部のテキストの翻訳に失敗した場合でも、その要素にだけエラーメッセージが入ります。
+
+        Args:
+            texts (list[str]): 翻訳したいテキストのリスト
+            quality (str, optional): 品質/速度のヒント（"fast"、"balanced"、"quality"）
+            priority (str, optional): 優先度レーン（"interactive"、"bulk"）。
+                指定しない場合は "bulk"（バックグラウンドの翻訳）として扱われます
+
+        Returns:
+            list[str]: 入力と同じ順序の翻訳結果のリスト。失敗した要素にはエラーメッセージが入ります
+        """
+        if not texts:
+            return []
+
+        # パッケージ化されていて内部翻訳機能が利用可能な場合は1件ずつ翻訳
+        if is_packaged() and self.internal_translator:
+            return [self.translate(text, quality, priority) for text in texts]
+
         # リトライ処理を実装
         for attempt in range(self.max_retries):
             try:
-                print(f"翻訳サーバーに接続を試みています... (試行 {attempt + 1}/{self.max_retries})")
+                print(f"翻訳サーバーに一括翻訳を依頼しています... "
+                      f"({len(texts)}件, 試行 {attempt + 1}/{self.max_retries})")
+                payload = {"texts": [text or "" for text in texts]}
+                if quality:
+                    payload["quality"] = quality
+                if priority:
+                    payload["priority"] = priority
                 response = requests.post(
-                    self.server_url, 
-                    json={"text": text_with_markers}, 
-                    timeout=30
+                    self.batch_url,
+                    json=payload,
+                    timeout=30 + 5 * len(texts)
                 )
                 response.raise_for_status()
-                result = response.json()
-                translated_text = result.get("result", "翻訳結果が取得できませんでした。")
-                # 翻訳結果の特殊マーカーを改行に戻す
-                return translated_text.replace(NEWLINE_MARKER, "\n")
+                items = response.json().get("results", [])
+
+                results = []
+                for i in range(len(texts)):
+                    item = items[i] if i < len(items) else {}
+                    if "result" in item:
+                        results.append(item["result"])
+                    else:
+                        results.append(item.get("error", "翻訳結果が取得できませんでした。"))
+                return results
             except requests.Timeout:
                 print(f"リクエストがタイムアウトしました。再試行します... ({attempt + 1}/{self.max_retries})")
                 if attempt < self.max_retries - 1:
@@ -129,10 +355,129 @@ class TranslateClient:
                 print(f"リクエスト中にエラーが発生しました: {e}")
                 if attempt < self.max_retries - 1:
                     print(f"再試行します... ({attempt + 1}/{self.max_retries})")
-                    time.sleep(self.retry_delay)
-            
+                    time.sleep(self._retry_wait(e))
+
         # すべての試行が失敗した場合
-        return "翻訳サーバーに接続できませんでした。サーバーが起動しているか確認してください。"
+        return ["翻訳サーバーに接続できませんでした。サーバーが起動しているか確認してください。"] * len(texts)
+
+    def translate_stream(self, text: str):
+        """
+        翻訳結果を生成されたそばから受け取ります。
+
+        サーバーの /translate_stream に接続し、翻訳結果が追加されるたびに、それまでに翻訳された
+        テキスト全体を返すジェネレータです。最後に返される値が翻訳結果の全文です。
+        ストリーミング翻訳は貪欲法で行われるため、translate() と結果が異なる場合があります。
+        ストリーミング翻訳を利用できない場合は、translate() の結果を1回だけ返します。
+        前の翻訳がまだ実行中の場合は、translate() と同様にサーバー側でキャンセルします。
+
+        Args:
+            text (str): 翻訳したいテキスト
+
+        Yields:
+            str: それまでに翻訳されたテキスト全体。翻訳に失敗した場合はエラーメッセージ
+        """
+        if not text or text.strip() == "":
+            yield "翻訳するテキストが空です。"
+            return
+
+        # パッケージ化されていて内部翻訳機能が利用可能な場合は一括で翻訳
+        if is_packaged() and self.internal_translator:
+            yield self.translate(text)
+            return
+
+        received = ""
+        request_id = self._begin_request()
+        try:
+            with requests.post(
+                self.stream_url,
+                json={"text": text, "request_id": request_id},
+                stream=True,
+                timeout=30
+            ) as response:
+                response.raise_for_status()
+                response.encoding = "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    if "error" in item:
+                        yield item["error"]
+                        return
+                    if item.get("done"):
+                        yield item.get("result", received)
+                        return
+                    received += item.get("delta", "")
+                    yield received
+        except (requests.RequestException, ValueError) as e:
+            print(f"ストリーミング翻訳に失敗したため、通常の翻訳を使用します: {e}")
+        finally:
+            self._end_request(request_id)
+
+        # ストリーミングが完了しなかった場合は通常の翻訳で全文を取得する
+        yield self.translate(text)
+
+    def translate_cascade(self, text: str, quality: str = None):
+        """
+        貪欲法で翻訳した速報を受け取り、続けてビームサーチで翻訳し直した結果を受け取ります。
+
+        サーバーの /translate_cascade に接続し、("draft", 速報の全文) を返した後、
+        ("final", 翻訳結果の全文) を返すジェネレータです。速報がない場合（キャッシュにある場合や
+        サーバーが貪欲法を選んだ場合）は ("final", ...) だけを返します。
+        速報の後に新しい翻訳が始まってキャンセルされた場合や接続が切れた場合は、("final", ...) を返さずに終了します。
+        2段階翻訳を利用できない場合は、translate() の結果を ("final", ...) として返します。
+
+        Args:
+            text (str): 翻訳したいテキスト
+            quality (str, optional): 改善の段階の品質/速度のヒント（"balanced"、"quality"）。
+                指定しない場合はサーバーの設定に従います
+
+        Yields:
+            tuple[str, str]: ("draft" または "final", 翻訳結果の全文)。翻訳に失敗した場合は ("final", エラーメッセージ)
+        """
+        if not text or text.strip() == "":
+            yield "final", "翻訳するテキストが空です。"
+            return
+
+        # パッケージ化されていて内部翻訳機能が利用可能な場合は一括で翻訳
+        if is_packaged() and self.internal_translator:
+            yield "final", self.translate(text, quality)
+            return
+
+        payload = {"text": text}
+        if quality:
+            payload["quality"] = quality
+        has_draft = False
+        request_id = self._begin_request()
+        payload["request_id"] = request_id
+        try:
+            with requests.post(self.cascade_url, json=payload, stream=True, timeout=30) as response:
+                response.raise_for_status()
+                response.encoding = "utf-8"
+                for line in response.iter_lines(decode_unicode=True):
+                    if not line:
+                        continue
+                    item = json.loads(line)
+                    if "draft" in item:
+                        has_draft = True
+                        yield "draft", item["draft"]
+                    elif "error" in item:
+                        # 速報の後にキャンセルされた場合は速報を翻訳結果とする
+                        if not (has_draft and item.get("cancelled")):
+                            yield "final", item["error"]
+                        return
+                    elif item.get("done"):
+                        yield "final", item.get("result", "翻訳結果が取得できませんでした。")
+                        return
+        except (requests.RequestException, ValueError) as e:
+            print(f"2段階翻訳に失敗したため、通常の翻訳を使用します: {e}")
+        finally:
+            self._end_request(request_id)
+
+        # 速報を受け取った後に接続が切れた場合は、速報を翻訳結果とする
+        if has_draft:
+            return
+        # 2段階翻訳が完了しなかった場合は通常の翻訳で全文を取得する
+        yield "final", self.translate(text, quality)
 
 # TranslateClient クラスの使用例
 def main():
@@ -12,17 +12,72 @@
 - RESTful APIによる翻訳エンドポイントの提供
 - 環境変数による設定（GPU使用、モデルキャッシュなど）
 - 自動的なモデルダウンロードとキャッシュ
+- マイクロバッチによる同時リクエストのまとめ処理
+- 複数テキストの一括翻訳エンドポイント
+- 専用エグゼキュータによるイベントループ外での推論
+- 翻訳結果のLRUキャッシュ
+- サーバー再起動後も有効な永続翻訳キャッシュ
+- CPU推論用の動的int8量子化
+- 推論エンジンの切り替え（PyTorch / ONNX Runtime / CTranslate2）
+- 入力の長さと遅延の目標値に応じた生成設定（出力長・ビーム数）の決定
+- バックグラウンドでのモデル読み込みと /health による準備状態の確認
+- 起動時のサンプルテキストによるウォームアップ
+- 生成中の翻訳結果を逐次返すストリーミング翻訳エンドポイント
+- 貪欲法の速報の後にビームサーチの翻訳結果を返す2段階翻訳エンドポイント
 """
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse, Response
 from pydantic import BaseModel
 import torch
 import os
 import sys
-from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer, GenerationConfig
+import gc
+import json
+import asyncio
+import threading
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
 import uvicorn
 from dotenv import load_dotenv
 
+# 同じディレクトリの補助モジュールをインポートできるようにパスを追加
+current_dir = os.path.dirname(os.path.abspath(__file__))
+if current_dir not in sys.path:
+    sys.path.append(current_dir)
+
+from micro_batcher import MicroBatcher
+from inference_executor import InferenceExecutor, InferenceQueueFullError
+from translation_cache import TranslationCache
+from persistent_cache import PersistentTranslationCache, compute_model_fingerprint
+from quantization import (quantize_model_dynamic, is_quantized, make_quantization_fingerprint,
+                          load_quantized_model, save_quantized_model, get_process_rss_mb)
+from generation_policy import GenerationPolicy
+from cancellation import CancellationRegistry, BatchCancellation, TranslationCancelledError
+from job_store import TranslationJobStore, JOB_PENDING, JOB_DONE
+from worker_coordination import WorkerCoordinator, remove_shared_state
+from admission import (
+    AdmissionController, AdmissionRejectedError, LANE_BULK, PRIORITY_LANES, lane_priority
+)
+from readiness import ServerReadiness, STATE_LOADING, STATE_WARMING, STATE_FAILED
+from sample_texts import SAMPLE_TEXTS
+from text_chunker import chunk_text
+from sentencepiece_tokenizer import SentencePieceBatchTokenizer
+from compiled_decoding import CompiledDecoding, COMPILE_MODES, compile_cache_dir
+from assisted_decoding import AssistedDecoding, load_draft_model, default_draft_model_dir
+from vocab_shortlist import shortlist_path_for, make_shortlist_fingerprint, load_shortlist
+from weight_snapshot import load_or_create_snapshot, measure_load, SNAPSHOT_DTYPES
+from file_lock import exclusive_file_lock
+from shared_weights import load_model_mmap, resolve_worker_threads, configure_torch_threads
+from resource_governor import load_resource_settings, plan_resources, apply_server_limits
+from metrics import MetricsRegistry, CONTENT_TYPE
+from engines import (
+    TorchEngine, OnnxEngine, CTranslate2Engine, onnx_cache_dir, ctranslate2_cache_dir
+)
+
 # PyInstallerでパッケージ化されているかどうかを確認する関数
 def is_packaged():
     """
@@ -41,7 +96,9 @@ try:
         dotenv_path = os.path.join(base_dir, '.env')
     else:
         # 通常実行の場合
-        dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
+        dotenv_path = os.path.join(
+            os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env'
+        )
     
     if os.path.exists(dotenv_path):
         load_dotenv(dotenv_path)
@@ -54,7 +111,119 @@ except Exception as e:
 # GPU使用の設定を環境変数から取得
 use_gpu = os.environ.get('USE_GPU', 'False').lower() in ('true', '1', 'yes')
 
-app = FastAPI()
+# 推論エンジンの設定を環境変数から取得（"torch"、"onnx" または "ctranslate2"）
+translation_engine = os.environ.get('TRANSLATION_ENGINE', 'torch').strip().lower()
+onnx_num_threads = int(os.environ.get('ONNX_NUM_THREADS', '0'))  # ONNX Runtimeの演算スレッド数（0で自動）
+# CTranslate2の数値型（int8 または int16）
+ct2_compute_type = os.environ.get('CT2_COMPUTE_TYPE', 'int8').strip().lower()
+ct2_num_threads = int(os.environ.get('CT2_NUM_THREADS', '0'))  # CTranslate2の1翻訳あたりのスレッド数（0で自動）
+
+# 量子化の設定を環境変数から取得（"none" または "int8"）
+quantization_mode = os.environ.get('QUANTIZATION', 'none').strip().lower()
+
+# 重みスナップショットの設定を環境変数から取得（"none"、"bf16" または "fp16"）
+weight_snapshot = os.environ.get('WEIGHT_SNAPSHOT', 'none').strip().lower()
+
+# 出力の語彙をターゲット言語のショートリストに絞り込むかどうか（PyTorchエンジンのみ）
+vocab_shortlist_enabled = os.environ.get('VOCAB_SHORTLIST', 'False').lower() in ('true', '1', 'yes')
+
+# SentencePiece を直接呼び出す高速なトークナイザーを使用するかどうか
+use_fast_tokenizer = os.environ.get('FAST_TOKENIZER', 'True').lower() in ('true', '1', 'yes')
+
+# torch.compile によるコンパイルの設定を環境変数から取得（"none"、"dynamic" または "static"、PyTorchエンジンのみ）
+torch_compile_mode = os.environ.get('TORCH_COMPILE', 'none').strip().lower()
+
+# ドラフトモデルによる支援付き生成の設定を環境変数から取得（ドラフトモデルがない場合は無効）
+use_assisted_decoding = os.environ.get('ASSISTED_DECODING', 'True').lower() in ('true', '1', 'yes')
+draft_model_path = os.environ.get('DRAFT_MODEL_DIR', '')  # 空の場合は翻訳モデルのディレクトリの隣の "draft"
+draft_tokens = int(os.environ.get('DRAFT_TOKENS', '0'))  # ドラフトモデルが1回に提案するトークン数（0で自動）
+
+# マイクロバッチの設定を環境変数から取得
+batch_window_ms = float(os.environ.get('BATCH_WINDOW_MS', '10'))  # リクエストを集める時間窓（ミリ秒）
+batch_max_size = int(os.environ.get('BATCH_MAX_SIZE', '8'))  # 1バッチあたりの最大リクエスト数
+
+# 推論エグゼキュータの設定を環境変数から取得
+inference_concurrency = int(os.environ.get('INFERENCE_CONCURRENCY', '1'))  # 同時に実行する推論の数
+inference_queue_size = int(os.environ.get('INFERENCE_QUEUE_SIZE', '32'))  # 実行待ちにできるリクエストの最大数
+
+# アドミッション制御の設定を環境変数から取得
+admission_queue_depth = int(os.environ.get('ADMISSION_QUEUE_DEPTH', '32'))  # 同時に受け付けるリクエストの最大数
+admission_bulk_share = float(os.environ.get('ADMISSION_BULK_SHARE', '0.5'))  # bulk レーンが使える受け付け枠の割合
+
+# 翻訳キャッシュの設定を環境変数から取得
+# キャッシュする翻訳結果の最大件数（0で無効）
+translation_cache_size = int(os.environ.get('TRANSLATION_CACHE_SIZE', '4096'))
+
+# 永続翻訳キャッシュの設定を環境変数から取得
+use_persistent_cache = os.environ.get('PERSISTENT_CACHE', 'True').lower() in ('true', '1', 'yes')
+persistent_cache_path = os.environ.get('PERSISTENT_CACHE_PATH', '')  # 空の場合はモデルディレクトリの隣に作成
+# 保存する最大件数
+persistent_cache_max_entries = int(os.environ.get('PERSISTENT_CACHE_MAX_ENTRIES', '100000'))
+# 保持する日数（0で無期限）
+persistent_cache_max_age_days = float(os.environ.get('PERSISTENT_CACHE_MAX_AGE_DAYS', '30'))
+
+# ウォームアップの設定を環境変数から取得
+use_warmup = os.environ.get('WARMUP', 'True').lower() in ('true', '1', 'yes')  # falseでウォームアップを省略
+warmup_rounds = int(os.environ.get('WARMUP_ROUNDS', '2'))  # サンプルテキストを翻訳する回数（1回目がコールド）
+
+# クライアントの切断を確認する間隔（秒）
+DISCONNECT_POLL_INTERVAL = 0.1
+
+# サーバーワーカーの設定を環境変数から取得
+server_workers = max(1, int(os.environ.get('SERVER_WORKERS', '1')))  # 同じポートで待ち受ける推論プロセスの数
+worker_threads = int(os.environ.get('WORKER_THREADS', '0'))  # ワーカー1つあたりの演算スレッド数（0でコア数÷ワーカー数）
+# 重みをメモリマップして共有する
+use_mmap_weights = os.environ.get('MMAP_WEIGHTS', 'True').lower() in ('true', '1', 'yes')
+
+# 翻訳ジョブの設定を環境変数から取得
+job_result_ttl_sec = float(os.environ.get('JOB_RESULT_TTL_SEC', '60'))  # 完了したジョブの結果を保持する秒数
+job_max_wait_sec = float(os.environ.get('JOB_MAX_WAIT_SEC', '20'))  # ロングポーリングで1回に待つ最大秒数
+
+# 翻訳の言語設定（英語から日本語）
+SOURCE_LANG = "en"
+TARGET_LANG = "ja"
+# 同じ行のチャンクの翻訳結果をつなぐ文字列（日本語と中国語は文の間に空白を入れない）
+TARGET_JOINER = "" if TARGET_LANG in ("ja", "zh") else " "
+
+# 長いテキストを分割するチャンクの最大トークン数
+chunk_max_tokens = int(os.environ.get('CHUNK_MAX_TOKENS', '160'))
+
+# 生成ポリシーの設定を環境変数から取得
+latency_budget_ms = float(os.environ.get('LATENCY_BUDGET_MS', '0'))  # 1翻訳あたりの遅延の目標値（ミリ秒、0で目標なし）
+max_new_tokens_cap = int(os.environ.get('MAX_NEW_TOKENS', '512'))  # 出力トークン数の上限
+
+# 翻訳の基本の生成設定
+# 出力長は入力の長さから、ビーム数は遅延の目標値から翻訳ごとに決定する（num_beams は最大値）
+GENERATION_SETTINGS = {
+    "early_stopping": True,  # 早期終了
+    "num_beams": 5  # ビームサーチの最大ビーム数
+}
+
+# 起動処理（モデルの読み込みとウォームアップ）の進行状況
+readiness = ServerReadiness()
+
+@asynccontextmanager
+async def lifespan(app):
+    """
+    サーバーの起動時と終了時の処理
+
+    モデルの読み込みは別スレッドで開始するため、サーバーはすぐにポートを開いて
+    /health への応答を始めます。終了時には永続キャッシュの書き込み待ちを反映して閉じます。
+    """
+    loop = asyncio.get_running_loop()
+    # 読み込み中にサーバーが終了しても待たないよう、デーモンスレッドで実行する
+    threading.Thread(
+        target=prepare_translation_engine, args=(loop,), name="model-loader", daemon=True
+    ).start()
+    if worker_coordinator is not None:
+        worker_coordinator.open(cancellation_registry.cancel)
+    yield
+    if worker_coordinator is not None:
+        worker_coordinator.close()
+    if persistent_cache is not None:
+        persistent_cache.close()
+
+app = FastAPI(lifespan=lifespan)
 
 class InferenceRequest(BaseModel):
     """
@@ -62,15 +231,51 @@ class InferenceRequest(BaseModel):
     
     Attributes:
         text (str): 翻訳対象のテキスト
+        quality (Optional[str]): 品質/速度のヒント（"fast"、"balanced"、"quality"）
+        latency_budget_ms (Optional[float]): このリクエストの遅延の目標値（ミリ秒）
+        request_id (Optional[str]): /cancel でキャンセルするときに指定するリクエストID
+        priority (Optional[str]): 優先度レーン（"interactive"、"bulk"）。省略時は "interactive"
     """
     text: str
+    quality: Optional[str] = None
+    latency_budget_ms: Optional[float] = None
+    request_id: Optional[str] = None
+    priority: Optional[str] = None
+
+class BatchInferenceRequest(BaseModel):
+    """
+    一括翻訳リクエストのデータモデル
+
+    Attributes:
+        texts (List[str]): 翻訳対象のテキストのリスト
+        quality (Optional[str]): 品質/速度のヒント（"fast"、"balanced"、"quality"）
+        latency_budget_ms (Optional[float]): このリクエストの遅延の目標値（ミリ秒）
+        request_id (Optional[str]): /cancel でキャンセルするときに指定するリクエストID
+        priority (Optional[str]): 優先度レーン（"interactive"、"bulk"）。省略時は "bulk"
+    """
+    texts: List[str]
+    quality: Optional[str] = None
+    latency_budget_ms: Optional[float] = None
+    request_id: Optional[str] = None
+    priority: Optional[str] = None
+
+class CancelRequest(BaseModel):
+    """
+    キャンセルリクエストのデータモデル
+
+    Attributes:
+        request_id (str): キャンセルする翻訳のリクエストID
+    """
+    request_id: str
 
 # モデルとトークナイザーのディレクトリパス
 try:
     if is_packaged():
         # パッケージ化されている場合は、_MEIPASSディレクトリからの相対パスを使用
         base_dir = sys._MEIPASS
-        model_dir = os.path.join(base_dir, "translator_main", "translator", "server_client", "model", "m2m100_418M")
+        model_dir = os.path.join(
+            base_dir, "translator_main", "translator", "server_client", "model", "m2m100_418M"
+        )
     else:
         # 通常実行の場合
         model_dir = os.path.join(os.path.dirname(__file__), "model", "m2m100_418M")
@@ -80,104 +285,1786 @@ except Exception as e:
     print(f"モデルディレクトリパスの解決中にエラーが発生しました: {e}")
     model_dir = os.path.join(os.path.dirname(__file__), "model", "m2m100_418M")
 
-# モデルとトークナイザーのロード
-try:
-    # ディレクトリが存在しない場合は作成
-    if not os.path.exists(model_dir):
-        print(f"モデルディレクトリが存在しないため、新規作成します: {model_dir}")
-        os.makedirs(model_dir, exist_ok=True)
-    
-    # 必要なモデルファイルの存在を確認
-    model_file = os.path.join(model_dir, "model.safetensors")
-    tokenizer_file = os.path.join(model_dir, "tokenizer_config.json")
-    
-    if not os.path.exists(model_file) or not os.path.exists(tokenizer_file):
-        print(f"必要なモデルファイルが存在しないため、ダウンロードします: {model_dir}")
-        print("モデルをダウンロードしています...")
-        print("これには数分かかる場合があります。しばらくお待ちください...")
-        # 進捗表示を追加
-        print("ダウンロード中: トークナイザー")
-        # キャッシュを使用するかどうかの設定
-        use_cache = os.environ.get('USE_MODEL_CACHE', 'True').lower() in ('true', '1', 'yes')
-        print(f"モデルキャッシュの使用: {use_cache}")
+# 量子化済みモデルのキャッシュファイル（GPU使用時は量子化しない）
+use_quantization = quantization_mode == "int8" and not use_gpu
+if quantization_mode == "int8" and use_gpu:
+    print("GPUモードでは動的int8量子化を使用できないため、量子化を無効にします")
+elif quantization_mode not in ("none", "int8"):
+    print(f"不明な量子化モードが指定されました: {quantization_mode}（none または int8 を指定してください）")
+quantized_model_path = os.path.join(os.path.dirname(model_dir), "m2m100_418M_int8_dynamic.pt")
+
+# bf16 / fp16 の重みスナップショット（int8量子化は fp32 の重みから行うため併用しない）
+use_weight_snapshot = weight_snapshot in SNAPSHOT_DTYPES and not use_quantization
+if weight_snapshot in SNAPSHOT_DTYPES and use_quantization:
+    print("int8量子化を使用するため、重みスナップショットを無効にします")
+elif weight_snapshot not in SNAPSHOT_DTYPES and weight_snapshot != "none":
+    print(f"不明な重みスナップショットの数値型が指定されました: {weight_snapshot}（none、bf16 または fp16 を指定してください）")
+
+# 語彙のショートリスト（int8量子化したモデルは出力層を切り出せないため併用しない）
+use_vocab_shortlist = vocab_shortlist_enabled and not use_quantization
+if vocab_shortlist_enabled and use_quantization:
+    print("int8量子化を使用するため、語彙の絞り込みを無効にします")
+
+if torch_compile_mode not in COMPILE_MODES and torch_compile_mode != "none":
+    print(f"不明なコンパイルのモードが指定されました: {torch_compile_mode}"
+          f"（none、{'、'.join(COMPILE_MODES)} のいずれかを指定してください）")
+    torch_compile_mode = "none"
+
+# GPU が使える場合は GPU を、使えない場合は CPU を利用する
+device = torch.device("cuda" if use_gpu and torch.cuda.is_available() else "cpu")
+
+# config.json のリソース配分の設定に従い、OCRやGUIと使うコアを分ける
+resource_settings = load_resource_settings()
+torch_interop_threads = 1
+if resource_settings is not None:
+    server_resources = plan_resources(resource_settings)["server"]
+    apply_server_limits(server_resources)
+    torch_interop_threads = server_resources["torch_interop_threads"]
+    if worker_threads <= 0:
+        # 翻訳サーバーに割り当てたスレッド数をワーカーで分け合う
+        worker_threads = max(1, server_resources["torch_threads"] // server_workers)
+
+# 複数ワーカーで動作する場合は、ワーカー同士がコアを奪い合わないよう演算スレッド数を固定する
+if server_workers > 1 or worker_threads > 0:
+    worker_num_threads = resolve_worker_threads(server_workers, worker_threads)
+    configure_torch_threads(worker_num_threads, torch_interop_threads)
+    if onnx_num_threads <= 0:
+        onnx_num_threads = worker_num_threads
+    if ct2_num_threads <= 0:
+        ct2_num_threads = worker_num_threads
+    print(f"ワーカー（PID {os.getpid()}）の演算スレッド数: {worker_num_threads}")
+
+def load_model():
+    """
+    翻訳モデルとトークナイザーをロードします。
+
+    ローカルにモデルファイルがない場合はダウンロードして保存します。
+    量子化が有効な場合は量子化済みモデルのキャッシュを使用し、GPUモードではモデルをGPUに移動します。
+
+    Returns:
+        tuple: (トークナイザー, 翻訳モデル)
+    """
+    try:
+        # ディレクトリが存在しない場合は作成
+        if not os.path.exists(model_dir):
+            print(f"モデルディレクトリが存在しないため、新規作成します: {model_dir}")
+            os.makedirs(model_dir, exist_ok=True)
         
-        tokenizer = M2M100Tokenizer.from_pretrained("facebook/m2m100_418M", use_auth_token=False, cache_dir=None if use_cache else "no_cache")
-        print("ダウンロード中: 翻訳モデル")
-        model = M2M100ForConditionalGeneration.from_pretrained("facebook/m2m100_418M", use_auth_token=False, cache_dir=None if use_cache else "no_cache")
-        print("モデルを保存しています...")
-        tokenizer.save_pretrained(model_dir)
-        model.save_pretrained(model_dir)
-        print("モデルのダウンロードと保存が完了しました")
+        # 必要なモデルファイルの存在を確認
+        model_file = os.path.join(model_dir, "model.safetensors")
+        tokenizer_file = os.path.join(model_dir, "tokenizer_config.json")
+        
+        if not os.path.exists(model_file) or not os.path.exists(tokenizer_file):
+            print(f"必要なモデルファイルが存在しないため、ダウンロードします: {model_dir}")
+            print("モデルをダウンロードしています...")
+            print("これには数分かかる場合があります。しばらくお待ちください...")
+            # 進捗表示を追加
+            print("ダウンロード中: トークナイザー")
+            # キャッシュを使用するかどうかの設定
+            use_cache = os.environ.get('USE_MODEL_CACHE', 'True').lower() in ('true', '1', 'yes')
+            print(f"モデルキャッシュの使用: {use_cache}")
+            
+            tokenizer = M2M100Tokenizer.from_pretrained(
+                "facebook/m2m100_418M", use_auth_token=False,
+                cache_dir=None if use_cache else "no_cache"
+            )
+            print("ダウンロード中: 翻訳モデル")
+            model = M2M100ForConditionalGeneration.from_pretrained(
+                "facebook/m2m100_418M", use_auth_token=False,
+                cache_dir=None if use_cache else "no_cache"
+            )
+            print("モデルを保存しています...")
+            tokenizer.save_pretrained(model_dir)
+            model.save_pretrained(model_dir)
+            print("モデルのダウンロードと保存が完了しました")
+        else:
+            print(f"既存のモデルを読み込んでいます: {model_dir}")
+            tokenizer = M2M100Tokenizer.from_pretrained(model_dir)
+            model = None
+            if use_quantization:
+                # 量子化済みモデルのキャッシュがあれば、fp32モデルの読み込みと再量子化を省略する
+                model = load_quantized_model(
+                    quantized_model_path,
+                    make_quantization_fingerprint(compute_model_fingerprint(model_dir))
+                )
+            if model is None and use_weight_snapshot:
+                # 変換済みの bf16 / fp16 スナップショットをメモリマップで読み込む（初回は作成する）
+                model = load_or_create_snapshot(
+                    M2M100ForConditionalGeneration, model_dir, weight_snapshot,
+                    compute_model_fingerprint(model_dir)
+                )
+            if model is None and use_mmap_weights and not use_gpu:
+                # 重みをメモリマップし、ほかのワーカーとページキャッシュ上の重みを共有する
+                model = load_model_mmap(M2M100ForConditionalGeneration, model_dir)
+                if model is not None:
+                    print("モデルの重みをメモリマップで読み込みました")
+            if model is None:
+                model = M2M100ForConditionalGeneration.from_pretrained(model_dir)
+    except Exception as e:
+        print(f"モデルのロード中にエラーが発生しました: {e}")
+        # フォールバック: オンラインからモデルをロード
+        try:
+            print("オンラインからモデルをロードします...")
+            # キャッシュを使用するかどうかの設定
+            use_cache = os.environ.get('USE_MODEL_CACHE', 'True').lower() in ('true', '1', 'yes')
+            print(f"モデルキャッシュの使用: {use_cache}")
+            
+            tokenizer = M2M100Tokenizer.from_pretrained(
+                "facebook/m2m100_418M", use_auth_token=False,
+                cache_dir=None if use_cache else "no_cache"
+            )
+            model = M2M100ForConditionalGeneration.from_pretrained(
+                "facebook/m2m100_418M", use_auth_token=False,
+                cache_dir=None if use_cache else "no_cache"
+            )
+        except Exception as e2:
+            print(f"オンラインからのモデルロードにも失敗しました: {e2}")
+            raise
+
+    if use_quantization and not is_quantized(model):
+        # 複数のワーカーが同時に起動した場合は、1つのワーカーだけが量子化してキャッシュする
+        with exclusive_file_lock(quantized_model_path):
+            quantization_fingerprint = make_quantization_fingerprint(
+                compute_model_fingerprint(model_dir)
+            )
+            # ロックを待っている間に別のワーカーが保存したキャッシュがあれば、それを使う
+            cached_model = load_quantized_model(quantized_model_path, quantization_fingerprint)
+            if cached_model is not None:
+                model = cached_model
+            else:
+                # Linear層に動的int8量子化を適用し、次回の起動のためにキャッシュする
+                print("モデルに動的int8量子化を適用しています...")
+                model = quantize_model_dynamic(model)
+                if os.path.exists(os.path.join(model_dir, "model.safetensors")):
+                    save_quantized_model(model, quantized_model_path, quantization_fingerprint)
+                print("動的int8量子化を適用しました")
+
+    if use_gpu:
+        print(f"Using device: {device}")  # ログ出力
+        model.to(device)
     else:
-        print(f"既存のモデルを読み込んでいます: {model_dir}")
-        tokenizer = M2M100Tokenizer.from_pretrained(model_dir)
-        model = M2M100ForConditionalGeneration.from_pretrained(model_dir)
-except Exception as e:
-    print(f"モデルのロード中にエラーが発生しました: {e}")
-    # フォールバック: オンラインからモデルをロード
+        print("CPU mode is enabled")
+    return tokenizer, model
+
+def create_engine(model, tokenizer):
+    """
+    環境変数 TRANSLATION_ENGINE で指定された翻訳エンジンを作成します。
+
+    指定されたエンジンを初期化できない場合は、PyTorchエンジンにフォールバックします。
+
+    Args:
+        model: load_model() でロードした翻訳モデル
+        tokenizer: load_model() でロードしたトークナイザー
+
+    Returns:
+        TranslationEngine: 翻訳エンジン
+    """
+    if translation_engine == "onnx":
+        if use_gpu:
+            print("ONNXエンジンはCPU専用のため、GPUモードではPyTorchエンジンを使用します")
+        else:
+            try:
+                return OnnxEngine(
+                    model_dir, tokenizer, onnx_cache_dir(model_dir),
+                    compute_model_fingerprint(model_dir), num_threads=onnx_num_threads
+                )
+            except Exception as e:
+                print(f"ONNXエンジンの初期化に失敗したため、PyTorchエンジンを使用します: {e}")
+    elif translation_engine == "ctranslate2":
+        if use_gpu:
+            print("CTranslate2エンジンはCPU専用のため、GPUモードではPyTorchエンジンを使用します")
+        else:
+            try:
+                # 同時に実行できる翻訳の数は推論エグゼキュータのワーカー数に合わせる
+                return CTranslate2Engine(
+                    model_dir, tokenizer, ctranslate2_cache_dir(model_dir, ct2_compute_type),
+                    compute_model_fingerprint(model_dir), compute_type=ct2_compute_type,
+                    inter_threads=inference_concurrency, intra_threads=ct2_num_threads
+                )
+            except Exception as e:
+                print(f"CTranslate2エンジンの初期化に失敗したため、PyTorchエンジンを使用します: {e}")
+    elif translation_engine != "torch":
+        print(f"不明な推論エンジンが指定されました: {translation_engine}（torch、onnx または ctranslate2 を指定してください）")
+    shortlist = load_vocab_shortlist()
+    if shortlist is not None:
+        try:
+            return TorchEngine(
+                model, tokenizer, device=device if use_gpu else None, shortlist=shortlist
+            )
+        except ValueError as e:
+            print(f"語彙の絞り込みを適用できないため、全語彙で生成します: {e}")
+    return TorchEngine(model, tokenizer, device=device if use_gpu else None)
+
+def enable_fast_tokenizer(target_engine):
+    """
+    翻訳エンジンのトークナイズとデコードに SentencePiece を直接呼び出すトークナイザーを使用します。
+
+    M2M100Tokenizer とトークンIDやデコード結果が1つでも一致しない場合は使用しません。
+
+    Args:
+        target_engine (TranslationEngine): 翻訳エンジン
+    """
     try:
-        print("オンラインからモデルをロードします...")
-        # キャッシュを使用するかどうかの設定
-        use_cache = os.environ.get('USE_MODEL_CACHE', 'True').lower() in ('true', '1', 'yes')
-        print(f"モデルキャッシュの使用: {use_cache}")
-        
-        tokenizer = M2M100Tokenizer.from_pretrained("facebook/m2m100_418M", use_auth_token=False, cache_dir=None if use_cache else "no_cache")
-        model = M2M100ForConditionalGeneration.from_pretrained("facebook/m2m100_418M", use_auth_token=False, cache_dir=None if use_cache else "no_cache")
-    except Exception as e2:
-        print(f"オンラインからのモデルロードにも失敗しました: {e2}")
-        raise
-
-if use_gpu:
-    # GPU が使える場合は GPU を、使えない場合は CPU を利用する
-    device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-    print(f"Using device: {device}")  # ログ出力
-    model.to(device)
-else:
-    print("CPU mode is enabled")
+        fast_tokenizer = SentencePieceBatchTokenizer(
+            target_engine.tokenizer, target_engine.tokenizer_lock
+        )
+        samples = [(SOURCE_LANG, text) for text in SAMPLE_TEXTS]
+        mismatches = fast_tokenizer.verify() + fast_tokenizer.verify(samples)
+    except Exception as e:
+        print(f"高速なトークナイザーを使用できないため、M2M100Tokenizerを使用します: {e}")
+        return
+    if mismatches:
+        print(f"高速なトークナイザーの結果がM2M100Tokenizerと一致しないため使用しません: {mismatches[0]['text']!r}")
+        return
+    target_engine.fast_tokenizer = fast_tokenizer
+    print("SentencePieceを直接呼び出す高速なトークナイザーを使用します")
+
+def enable_assisted_decoding(target_engine):
+    """
+    ドラフトモデルを読み込み、翻訳エンジンで支援付き生成を使用します。
+
+    ドラフトモデルがない場合や、翻訳モデルと語彙の互換性がない場合は使用しません。
+
+    Args:
+        target_engine (TorchEngine): PyTorchの翻訳エンジン
+    """
+    if target_engine.shortlist is not None:
+        print("語彙を絞り込んだモデルはドラフトモデルと語彙が異なるため、支援付き生成を無効にします")
+        return
+    draft_dir = draft_model_path or default_draft_model_dir(model_dir)
+    draft_model = load_draft_model(draft_dir, target_engine.model, target_engine.tokenizer,
+                                   device=device if use_gpu else None)
+    if draft_model is not None:
+        target_engine.assistant = AssistedDecoding(
+            target_engine.model, draft_model, num_assistant_tokens=draft_tokens
+        )
+
+def benchmark_assisted_decoding(target_engine):
+    """
+    ウォームアップと同じサンプル文を貪欲法で翻訳し、支援の有無による所要時間を比較します。
+
+    Args:
+        target_engine (TorchEngine): 支援付き生成を設定した翻訳エンジン
+
+    Returns:
+        dict: 支援なし・支援付きの所要時間と速度の比
+    """
+    texts = SAMPLE_TEXTS[::2]
+
+    def run_samples():
+        for text in texts:
+            settings = resolve_generation_settings([text], quality="fast")[0]
+            target_engine.translate_batch([text], SOURCE_LANG, TARGET_LANG, settings)
+
+    report = target_engine.assistant.benchmark(run_samples)
+    print(f"支援付き生成: 支援なし {report['baseline_ms']} ms / "
+          f"支援付き {report['assisted_ms']} ms（{report['speedup']}倍）")
+    return report
+
+def load_vocab_shortlist():
+    """
+    VOCAB_SHORTLIST が有効な場合、ターゲット言語の語彙のショートリストを読み込みます。
+
+    Returns:
+        VocabShortlist: ショートリスト。無効な場合や、作成されていないか古い場合はNone
+    """
+    if not use_vocab_shortlist:
+        return None
+    path = shortlist_path_for(model_dir, TARGET_LANG)
+    shortlist = load_shortlist(
+        path, make_shortlist_fingerprint(compute_model_fingerprint(model_dir), TARGET_LANG)
+    )
+    if shortlist is None:
+        print(f"語彙のショートリストが見つからないため、全語彙で生成します: {path}")
+        print("vocab_shortlist.py --corpus <日本語のコーパス> で作成できます")
+        return None
+    print(f"語彙のショートリストを読み込みました（{len(shortlist)}トークン）")
+    return shortlist
+
+# 翻訳エンジン（バックグラウンドでのモデルの読み込みが完了するまではNone）
+engine = None
+
+# /metrics で出力する計測値
+metrics = MetricsRegistry(prefix="enjapp_")
+queue_wait_seconds = metrics.histogram(
+    "queue_wait_seconds", "推論エグゼキュータでの実行待ち時間（秒）", labelnames=("lane",)
+)
+batch_wait_seconds = metrics.histogram(
+    "batch_wait_seconds", "マイクロバッチでのバッチ待ち時間（秒）"
+)
+inference_stage_seconds = metrics.histogram(
+    "inference_stage_seconds", "推論の段階（tokenize / generate / decode）ごとの所要時間（秒）",
+    labelnames=("stage",)
+)
+batch_size_histogram = metrics.histogram(
+    "batch_size", "1回の推論で翻訳したテキストの数", buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+tokens_per_second = metrics.histogram(
+    "tokens_per_second", "1回の推論での生成トークン数毎秒",
+    buckets=(5, 10, 25, 50, 100, 250, 500, 1000)
+)
+input_tokens_total = metrics.counter("input_tokens_total", "推論した入力トークン数の合計")
+output_tokens_total = metrics.counter("output_tokens_total", "生成した出力トークン数の合計")
+
+def observe_executor_wait(priority, wait):
+    """推論エグゼキュータでの実行待ち時間を優先度レーンごとに記録する"""
+    lane = PRIORITY_LANES[priority] if 0 <= priority < len(PRIORITY_LANES) else str(priority)
+    queue_wait_seconds.observe(wait, (lane,))
+
+def observe_engine(name, value):
+    """翻訳エンジンから渡された計測値を記録する"""
+    if name == "input_tokens":
+        input_tokens_total.inc(value)
+    else:
+        inference_stage_seconds.observe(value, (name,))
+
+def record_generation(generated_tokens, elapsed):
+    """生成トークン数と生成速度を記録する"""
+    output_tokens_total.inc(generated_tokens)
+    if elapsed > 0:
+        tokens_per_second.observe(generated_tokens / elapsed)
+
+# model.generate をイベントループの外で実行する推論専用エグゼキュータ
+inference_executor = InferenceExecutor(
+    max_workers=inference_concurrency,
+    max_queue_size=inference_queue_size,
+    priority_names=PRIORITY_LANES,
+    wait_observer=observe_executor_wait
+)
+
+# 翻訳ごとの出力長とビーム数を決定する生成ポリシー
+generation_policy = GenerationPolicy(
+    GENERATION_SETTINGS,
+    latency_budget_ms=latency_budget_ms,
+    max_new_tokens_cap=max_new_tokens_cap
+)
+
+# リクエストIDから実行中の翻訳をキャンセルするための対応表
+cancellation_registry = CancellationRegistry()
+
+# 同じテキストの翻訳結果を再利用するキャッシュ
+translation_cache = TranslationCache(max_entries=translation_cache_size)
+
+# 同時に受け付けるリクエスト数を優先度レーンごとに制限するアドミッション制御
+admission = AdmissionController(
+    max_depth=admission_queue_depth,
+    bulk_share=admission_bulk_share,
+    concurrency=inference_concurrency
+)
+
+# /jobs で受け付けた翻訳ジョブ（同じ内容のジョブは共有される）
+job_store = TranslationJobStore(ttl_sec=job_result_ttl_sec)
+
+# 複数のワーカーで実行する場合に、翻訳ジョブとキャンセルをすべてのワーカーで共有する
+worker_state_path = os.path.join(os.path.dirname(model_dir), "worker_state.sqlite3")
+worker_coordinator = None
+if server_workers > 1:
+    worker_coordinator = WorkerCoordinator(worker_state_path, ttl_sec=job_result_ttl_sec)
+
+# サーバーを再起動しても翻訳結果を再利用するための永続キャッシュ
+persistent_cache = None
+if use_persistent_cache:
+    try:
+        if not persistent_cache_path:
+            persistent_cache_path = os.path.join(
+                os.path.dirname(model_dir), "translation_cache.sqlite3"
+            )
+        persistent_cache = PersistentTranslationCache(
+            persistent_cache_path,
+            compute_model_fingerprint(model_dir),
+            max_entries=persistent_cache_max_entries,
+            max_age_days=persistent_cache_max_age_days
+        )
+        print(f"永続翻訳キャッシュを使用します: {persistent_cache_path}")
+    except Exception as e:
+        print(f"永続翻訳キャッシュの初期化に失敗しました。永続キャッシュなしで動作します: {e}")
+        persistent_cache = None
+
+async def lookup_persistent_cache(cache_keys):
+    """
+    永続キャッシュから複数の翻訳結果をイベントループ外で取得します。
+
+    Args:
+        cache_keys (list[tuple]): キャッシュキーのリスト
+
+    Returns:
+        list: cache_keys と同じ順序の翻訳結果のリスト。存在しない要素はNone
+    """
+    if persistent_cache is None or not cache_keys:
+        return [None] * len(cache_keys)
+    try:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(None, persistent_cache.get_many, cache_keys)
+    except Exception as e:
+        print(f"永続翻訳キャッシュの読み込み中にエラーが発生しました: {e}")
+        return [None] * len(cache_keys)
+
+def resolve_generation_settings(texts, quality=None, latency_budget_ms=None, token_counts=None):
+    """
+    生成ポリシーに従って、テキストごとの生成設定を決定します。
+
+    ビーム数は最も長いテキストに対して1回だけ決定し、すべてのテキストで共通にします。
+    出力トークン数の上限はテキストごとに入力トークン数から決定します。
+
+    Args:
+        texts (list[str]): 翻訳対象のテキストのリスト
+        quality (str, optional): 品質/速度のヒント
+        latency_budget_ms (float, optional): リクエストの遅延の目標値（ミリ秒）
+        token_counts (list[int], optional): 数え済みの入力トークン数（省略時はトークン化して数える）
+
+    Returns:
+        list[dict]: texts と同じ順序の生成設定のリスト
+
+    Raises:
+        ValueError: 不明な品質/速度のヒントが指定された場合
+    """
+    if token_counts is None:
+        token_counts = [len(ids) for ids in engine.encode(texts, SOURCE_LANG)]
+    settings = generation_policy.resolve(max(token_counts), quality, latency_budget_ms)
+    return [
+        dict(settings, max_new_tokens=generation_policy.max_new_tokens(n)) for n in token_counts
+    ]
+
+def count_source_tokens(text):
+    """
+    翻訳元のテキストのトークン数を数えます。
+
+    Args:
+        text (str): テキスト
+
+    Returns:
+        int: 言語トークンと文末トークンを除いたトークン数
+    """
+    return max(0, len(engine.encode([text], SOURCE_LANG)[0]) - 2)
+
+def prepare_chunks(texts, qualities=(None,), latency_budget_ms=None):
+    """
+    テキストを行と文の区切りで CHUNK_MAX_TOKENS 以下のチャンクに分割し、チャンクの生成設定を決定します。
+
+    分割で数えたトークン数を生成設定の決定でも使うため、同じ文を2回トークン化しません。
+    トークン化はCPUを使うため、非同期処理からは plan_chunks() を通じてスレッドで実行します。
+
+    Args:
+        texts (list[str]): 翻訳対象のテキストのリスト
+        qualities (tuple, optional): 生成設定を決定する品質/速度のヒントのリスト
+        latency_budget_ms (float, optional): リクエストの遅延の目標値（ミリ秒）
+
+    Returns:
+        tuple: テキストごとの ChunkedText のリストと、
+            qualities ごとの全チャンク（テキスト順）の生成設定のリスト
+
+    Raises:
+        ValueError: 不明な品質/速度のヒントが指定された場合
+    """
+    counted = {}
+
+    def count_tokens(text):
+        count = counted.get(text)
+        if count is None:
+            count = counted[text] = count_source_tokens(text)
+        return count
+
+    chunked_list = [
+        chunk_text(text, count_tokens, max_tokens=chunk_max_tokens, joiner=TARGET_JOINER)
+        for text in texts
+    ]
+    chunks = [chunk for chunked in chunked_list for chunk in chunked.chunks]
+    # 言語トークンと文末トークンの2つを足して入力トークン数にする
+    token_counts = [count_tokens(chunk) + 2 for chunk in chunks]
+    settings_lists = [
+        resolve_generation_settings(chunks, quality, latency_budget_ms, token_counts)
+        for quality in qualities
+    ]
+    return chunked_list, settings_lists
+
+async def plan_chunks(texts, qualities=(None,), latency_budget_ms=None):
+    """
+    prepare_chunks() をスレッドで実行し、トークン化の間もイベントループを止めないようにします。
+
+    Args:
+        texts (list[str]): 翻訳対象のテキストのリスト
+        qualities (tuple, optional): 生成設定を決定する品質/速度のヒントのリスト
+        latency_budget_ms (float, optional): リクエストの遅延の目標値（ミリ秒）
+
+    Returns:
+        tuple: prepare_chunks() の戻り値
+
+    Raises:
+        ValueError: 不明な品質/速度のヒントが指定された場合
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(None, prepare_chunks, texts, qualities, latency_budget_ms)
+
+def make_cache_key(text, settings):
+    """
+    翻訳キャッシュのキーを作成します。
+
+    言語と生成設定に加えて、翻訳結果に影響する推論エンジンの識別子をキーに含めます。
+
+    Args:
+        text (str): 翻訳対象のテキスト
+        settings (dict): resolve_generation_settings() で決定した生成設定
+
+    Returns:
+        tuple: キャッシュキー
+    """
+    settings = dict(settings, engine=engine.cache_tag)
+    return translation_cache.make_key(text, SOURCE_LANG, TARGET_LANG, settings)
+
+def store_persistent_cache(cache_key, translated_text):
+    """
+    翻訳結果を永続キャッシュに保存します。書き込みはバックグラウンドで行われます。
+
+    Args:
+        cache_key (tuple): キャッシュキー
+        translated_text (str): 翻訳結果
+    """
+    if persistent_cache is not None:
+        persistent_cache.put(cache_key, translated_text)
+
+def translate_texts(texts, settings, cancel_token=None):
+    """
+    複数のテキストを1回のバッチ推論でまとめて翻訳します。
+
+    テキストはパディングして1つのバッチにまとめられ、翻訳エンジンの推論は1回だけ実行されます。
+    推論にかかった時間と生成されたトークン数は生成ポリシーに記録されます。
+    実行待ちの間にキャンセルされた場合は、推論を始めずに終了します。
+
+    Args:
+        texts (list[str]): 翻訳対象のテキストのリスト
+        settings (dict): バッチ全体の生成設定
+        cancel_token (optional): CancellationToken または BatchCancellation
+
+    Returns:
+        list[str]: 入力と同じ順序の翻訳結果のリスト
+
+    Raises:
+        TranslationCancelledError: 翻訳がキャンセルされた場合
+    """
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    started_at = time.perf_counter()
+    results = engine.translate_batch(
+        texts, SOURCE_LANG, TARGET_LANG, settings, cancel_token=cancel_token
+    )
+    elapsed = time.perf_counter() - started_at
+    # 強制的に出力される言語トークンを除いた生成トークン数（エンジンが生成したトークンIDから数えたもの）
+    generated_tokens = sum(engine.last_generated_tokens())
+    generation_policy.record(
+        generated_tokens, settings["num_beams"], elapsed, batch_size=len(texts)
+    )
+    batch_size_histogram.observe(len(texts))
+    record_generation(generated_tokens, elapsed)
+    return results
+
+def translate_texts_isolated(texts, settings, cancel_token=None):
+    """
+    複数のテキストをまとめて翻訳し、失敗した場合は1件ずつ再試行します。
+
+    バッチ全体の推論が失敗した場合でも、原因となったテキスト以外は翻訳結果を返せるように、
+    各テキストを個別に翻訳し直して失敗したものだけを例外として返します。
+    キャンセルされた場合は再試行せず、すべての要素にキャンセルの例外を返します。
+
+    Args:
+        texts (list[str]): 翻訳対象のテキストのリスト
+        settings (dict): バッチ全体の生成設定
+        cancel_token (optional): CancellationToken または BatchCancellation
+
+    Returns:
+        list: 入力と同じ順序の翻訳結果のリスト。失敗した要素には Exception が入ります
+    """
+    try:
+        return translate_texts(texts, settings, cancel_token)
+    except TranslationCancelledError as e:
+        return [e] * len(texts)
+    except Exception as e:
+        if len(texts) == 1:
+            return [e]
+        print(f"バッチ翻訳中にエラーが発生したため、1件ずつ再試行します: {e}")
+
+    results = []
+    for text in texts:
+        try:
+            results.append(translate_texts([text], settings, cancel_token)[0])
+        except Exception as e:
+            results.append(e)
+    return results
+
+async def process_translation_batch(payloads):
+    """
+    マイクロバッチから呼び出され、まとめられたテキストを推論エグゼキュータで翻訳します。
+
+    同じバッチのペイロードは優先度とビーム数が同じものだけがまとめられています。
+    バッチが作られるまでにキャンセルされたリクエストは推論に含めず、
+    残りのリクエストがすべてキャンセルされた場合は推論を途中で止めます。
+
+    Args:
+        payloads (list[tuple]): (テキスト, 生成設定, キャンセルトークン, 優先度) のリスト
+
+    Returns:
+        list: 入力と同じ順序の翻訳結果のリスト。キャンセルされた要素には TranslationCancelledError が入ります
+    """
+    results = [None] * len(payloads)
+    live = []
+    for i, (_, _, token, _) in enumerate(payloads):
+        if token.is_cancelled:
+            results[i] = TranslationCancelledError(f"翻訳はキャンセルされました（request_id: {token.request_id}）")
+        else:
+            live.append(i)
+    if not live:
+        return results
+
+    texts = [payloads[i][0] for i in live]
+    settings = generation_policy.merge([payloads[i][1] for i in live])
+    cancel_token = BatchCancellation([payloads[i][2] for i in live])
+    # 同じバッチのペイロードは優先度も同じ
+    priority = payloads[live[0]][3]
+    translated = await inference_executor.run(
+        translate_texts_isolated, texts, settings, cancel_token, priority=priority
+    )
+    for i, item in zip(live, translated):
+        results[i] = item
+    return results
+
+def warm_up_engine():
+    """
+    長さの異なるサンプルテキストを繰り返し翻訳し、初回の推論で発生する初期化を済ませます。
+
+    メモリアロケータの拡張、oneDNNのカーネル選択、トークナイザーの初期化などは最初の推論で
+    行われるため、実際のリクエストと同じ生成設定で事前に翻訳しておきます。
+    1回目（コールド）の結果は生成速度の記録に使用せず、2回目以降の結果だけを生成ポリシーに記録します。
+    翻訳結果はキャッシュしません。
+
+    Returns:
+        dict: テキストごとのコールド・ウォームの所要時間を含む計測結果
+    """
+    # 短いUIラベルから長めの段落まで、長さの異なる4件を使用する
+    texts = SAMPLE_TEXTS[::2]
+    rounds = []
+    for round_index in range(max(1, warmup_rounds)):
+        latencies = []
+        for text in texts:
+            settings = resolve_generation_settings([text])[0]
+            started_at = time.perf_counter()
+            if round_index == 0:
+                engine.translate_batch([text], SOURCE_LANG, TARGET_LANG, settings)
+            else:
+                translate_texts([text], settings)
+            latencies.append(round((time.perf_counter() - started_at) * 1000, 1))
+        rounds.append(latencies)
+
+    cold, warm = rounds[0], (rounds[-1] if len(rounds) > 1 else None)
+    report = {
+        "texts": len(texts),
+        "rounds": len(rounds),
+        "cold_ms": cold,
+        "warm_ms": warm,
+        "cold_total_ms": round(sum(cold), 1),
+        "warm_total_ms": round(sum(warm), 1) if warm is not None else None,
+    }
+    print(f"ウォームアップ: コールド {report['cold_total_ms']} ms / ウォーム {report['warm_total_ms']} ms")
+    return report
+
+def compile_engine_decoding(target_engine):
+    """
+    翻訳エンジンのモデルを torch.compile でコンパイルし、ウォームアップと同じサンプル文で
+    コンパイル前後の所要時間を比較します。
+
+    コンパイルや実行に失敗した場合は、コンパイルしていないモデルのまま使用します。
+
+    Args:
+        target_engine (TorchEngine): PyTorchの翻訳エンジン
+
+    Returns:
+        dict: コンパイルの所要時間とコンパイル前後の所要時間を含む計測結果
+    """
+    texts = SAMPLE_TEXTS[::2]
+
+    def run_samples():
+        for text in texts:
+            settings = resolve_generation_settings([text])[0]
+            target_engine.translate_batch([text], SOURCE_LANG, TARGET_LANG, settings)
+
+    compiler = CompiledDecoding(torch_compile_mode, compile_cache_dir(model_dir))
+    return compiler.compile_with_benchmark(target_engine, run_samples)
+
+def prepare_translation_engine(loop):
+    """
+    翻訳モデルを読み込み、翻訳エンジンを準備します。
+
+    lifespan から別スレッドで実行されます。各段階の進行状況と所要時間は readiness に記録され、
+    すべて完了すると翻訳リクエストを受け付けるようになります。
+
+    Args:
+        loop (asyncio.AbstractEventLoop): サーバーのイベントループ
+    """
+    global engine
+    try:
+        with readiness.stage("model_load", STATE_LOADING):
+            (tokenizer, model), load_report = measure_load(load_model)
+        readiness.set_detail("model_load", load_report)
+        print(f"モデルの読み込み: {load_report['load_sec']} 秒 / RSS {load_report['rss_mb']} MB"
+              f" / ピークRSS {load_report['peak_rss_mb']} MB")
+
+        with readiness.stage("engine_init"):
+            new_engine = create_engine(model, tokenizer)
+            new_engine.observer = observe_engine
+            if use_fast_tokenizer:
+                enable_fast_tokenizer(new_engine)
+            if use_assisted_decoding and new_engine.name == "torch":
+                enable_assisted_decoding(new_engine)
+            print(f"翻訳エンジン: {new_engine.cache_tag}")
+            if new_engine.name != "torch":
+                # PyTorchモデルは使用しないため、メモリを解放する
+                model = None
+                gc.collect()
+        engine = new_engine
+
+        if torch_compile_mode != "none":
+            if engine.name == "torch":
+                with readiness.stage("compile", STATE_WARMING):
+                    # 実際の翻訳と同じく推論エグゼキュータのワーカーで実行する
+                    report = asyncio.run_coroutine_threadsafe(
+                        inference_executor.run(compile_engine_decoding, engine), loop
+                    ).result()
+                readiness.set_detail("compile", report)
+            else:
+                print(f"{engine.name}エンジンではモデルのコンパイルを使用できません")
+
+        if getattr(engine, "assistant", None) is not None:
+            with readiness.stage("assisted_decoding", STATE_WARMING):
+                report = asyncio.run_coroutine_threadsafe(
+                    inference_executor.run(benchmark_assisted_decoding, engine), loop
+                ).result()
+            readiness.set_detail("assisted_decoding", report)
+            assisted_benchmark.update(report)
+
+        if use_warmup:
+            with readiness.stage("warmup", STATE_WARMING):
+                # 実際の翻訳と同じく推論エグゼキュータのワーカーで実行する
+                report = asyncio.run_coroutine_threadsafe(
+                    inference_executor.run(warm_up_engine), loop
+                ).result()
+            readiness.set_detail("warmup", report)
+        else:
+            print("ウォームアップをスキップします")
+
+        readiness.set_ready()
+    except Exception as e:
+        readiness.set_failed(e)
+
+def stream_translation(chunked, settings_list, cached, on_text, cancel_token=None):
+    """
+    推論エグゼキュータのワーカーで1件のテキストをチャンクの順に逐次翻訳します。
+
+    各チャンクの前には改行などの区切りを送信します。キャッシュに翻訳結果があるチャンクは、
+    生成せずにそのまま送信します。
+
+    Args:
+        chunked (ChunkedText): チャンクに分割したテキスト
+        settings_list (list[dict]): チャンクごとの生成設定
+        cached (list): チャンクごとのキャッシュ済みの翻訳結果（ない場合はNone）
+        on_text (callable): 新たに確定したテキストを受け取る関数
+        cancel_token (CancellationToken, optional): キャンセルトークン
+
+    Returns:
+        list[str]: チャンクごとの翻訳結果
+
+    Raises:
+        TranslationCancelledError: 翻訳がキャンセルされた場合
+    """
+    results = []
+    rows = zip(chunked.chunks, chunked.prefixes, settings_list, cached)
+    for chunk, prefix, settings, result in rows:
+        if cancel_token is not None:
+            cancel_token.raise_if_cancelled()
+        if prefix:
+            on_text(prefix)
+        if result is not None:
+            on_text(result.strip())
+            results.append(result)
+            continue
+        started_at = time.perf_counter()
+        result = engine.translate_stream(
+            chunk, SOURCE_LANG, TARGET_LANG, settings, on_text, cancel_token=cancel_token
+        )
+        # 逐次翻訳は1件ずつ送信しながら生成するため、生成ポリシーの速度の推定には含めない
+        generated_tokens = sum(engine.last_generated_tokens())
+        record_generation(generated_tokens, time.perf_counter() - started_at)
+        results.append(result)
+    return results
+
+def cascade_translation(texts, draft_settings, refine_settings, on_draft, cancel_token=None):
+    """
+    推論エグゼキュータのワーカーで、複数のテキストを速報と改善の2段階で翻訳します。
+
+    貪欲法で翻訳した速報を on_draft に渡してから、同じエンコーダの出力でビームサーチによって翻訳し直します。
+    refine_settings が None の場合は、draft_settings で1回だけ翻訳し、on_draft は呼び出しません。
+
+    Args:
+        texts (list[str]): 翻訳対象のテキストのリスト
+        draft_settings (dict): 速報のバッチ全体の生成設定
+        refine_settings (dict): 改善のバッチ全体の生成設定（Noneの場合は改善しない）
+        on_draft (callable): 速報の翻訳結果のリストを受け取る関数
+        cancel_token (CancellationToken, optional): キャンセルトークン
+
+    Returns:
+        tuple: (速報の翻訳結果のリスト, 改善した翻訳結果のリスト)
+
+    Raises:
+        TranslationCancelledError: 翻訳がキャンセルされた場合
+    """
+    if refine_settings is None:
+        results = translate_texts(texts, draft_settings, cancel_token)
+        return results, results
+    if cancel_token is not None:
+        cancel_token.raise_if_cancelled()
+    started_at = time.perf_counter()
+    drafts = []
+    draft_elapsed = []
+    draft_tokens = []
+
+    def deliver(results):
+        draft_elapsed.append(time.perf_counter() - started_at)
+        # 速報の生成トークン数は、on_draft を呼び出す前にエンジンが記録している
+        draft_tokens.append(sum(engine.last_generated_tokens()))
+        drafts.extend(results)
+        on_draft(results)
+
+    refined = engine.translate_cascade(
+        texts, SOURCE_LANG, TARGET_LANG, draft_settings, refine_settings, deliver,
+        cancel_token=cancel_token
+    )
+    elapsed = time.perf_counter() - started_at
+    # 速報と改善の生成をそれぞれのビーム数の速度として記録する
+    for generated_tokens, settings, seconds in (
+        (draft_tokens[0], draft_settings, draft_elapsed[0]),
+        (sum(engine.last_generated_tokens()), refine_settings, elapsed - draft_elapsed[0]),
+    ):
+        generation_policy.record(
+            generated_tokens, settings["num_beams"], seconds, batch_size=len(texts)
+        )
+        record_generation(generated_tokens, seconds)
+    batch_size_histogram.observe(len(texts))
+    return drafts, refined
+
+def ndjson_line(item):
+    """
+    NDJSON形式の1行を作成します。
+
+    Args:
+        item (dict): 送信するデータ
+
+    Returns:
+        str: 改行で終わるJSON文字列
+    """
+    return json.dumps(item, ensure_ascii=False) + "\n"
+
+# 同時に届いたリクエストをまとめて推論するスケジューラ
+# 実行中のバッチ数は推論エグゼキュータの同時実行数に合わせる
+batcher = MicroBatcher(
+    process_translation_batch,
+    max_batch_size=batch_max_size,
+    window_ms=batch_window_ms,
+    max_inflight_batches=inference_concurrency,
+    max_queue_size=inference_queue_size,
+    wait_observer=batch_wait_seconds.observe
+)
+
+def cache_stats():
+    """メトリクス用に、メモリキャッシュと永続キャッシュの統計情報をキャッシュの種類ごとに取得する"""
+    caches = {"memory": translation_cache.stats()}
+    if persistent_cache is not None:
+        caches["persistent"] = persistent_cache.stats()
+    return caches
+
+def generation_speed():
+    """メトリクス用に、生成ポリシーが推定したビーム数×トークン数毎秒を取得する"""
+    return generation_policy.stats()["beam_tokens_per_sec"]
+
+def process_rss_bytes():
+    """メトリクス用に、プロセスの常駐メモリサイズ（バイト）を取得する"""
+    rss_mb = get_process_rss_mb()
+    return rss_mb * 1024 * 1024 if rss_mb is not None else None
+
+metrics.callback(
+    "cache_hits_total", "翻訳キャッシュのヒット数",
+    lambda: {(name,): stats["hits"] for name, stats in cache_stats().items()},
+    type_name="counter", labelnames=("cache",)
+)
+metrics.callback(
+    "cache_misses_total", "翻訳キャッシュのミス数",
+    lambda: {(name,): stats["misses"] for name, stats in cache_stats().items()},
+    type_name="counter", labelnames=("cache",)
+)
+metrics.callback(
+    "cache_hit_ratio", "翻訳キャッシュのヒット率",
+    lambda: {(name,): stats["hit_rate"] for name, stats in cache_stats().items()},
+    labelnames=("cache",)
+)
+metrics.callback(
+    "admission_depth", "受け付け中のリクエスト数",
+    lambda: {
+        (lane,): lane_stats["depth"] for lane, lane_stats in admission.stats()["lanes"].items()
+    },
+    labelnames=("lane",)
+)
+metrics.callback(
+    "admission_rejected_total", "混雑のため拒否したリクエスト数",
+    lambda: {
+        (lane,): lane_stats["rejected"] for lane, lane_stats in admission.stats()["lanes"].items()
+    },
+    type_name="counter", labelnames=("lane",)
+)
+metrics.callback("inference_active", "実行中の推論の数", lambda: inference_executor.stats()["active"])
+metrics.callback("inference_queued", "実行待ちの推論の数", lambda: inference_executor.stats()["queued"])
+metrics.callback("beam_tokens_per_second", "生成ポリシーが推定したビーム数×トークン数毎秒", generation_speed)
+metrics.callback("process_resident_memory_bytes", "プロセスの常駐メモリサイズ（バイト）", process_rss_bytes)
+
+# 起動時に計測した支援の有無による所要時間の比較
+assisted_benchmark = {}
+
+def assisted_stat(name):
+    """メトリクス用に、支援付き生成の統計情報を取得する（支援付き生成を使用しない場合はNone）"""
+    assistant = getattr(engine, "assistant", None)
+    return assistant.stats()[name] if assistant is not None else None
+
+metrics.callback(
+    "assisted_generations_total", "支援付き生成の回数",
+    lambda: assisted_stat("generations"), type_name="counter"
+)
+metrics.callback(
+    "assisted_draft_tokens_total", "ドラフトモデルが提案したトークン数",
+    lambda: assisted_stat("draft_tokens"), type_name="counter"
+)
+metrics.callback(
+    "assisted_accepted_tokens_total", "翻訳モデルが採用したドラフトモデルの提案のトークン数",
+    lambda: assisted_stat("accepted_tokens"), type_name="counter"
+)
+metrics.callback(
+    "assisted_acceptance_ratio", "ドラフトモデルの提案の採用率", lambda: assisted_stat("acceptance_rate")
+)
+metrics.callback(
+    "assisted_tokens_per_target_step", "支援付き生成での翻訳モデルの1ステップあたりの生成トークン数",
+    lambda: assisted_stat("tokens_per_target_step")
+)
+metrics.callback(
+    "assisted_speedup",
+    "起動時に計測した支援付き生成の速度の比（支援なしの所要時間÷支援付きの所要時間）",
+    lambda: (
+        assisted_benchmark.get("speedup")
+        if getattr(engine, "assistant", None) is not None else None
+    )
+)
+
+def not_ready_response():
+    """
+    モデルの準備ができていないときのレスポンスを作成します。
+
+    Returns:
+        JSONResponse: 現在の準備状態を含むステータスコード503のエラーレスポンス
+    """
+    if readiness.state == STATE_FAILED:
+        message = f"翻訳モデルの読み込みに失敗しました: {readiness.error}"
+    else:
+        message = "翻訳モデルを準備しています。しばらくしてから再試行してください。"
+    return JSONResponse(
+        status_code=503,
+        content={"error": message, "status": readiness.state},
+        headers={"Retry-After": "1"}
+    )
+
+def overloaded_response(retry_after=None):
+    """
+    受け付け中のリクエストや推論の待ち行列が上限に達したときのレスポンスを作成します。
+
+    Args:
+        retry_after (int, optional): 再試行までの目安時間（秒）。省略時はアドミッション制御の見積もりを使用します
+
+    Returns:
+        JSONResponse: Retry-After ヘッダー付きのステータスコード429のエラーレスポンス
+    """
+    if retry_after is None:
+        retry_after = admission.retry_after()
+    return JSONResponse(
+        status_code=429,
+        content={"error": "翻訳サーバーが混雑しています。しばらくしてから再試行してください。", "retry_after": retry_after},
+        headers={"Retry-After": str(retry_after)}
+    )
+
+async def watch_disconnect(request, cancel_token):
+    """
+    クライアントの切断を監視し、切断された場合は翻訳をキャンセルします。
+
+    Args:
+        request (Request): 監視するHTTPリクエスト
+        cancel_token (CancellationToken): 切断時にキャンセルするトークン
+    """
+    while not cancel_token.is_cancelled:
+        if await request.is_disconnected():
+            print(f"クライアントが切断されたため、翻訳をキャンセルします（request_id: {cancel_token.request_id}）")
+            cancel_token.cancel()
+            return
+        await asyncio.sleep(DISCONNECT_POLL_INTERVAL)
+
+def cancelled_response(cancel_token):
+    """
+    キャンセルされた翻訳のレスポンスを作成します。
+
+    Args:
+        cancel_token (CancellationToken): キャンセルされたリクエストのトークン
+
+    Returns:
+        dict: キャンセルされたことを示す辞書
+    """
+    return {"error": "翻訳はキャンセルされました。", "cancelled": True, "request_id": cancel_token.request_id}
+
+async def translate_text(text, settings, cache_key, cancel_token, priority=0):
+    """
+    1件のテキストをキャッシュとマイクロバッチを通して翻訳します。
+
+    メモリ上のキャッシュ、永続キャッシュの順に翻訳結果を探し、なければリクエストは
+    マイクロバッチにまとめられ、他の同時リクエストと一緒に翻訳されます。
+
+    Args:
+        text (str): 翻訳対象のテキスト
+        settings (dict): 生成設定
+        cache_key (tuple): make_cache_key() で作成したキャッシュキー
+        cancel_token: CancellationToken または BatchCancellation
+        priority (int, optional): 優先度（小さいほど先に推論される）
+
+    Returns:
+        str: 翻訳結果
+
+    Raises:
+        TranslationCancelledError: 翻訳がキャンセルされた場合
+        asyncio.QueueFull, InferenceQueueFullError: 待ち行列が上限に達した場合
+    """
+    async def compute():
+        stored = (await lookup_persistent_cache([cache_key]))[0]
+        if stored is not None:
+            return stored
+        # 優先度やビーム数が異なるリクエストは同じバッチにまとめない
+        result = await batcher.submit(
+            (text, settings, cancel_token, priority),
+            group_key=(priority, settings["num_beams"]),
+            priority=priority
+        )
+        store_persistent_cache(cache_key, result)
+        return result
+
+    while True:
+        try:
+            return await translation_cache.get_or_compute(cache_key, compute)
+        except TranslationCancelledError:
+            # 同じ翻訳を先に始めた別のリクエストがキャンセルされた場合は自分で翻訳し直す
+            if cancel_token.is_cancelled:
+                raise
+
+async def translate_chunked(text, quality, latency_budget_ms, cancel_token, priority=0):
+    """
+    テキストをチャンクに分割して翻訳し、翻訳結果を元の行の構成に戻して結合します。
+
+    チャンクは同時にマイクロバッチへ登録されるため、1つのバッチとしてまとめて推論されます。
+    チャンクごとにキャッシュされるため、一部が同じ別のテキストでも翻訳結果が再利用されます。
+
+    Args:
+        text (str): 翻訳対象のテキスト
+        quality (str): 品質/速度のヒント
+        latency_budget_ms (float): リクエストの遅延の目標値（ミリ秒）
+        cancel_token: CancellationToken または BatchCancellation
+        priority (int, optional): 優先度（小さいほど先に推論される）
+
+    Returns:
+        str: 翻訳結果
+
+    Raises:
+        ValueError: 不明な品質/速度のヒントが指定された場合
+        TranslationCancelledError: 翻訳がキャンセルされた場合
+        asyncio.QueueFull, InferenceQueueFullError: 待ち行列が上限に達した場合
+    """
+    [chunked], [settings_list] = await plan_chunks([text], (quality,), latency_budget_ms)
+    translations = await asyncio.gather(*(
+        translate_text(chunk, settings, make_cache_key(chunk, settings), cancel_token, priority)
+        for chunk, settings in zip(chunked.chunks, settings_list)
+    ))
+    return chunked.join(translations)
 
 @app.post("/translate")
-async def translate(request_data: InferenceRequest):
+async def translate(request_data: InferenceRequest, request: Request):
     """
     テキスト翻訳エンドポイント
     
-    英語から日本語への翻訳を行います。M2M100モデルを使用して翻訳を実行し、
-    結果をJSON形式で返します。
+    英語から日本語への翻訳を行います。メモリ上のキャッシュ、永続キャッシュの順に
+    翻訳結果を探し、なければリクエストはマイクロバッチにまとめられ、他の同時リクエストと
+    一緒にM2M100モデルで翻訳されます。結果はJSON形式で返します。
+    クライアントが切断した場合や /cancel でキャンセルされた場合は、実行待ちまたは
+    生成中の推論を止めます。
+    受け付け中のリクエストが上限に達している場合は、ステータスコード429ですぐに応答します。
     
     Args:
         request_data (InferenceRequest): 翻訳リクエストデータ
+        request (Request): 切断の監視に使用するHTTPリクエスト
         
     Returns:
         dict: 翻訳結果または発生したエラーを含む辞書
     """
-    input_text = request_data.text
-    # ソース言語を英語に設定（必要に応じて変更）
-    tokenizer.src_lang = "en"
-    inputs = tokenizer(input_text, return_tensors="pt")
-    
-    # GPUを使用する場合のみ、入力テンソルをデバイスに転送
-    if use_gpu:
-        inputs = {k: v.to(device) for k, v in inputs.items()}
-    
-    # 翻訳の設定
-    generation_config = GenerationConfig(
-        max_length=200,  # 最大出力長
-        early_stopping=True,  # 早期終了
-        num_beams=5  # ビームサーチのビーム数
-    )
+    if not readiness.is_ready:
+        return not_ready_response()
+    try:
+        lane = admission.resolve_lane(request_data.priority)
+        ticket = admission.acquire(lane)
+    except ValueError as e:
+        return {"error": str(e)}
+    except AdmissionRejectedError as e:
+        print(f"受け付け中のリクエストが上限に達したため、リクエストを拒否しました（{lane}）")
+        return overloaded_response(e.retry_after)
+    cancel_token = cancellation_registry.register(request_data.request_id)
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+    try:
+        translated_text = await translate_chunked(
+            request_data.text, request_data.quality, request_data.latency_budget_ms,
+            cancel_token, lane_priority(lane)
+        )
+        return {"result": translated_text, "request_id": cancel_token.request_id}
+    except TranslationCancelledError:
+        return cancelled_response(cancel_token)
+    except (asyncio.QueueFull, InferenceQueueFullError):
+        print("推論の待ち行列が上限に達したため、リクエストを拒否しました")
+        return overloaded_response()
+    except Exception as e:
+        print(f"翻訳処理中にエラーが発生しました: {e}")
+        return {"error": str(e)}
+    finally:
+        watcher.cancel()
+        cancellation_registry.unregister(cancel_token)
+        admission.release(ticket)
+
+@app.post("/translate_batch")
+async def translate_batch(request_data: BatchInferenceRequest, request: Request):
+    """
+    一括翻訳エンドポイント
+
+    複数のテキストを英語から日本語へ翻訳します。各テキストをチャンクに分割し、キャッシュにない
+    チャンクだけを重複なく集め、トークナイザーと model.generate はそれらに対して1回だけ呼び出されます。
+    結果は入力と同じ順序で返されます。
+    失敗したテキストはバッチ全体を失敗させず、その要素にだけエラーを設定します。
+
+    Args:
+        request_data (BatchInferenceRequest): 一括翻訳リクエストデータ
+        request (Request): 切断の監視に使用するHTTPリクエスト
+
+    Returns:
+        dict: 要素ごとの翻訳結果（{"result": ...} または {"error": ...}）のリストを含む辞書
+    """
+    if not readiness.is_ready:
+        return not_ready_response()
+    texts = request_data.texts
+    results = [None] * len(texts)
+
+    # 空のテキストは推論せずにエラーとする
+    valid_indices = []
+    for i, text in enumerate(texts):
+        if not text or not text.strip():
+            results[i] = {"error": "翻訳するテキストが空です。"}
+        else:
+            valid_indices.append(i)
+    if not valid_indices:
+        return {"results": results}
 
+    # すべてのテキストのチャンクを1つのリストにまとめて翻訳し、最後にテキストごとに結合する
     try:
-        # 翻訳の実行
-        generated_tokens = model.generate(
-            **inputs,
-            forced_bos_token_id=tokenizer.get_lang_id("ja"),  # 強制的に日本語で出力
-            generation_config=generation_config
+        chunked_list, [settings_list] = await plan_chunks(
+            [texts[i] for i in valid_indices], (request_data.quality,),
+            request_data.latency_budget_ms
         )
-        # トークンをテキストにデコード
-        translated_text = tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)[0]
-        return {"result": translated_text}
+        # 一括翻訳は指定がなければバックグラウンドの翻訳として扱う
+        lane = admission.resolve_lane(request_data.priority, default=LANE_BULK)
+    except ValueError as e:
+        return {"error": str(e)}
+    chunked = dict(zip(valid_indices, chunked_list))
+    chunk_owners = [i for i in valid_indices for _ in chunked[i].chunks]
+    chunk_texts = [chunk for i in valid_indices for chunk in chunked[i].chunks]
+    chunk_results = [None] * len(chunk_texts)
+
+    # キャッシュにないチャンクはキーごとにまとめる
+    pending = {}
+    for k, (chunk, settings) in enumerate(zip(chunk_texts, settings_list)):
+        cache_key = make_cache_key(chunk, settings)
+        if cache_key in pending:
+            pending[cache_key][2].append(k)
+            continue
+        cached = translation_cache.get(cache_key)
+        if cached is not None:
+            chunk_results[k] = {"result": cached}
+        else:
+            pending[cache_key] = (chunk, settings, [k])
+
+    # メモリ上のキャッシュにないものは永続キャッシュを確認する
+    if pending:
+        stored_values = await lookup_persistent_cache(list(pending))
+        for key, stored in zip(list(pending), stored_values):
+            if stored is None:
+                continue
+            translation_cache.put(key, stored)
+            for k in pending.pop(key)[2]:
+                chunk_results[k] = {"result": stored}
+
+    if pending:
+        keys = list(pending)
+        try:
+            ticket = admission.acquire(lane)
+        except AdmissionRejectedError as e:
+            print(f"受け付け中のリクエストが上限に達したため、一括翻訳リクエストを拒否しました（{lane}）")
+            return overloaded_response(e.retry_after)
+        cancel_token = cancellation_registry.register(request_data.request_id)
+        watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+        try:
+            translated = await inference_executor.run(
+                translate_texts_isolated,
+                [pending[key][0] for key in keys],
+                generation_policy.merge([pending[key][1] for key in keys]),
+                cancel_token,
+                priority=lane_priority(lane)
+            )
+        except InferenceQueueFullError:
+            print("推論の待ち行列が上限に達したため、一括翻訳リクエストを拒否しました")
+            return overloaded_response()
+        finally:
+            watcher.cancel()
+            cancellation_registry.unregister(cancel_token)
+            admission.release(ticket)
+        if cancel_token.is_cancelled:
+            return cancelled_response(cancel_token)
+        for key, item in zip(keys, translated):
+            if isinstance(item, Exception):
+                print(f"翻訳処理中にエラーが発生しました: {item}")
+                entry = {"error": str(item)}
+            else:
+                translation_cache.put(key, item)
+                store_persistent_cache(key, item)
+                entry = {"result": item}
+            for k in pending[key][2]:
+                chunk_results[k] = entry
+
+    # チャンクの翻訳結果をテキストごとに結合する（1つでも失敗したチャンクがあればそのテキストはエラー）
+    for i in valid_indices:
+        entries = [entry for owner, entry in zip(chunk_owners, chunk_results) if owner == i]
+        error = next((entry for entry in entries if "error" in entry), None)
+        results[i] = error or {"result": chunked[i].join([entry["result"] for entry in entries])}
+
+    return {"results": results}
+
+@app.post("/translate_stream")
+async def translate_stream(request_data: InferenceRequest, request: Request):
+    """
+    ストリーミング翻訳エンドポイント
+
+    翻訳結果を生成されたそばから NDJSON 形式（1行に1つのJSON）で返します。
+    各行は {"delta": "追加されたテキスト"} で、最後に {"done": true, "result": "全文"} を返します。
+    翻訳中にエラーが発生した場合は {"error": "..."} を返して終了します。
+    逐次生成はビームサーチに対応していないため、貪欲法（quality="fast" と同じ設定）で翻訳します。
+    長いテキストはチャンクに分割し、チャンクの順に逐次翻訳します。
+    すべてのチャンクの翻訳結果がキャッシュにある場合は、全文を1行で返します。
+    クライアントが切断した場合や /cancel でキャンセルされた場合は、生成を途中で止めて
+    {"error": "...", "cancelled": true} を返します。
+
+    Args:
+        request_data (InferenceRequest): 翻訳リクエストデータ
+        request (Request): 切断の監視に使用するHTTPリクエスト
+
+    Returns:
+        StreamingResponse: application/x-ndjson 形式のレスポンス
+    """
+    if not readiness.is_ready:
+        return not_ready_response()
+    text = request_data.text
+    try:
+        [chunked], [settings_list] = await plan_chunks([text], ("fast",))
+        lane = admission.resolve_lane(request_data.priority)
+    except Exception as e:
+        print(f"翻訳処理中にエラーが発生しました: {e}")
+        return {"error": str(e)}
+    cache_keys = [
+        make_cache_key(chunk, settings) for chunk, settings in zip(chunked.chunks, settings_list)
+    ]
+
+    cached = [translation_cache.get(key) for key in cache_keys]
+    missing = [k for k, value in enumerate(cached) if value is None]
+    if missing:
+        stored_values = await lookup_persistent_cache([cache_keys[k] for k in missing])
+        for k, stored in zip(missing, stored_values):
+            if stored is not None:
+                translation_cache.put(cache_keys[k], stored)
+                cached[k] = stored
+    if all(value is not None for value in cached):
+        full_text = chunked.join(cached)
+
+        async def cached_stream():
+            yield ndjson_line({"delta": full_text})
+            yield ndjson_line({"done": True, "result": full_text})
+        return StreamingResponse(cached_stream(), media_type="application/x-ndjson")
+
+    # 推論スレッドから届くテキストをイベントループ上のキューで受け取る
+    loop = asyncio.get_running_loop()
+    chunks = asyncio.Queue()
+
+    def on_text(delta):
+        loop.call_soon_threadsafe(chunks.put_nowait, delta)
+
+    try:
+        ticket = admission.acquire(lane)
+    except AdmissionRejectedError as e:
+        print(f"受け付け中のリクエストが上限に達したため、ストリーミング翻訳リクエストを拒否しました（{lane}）")
+        return overloaded_response(e.retry_after)
+    cancel_token = cancellation_registry.register(request_data.request_id)
+    try:
+        future = inference_executor.submit(
+            stream_translation, chunked, settings_list, cached, on_text, cancel_token,
+            priority=lane_priority(lane)
+        )
+    except InferenceQueueFullError:
+        cancellation_registry.unregister(cancel_token)
+        admission.release(ticket)
+        print("推論の待ち行列が上限に達したため、ストリーミング翻訳リクエストを拒否しました")
+        return overloaded_response()
+    # 推論の完了はすべてのテキストの後に届くため、終了の目印として None を入れる
+    future.add_done_callback(lambda _: chunks.put_nowait(None))
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+
+    async def stream():
+        try:
+            while True:
+                delta = await chunks.get()
+                if delta is None:
+                    break
+                yield ndjson_line({"delta": delta})
+            try:
+                translations = future.result()
+            except TranslationCancelledError:
+                yield ndjson_line(cancelled_response(cancel_token))
+                return
+            except Exception as e:
+                print(f"ストリーミング翻訳中にエラーが発生しました: {e}")
+                yield ndjson_line({"error": str(e)})
+                return
+            for k in missing:
+                if cached[k] is None:
+                    translation_cache.put(cache_keys[k], translations[k])
+                    store_persistent_cache(cache_keys[k], translations[k])
+            result = chunked.join(translations)
+            yield ndjson_line(
+                {"done": True, "result": result, "request_id": cancel_token.request_id}
+            )
+        finally:
+            # 送信の途中で接続が閉じられた場合も、残りの生成を止める
+            if not future.done():
+                cancel_token.cancel()
+            watcher.cancel()
+            cancellation_registry.unregister(cancel_token)
+            admission.release(ticket)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+@app.post("/translate_cascade")
+async def translate_cascade(request_data: InferenceRequest, request: Request):
+    """
+    2段階翻訳エンドポイント
+
+    まず貪欲法で翻訳した速報を返し、続けてビームサーチで翻訳し直した結果を NDJSON 形式（1行に1つのJSON）で返します。
+    速報は {"draft": "速報の全文"}、最後に {"done": true, "result": "全文", "refined": true} を返します。
+    ビームサーチではエンコーダを再実行せず、速報のときの出力を再利用します（PyTorchエンジンの場合）。
+    生成ポリシーが貪欲法を選んだ場合（quality="fast" など）は速報を送らず、1回の翻訳結果を
+    "refined": false として返します。改善した翻訳結果がすべてキャッシュにある場合も、速報を送らずに全文を1行で返します。
+    速報の後にクライアントが切断した場合や /cancel でキャンセルされた場合は、ビームサーチを途中で止めて
+    {"error": "...", "cancelled": true} を返します。
+
+    Args:
+        request_data (InferenceRequest): 翻訳リクエストデータ
+        request (Request): 切断の監視に使用するHTTPリクエスト
+
+    Returns:
+        StreamingResponse: application/x-ndjson 形式のレスポンス
+    """
+    if not readiness.is_ready:
+        return not_ready_response()
+    try:
+        [chunked], [refine_settings_list, draft_settings_list] = await plan_chunks(
+            [request_data.text], (request_data.quality, "fast"), request_data.latency_budget_ms
+        )
+        lane = admission.resolve_lane(request_data.priority)
     except Exception as e:
         print(f"翻訳処理中にエラーが発生しました: {e}")
         return {"error": str(e)}
+    # ビーム数はすべてのチャンクで共通
+    refine = refine_settings_list[0]["num_beams"] > 1
+    cache_keys = [
+        make_cache_key(chunk, settings)
+        for chunk, settings in zip(chunked.chunks, refine_settings_list)
+    ]
+
+    cached = [translation_cache.get(key) for key in cache_keys]
+    missing = [k for k, value in enumerate(cached) if value is None]
+    if missing:
+        stored_values = await lookup_persistent_cache([cache_keys[k] for k in missing])
+        for k, stored in zip(missing, stored_values):
+            if stored is not None:
+                translation_cache.put(cache_keys[k], stored)
+                cached[k] = stored
+        missing = [k for k in missing if cached[k] is None]
+    if not missing:
+        full_text = chunked.join(cached)
+
+        async def cached_stream():
+            yield ndjson_line({"done": True, "result": full_text, "refined": refine})
+        return StreamingResponse(cached_stream(), media_type="application/x-ndjson")
+
+    # 推論スレッドから届く速報をイベントループ上のキューで受け取る
+    loop = asyncio.get_running_loop()
+    drafts = asyncio.Queue()
+
+    def on_draft(results):
+        loop.call_soon_threadsafe(drafts.put_nowait, results)
+
+    try:
+        ticket = admission.acquire(lane)
+    except AdmissionRejectedError as e:
+        print(f"受け付け中のリクエストが上限に達したため、2段階翻訳リクエストを拒否しました（{lane}）")
+        return overloaded_response(e.retry_after)
+    cancel_token = cancellation_registry.register(request_data.request_id)
+    try:
+        future = inference_executor.submit(
+            cascade_translation,
+            [chunked.chunks[k] for k in missing],
+            generation_policy.merge([draft_settings_list[k] for k in missing]),
+            generation_policy.merge([refine_settings_list[k] for k in missing]) if refine else None,
+            on_draft,
+            cancel_token,
+            priority=lane_priority(lane)
+        )
+    except InferenceQueueFullError:
+        cancellation_registry.unregister(cancel_token)
+        admission.release(ticket)
+        print("推論の待ち行列が上限に達したため、2段階翻訳リクエストを拒否しました")
+        return overloaded_response()
+    # 推論の完了は速報の後に届くため、終了の目印として None を入れる
+    future.add_done_callback(lambda _: drafts.put_nowait(None))
+    watcher = asyncio.create_task(watch_disconnect(request, cancel_token))
+
+    def merge_chunks(results):
+        """キャッシュにあったチャンクと翻訳したチャンクの結果を元の順序に戻す"""
+        merged = list(cached)
+        for k, result in zip(missing, results):
+            merged[k] = result
+        return merged
+
+    async def stream():
+        try:
+            while True:
+                results = await drafts.get()
+                if results is None:
+                    break
+                yield ndjson_line({"draft": chunked.join(merge_chunks(results))})
+            try:
+                draft_results, refined_results = future.result()
+            except TranslationCancelledError:
+                yield ndjson_line(cancelled_response(cancel_token))
+                return
+            except Exception as e:
+                print(f"2段階翻訳中にエラーが発生しました: {e}")
+                yield ndjson_line({"error": str(e)})
+                return
+            for k, draft, result in zip(missing, draft_results, refined_results):
+                if refine:
+                    # 速報は貪欲法の翻訳結果として /translate_stream などでも再利用できる
+                    draft_key = make_cache_key(chunked.chunks[k], draft_settings_list[k])
+                    translation_cache.put(draft_key, draft)
+                    store_persistent_cache(draft_key, draft)
+                translation_cache.put(cache_keys[k], result)
+                store_persistent_cache(cache_keys[k], result)
+            result = chunked.join(merge_chunks(refined_results))
+            yield ndjson_line({
+                "done": True, "result": result, "refined": refine,
+                "request_id": cancel_token.request_id
+            })
+        finally:
+            # 送信の途中で接続が閉じられた場合も、残りの生成を止める
+            if not future.done():
+                cancel_token.cancel()
+            watcher.cancel()
+            cancellation_registry.unregister(cancel_token)
+            admission.release(ticket)
+
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+def job_content(job):
+    """
+    翻訳ジョブの状態を表す内容を作成します。
+
+    Args:
+        job (TranslationJob): 翻訳ジョブ
+
+    Returns:
+        dict: ジョブID、状態、翻訳結果またはエラーを含む辞書。
+            待ち行列があふれて失敗したジョブは "overloaded" を含みます
+    """
+    status = job.status
+    content = {"job_id": job.job_id, "status": status}
+    if status == JOB_PENDING:
+        return content
+    if status == JOB_DONE:
+        content["result"] = job.future.result()
+        return content
+    error = job.future.exception()
+    if isinstance(error, (asyncio.QueueFull, InferenceQueueFullError)):
+        content["overloaded"] = True
+    elif isinstance(error, TranslationCancelledError):
+        content.update(cancelled_response(job.cancel_token))
+    else:
+        content["error"] = str(error)
+    return content
+
+def job_response(content):
+    """
+    翻訳ジョブの状態を表すレスポンスを作成します。
+
+    Args:
+        content (dict): job_content() で作成した内容
+
+    Returns:
+        dict または JSONResponse: ジョブID、状態、翻訳結果またはエラーを含むレスポンス。
+            待ち行列があふれて失敗したジョブはステータスコード429で返します
+    """
+    if content.get("overloaded"):
+        return overloaded_response()
+    return content
+
+def publish_job_result(job_id, content):
+    """
+    このワーカーで完了したジョブの結果を他のワーカーから参照できるように書き込みます。
+
+    Args:
+        job_id (str): ジョブID
+        content (dict): job_content() で作成した内容
+    """
+    try:
+        worker_coordinator.finish_job(job_id, content["status"], content)
+    except Exception as e:
+        print(f"翻訳ジョブの結果の共有中にエラーが発生しました: {e}")
+
+async def wait_shared_job(job_id, wait):
+    """
+    別のワーカーが実行する翻訳ジョブの完了を最大 wait 秒待ちます。
+
+    Args:
+        job_id (str): ジョブID
+        wait (float): ジョブの完了を待つ最大秒数
+
+    Returns:
+        dict: job_content() と同じ形式の内容。ジョブが存在しないか保持期間を過ぎた場合はNone
+    """
+    loop = asyncio.get_running_loop()
+    deadline = time.monotonic() + wait
+    while True:
+        shared = await loop.run_in_executor(None, worker_coordinator.get_job, job_id)
+        if shared is None:
+            return None
+        if shared["status"] != JOB_PENDING or time.monotonic() >= deadline:
+            return shared["content"] or {"job_id": job_id, "status": shared["status"]}
+        await asyncio.sleep(0.1)
+
+@app.post("/jobs")
+async def submit_job(request_data: InferenceRequest):
+    """
+    翻訳ジョブ登録エンドポイント
+
+    翻訳をジョブとして登録し、完了を待たずにジョブIDを返します。結果は GET /jobs/{job_id} で取得します。
+    同じテキストと生成設定のジョブが実行中、または完了から JOB_RESULT_TTL_SEC 秒以内の場合は、
+    新しく翻訳せずに既存のジョブを返します。そのため、クライアントがタイムアウト後に
+    同じジョブを登録し直しても、サーバー上で同じ翻訳が二重に実行されることはありません。
+    複数のワーカーで実行する場合は、別のワーカーのジョブも重複排除の対象になります。
+    クライアントの切断ではキャンセルされず、/cancel でのみキャンセルされます。
+
+    Args:
+        request_data (InferenceRequest): 翻訳リクエストデータ
+
+    Returns:
+        dict: ジョブID、状態（pending / done / failed）、完了している場合は翻訳結果を含む辞書
+    """
+    if not readiness.is_ready:
+        return not_ready_response()
+    text = request_data.text
+    if not text or not text.strip():
+        return {"error": "翻訳するテキストが空です。"}
+    try:
+        # ジョブの重複排除にはテキスト全体の生成設定を含むキーを使う
+        loop = asyncio.get_running_loop()
+        [settings] = await loop.run_in_executor(
+            None, resolve_generation_settings, [text], request_data.quality,
+            request_data.latency_budget_ms
+        )
+        lane = admission.resolve_lane(request_data.priority)
+    except ValueError as e:
+        return {"error": str(e)}
+    cache_key = make_cache_key(text, settings)
+
+    async def compute(job):
+        return await translate_chunked(
+            text, request_data.quality, request_data.latency_budget_ms, job.cancel_token,
+            lane_priority(lane)
+        )
+
+    try:
+        ticket = admission.acquire(lane)
+    except AdmissionRejectedError as e:
+        print(f"受け付け中のリクエストが上限に達したため、翻訳ジョブを拒否しました（{lane}）")
+        return overloaded_response(e.retry_after)
+    job_id = None
+    if worker_coordinator is not None and job_store.find(cache_key) is None:
+        # 確認と登録を1つのトランザクションで行い、同じジョブを複数のワーカーで実行しないようにする
+        try:
+            claimed = await loop.run_in_executor(
+                None, worker_coordinator.claim_job, cache_key, uuid.uuid4().hex
+            )
+        except Exception as e:
+            admission.release(ticket)
+            print(f"翻訳ジョブの登録中にエラーが発生しました: {e}")
+            return {"error": str(e)}
+        if claimed["worker"] != worker_coordinator.worker_id:
+            admission.release(ticket)
+            print(f"別のワーカーの同じ内容の翻訳ジョブを共有します（job_id: {claimed['job_id']}）")
+            return job_response(
+                claimed["content"] or {"job_id": claimed["job_id"], "status": claimed["status"]}
+            )
+        job_id = claimed["job_id"]
+    cancel_token = cancellation_registry.register(request_data.request_id)
+    job, shared = job_store.submit(cache_key, compute, cancel_token, job_id)
+    job.future.add_done_callback(lambda _: cancellation_registry.unregister(cancel_token))
+    if shared:
+        # 既存のジョブを共有する場合は新たな推論を行わないため、受け付け枠をすぐに返す
+        admission.release(ticket)
+        print(f"同じ内容の翻訳ジョブを共有します（job_id: {job.job_id}）")
+    else:
+        job.future.add_done_callback(lambda _: admission.release(ticket))
+        if worker_coordinator is not None:
+            job.future.add_done_callback(lambda _: loop.run_in_executor(
+                None, publish_job_result, job.job_id, job_content(job)
+            ))
+    return job_response(job_content(job))
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0.0):
+    """
+    翻訳ジョブ取得エンドポイント
+
+    wait を指定すると、ジョブが完了するまで最大 wait 秒（JOB_MAX_WAIT_SEC まで）待ってから応答します（ロングポーリング）。
+    複数のワーカーで実行する場合は、別のワーカーが実行したジョブも取得できます。
+
+    Args:
+        job_id (str): POST /jobs で返されたジョブID
+        wait (float, optional): ジョブの完了を待つ最大秒数。デフォルトは0（すぐに応答）
+
+    Returns:
+        dict: ジョブID、状態、翻訳結果またはエラーを含む辞書。
+            ジョブが存在しないか保持期間を過ぎた場合はステータスコード404
+    """
+    wait = min(max(0.0, wait), job_max_wait_sec)
+    job = job_store.get(job_id)
+    if job is None:
+        content = None
+        if worker_coordinator is not None:
+            content = await wait_shared_job(job_id, wait)
+        if content is None:
+            return JSONResponse(
+                status_code=404,
+                content={"error": "翻訳ジョブが見つかりません。登録し直してください。", "job_id": job_id}
+            )
+        return job_response(content)
+    await job_store.wait(job, wait)
+    return job_response(job_content(job))
+
+@app.post("/cancel")
+async def cancel(request_data: CancelRequest):
+    """
+    翻訳キャンセルエンドポイント
+
+    指定したリクエストIDの翻訳が実行待ちの場合は推論を行わずに、生成中の場合は
+    次のデコードステップで止めます。新しいキャプチャで不要になった翻訳を止めるために使用します。
+    複数のワーカーで実行する場合は、翻訳を実行している別のワーカーにもキャンセルを通知します。
+
+    Args:
+        request_data (CancelRequest): キャンセルリクエストデータ
+
+    Returns:
+        dict: キャンセルした翻訳があったかどうかを含む辞書
+    """
+    cancelled = cancellation_registry.cancel(request_data.request_id)
+    if worker_coordinator is not None:
+        try:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(
+                None, worker_coordinator.publish_cancel, request_data.request_id
+            )
+        except Exception as e:
+            print(f"キャンセルの通知中にエラーが発生しました: {e}")
+    if cancelled:
+        print(f"翻訳をキャンセルしました（request_id: {request_data.request_id}）")
+    return {"cancelled": cancelled, "request_id": request_data.request_id}
+
+@app.get("/health")
+async def health():
+    """
+    準備状態確認エンドポイント
+
+    起動処理の状態（loading / warming / ready / failed）、実行中の段階とその経過時間、
+    段階ごとの所要時間を返します。準備が完了していない場合はステータスコード503で応答します。
+
+    Returns:
+        JSONResponse: 準備状態を含むレスポンス
+    """
+    content = readiness.snapshot()
+    content["engine"] = engine.cache_tag if engine is not None else None
+    return JSONResponse(status_code=200 if readiness.is_ready else 503, content=content)
+
+@app.get("/stats")
+async def stats():
+    """
+    サーバー統計情報エンドポイント
+
+    マイクロバッチのバッチサイズやキュー待ち時間、推論エグゼキュータの実行状況、
+    優先度レーンごとの受け付け中のリクエスト数と待ち時間、翻訳キャッシュのヒット率などの統計情報を返します。
+    時間窓（BATCH_WINDOW_MS）や最大バッチサイズ（BATCH_MAX_SIZE）の調整に使用します。
+
+    Returns:
+        dict: 統計情報を含む辞書
+    """
+    return {
+        "batching": batcher.stats(),
+        "inference": inference_executor.stats(),
+        "admission": admission.stats(),
+        "generation": generation_policy.stats(),
+        "cancellation": cancellation_registry.stats(),
+        "jobs": job_store.stats(),
+        "workers": worker_coordinator.stats() if worker_coordinator is not None else None,
+        "cache": translation_cache.stats(),
+        "persistent_cache": persistent_cache.stats() if persistent_cache is not None else None,
+        "assisted_decoding": (
+            engine.assistant.stats() if getattr(engine, "assistant", None) is not None else None
+        )
+    }
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """
+    メトリクスエンドポイント
+
+    実行待ち時間・バッチ待ち時間・推論の段階ごとの所要時間のヒストグラム、トークン数、
+    キャッシュのヒット率、メモリ使用量などを Prometheus のテキスト形式で返します。
+
+    Returns:
+        Response: Prometheus テキスト形式のレスポンス
+    """
+    return Response(content=metrics.render(), media_type=CONTENT_TYPE)
 
 def start_server():
     """
@@ -186,12 +2073,24 @@ def start_server():
     app.pyから呼び出されるエントリーポイントです。
     FastAPIアプリケーションをUvicornサーバーで起動し、
     ローカルホスト上でポート11451でリッスンします。
+    SERVER_WORKERS が2以上の場合は、同じポートを共有する複数のワーカープロセスで起動します。
     
     Returns:
         None
     """
     print("翻訳サーバーを起動します...")
-    uvicorn.run(app, host="127.0.0.1", port=11451)
+    if server_workers > 1:
+        # ワーカープロセスはモジュールを読み込み直してアプリケーションを作成するため、インポート文字列で指定する
+        module_name = "translate_server_run" if __name__ == "__main__" else __name__
+        print(f"{server_workers}個のワーカープロセスで起動します")
+        # 前回の起動時に残ったジョブとキャンセルを引き継がない
+        remove_shared_state(worker_state_path)
+        uvicorn.run(
+            f"{module_name}:app", host="127.0.0.1", port=11451, workers=server_workers,
+            app_dir=current_dir
+        )
+    else:
+        uvicorn.run(app, host="127.0.0.1", port=11451)
 
 if __name__ == "__main__":
     start_server()
@@ -0,0 +1,199 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+翻訳キャッシュモジュール
+
+このモジュールは、翻訳結果をメモリ上に保持するサイズ上限付きのLRUキャッシュを実装します。
+ゲームのメニューやダイアログのように同じ文字列が何度もOCRされる場合に、
+推論を行わずに翻訳結果を返すために使用します。
+
+主な機能:
+- 言語・正規化したテキスト・生成設定をキーとしたLRUキャッシュ
+- 同時に実行中の同一リクエストの計算共有
+- ヒット数・ミス数・追い出し数などの統計情報
+"""
+
+import asyncio
+import re
+import threading
+import unicodedata
+from collections import OrderedDict
+
+# 行内の連続する空白にマッチする正規表現
+_WHITESPACE_RE = re.compile(r"[^\S\n]+")
+
+
+def normalize_text(text):
+    """
+    キャッシュキー用にテキストを正規化します。
+
+    Unicode正規化（NFC）を行い、各行の前後の空白を削除し、行内の連続する空白を
+    1つにまとめます。改行は翻訳結果に影響するため維持します。
+
+    Args:
+        text (str): 正規化するテキスト
+
+    Returns:
+        str: 正規化されたテキスト
+    """
+    text = unicodedata.normalize("NFC", text)
+    lines = [_WHITESPACE_RE.sub(" ", line).strip() for line in text.split("\n")]
+    return "\n".join(lines).strip()
+
+
+def _consume_exception(future):
+    """待機者のいない Future の例外が警告として出力されないようにする"""
+    if not future.cancelled():
+        future.exception()
+
+
+class TranslationCache:
+    """
+    翻訳結果のLRUキャッシュ
+
+    キャッシュは max_entries 件を上限とし、上限を超えると最も長く使われていない
+    エントリから追い出されます。get_or_compute() を使うと、同じキーの計算が
+    実行中の場合はその結果を共有します。
+
+    Attributes:
+        max_entries (int): キャッシュに保持する最大件数（0の場合はキャッシュしない）
+    """
+
+    def __init__(self, max_entries=4096):
+        """
+        TranslationCache クラスの初期化
+
+        Args:
+            max_entries (int, optional): キャッシュに保持する最大件数。デフォルトは4096
+        """
+        self.max_entries = max(0, int(max_entries))
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+
+        # 統計情報
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._coalesced = 0
+
+    @staticmethod
+    def make_key(text, src_lang, tgt_lang, settings=None):
+        """
+        キャッシュキーを作成します。
+
+        Args:
+            text (str): 翻訳対象のテキスト
+            src_lang (str): ソース言語
+            tgt_lang (str): ターゲット言語
+            settings (dict, optional): 翻訳結果に影響する生成設定
+
+        Returns:
+            tuple: キャッシュキー
+        """
+        settings_key = tuple(sorted((settings or {}).items()))
+        return (src_lang, tgt_lang, normalize_text(text), settings_key)
+
+    def get(self, key):
+        """
+        キャッシュから翻訳結果を取得します。
+
+        Args:
+            key (tuple): make_key() で作成したキャッシュキー
+
+        Returns:
+            str: キャッシュされた翻訳結果。存在しない場合はNone
+        """
+        with self._lock:
+            value = self._entries.get(key)
+            if value is None:
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key, value):
+        """
+        翻訳結果をキャッシュに保存します。
+
+        Args:
+            key (tuple): make_key() で作成したキャッシュキー
+            value (str): 翻訳結果
+        """
+        if self.max_entries == 0 or value is None:
+            return
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._evictions += 1
+
+    async def get_or_compute(self, key, compute):
+        """
+        キャッシュから翻訳結果を取得し、存在しなければ計算してキャッシュします。
+
+        同じキーの計算が既に実行中の場合は、新たに計算せずにその結果を待ちます。
+        計算に失敗した場合、結果はキャッシュされず、待機中の呼び出し元にも同じ例外が送られます。
+
+        Args:
+            key (tuple): make_key() で作成したキャッシュキー
+            compute (callable): 翻訳結果を返すコルーチンを作成する引数なしの関数
+
+        Returns:
+            str: 翻訳結果
+        """
+        value = self.get(key)
+        if value is not None:
+            return value
+
+        future = self._inflight.get(key)
+        if future is not None:
+            with self._lock:
+                self._coalesced += 1
+            return await asyncio.shield(future)
+
+        future = asyncio.get_running_loop().create_future()
+        future.add_done_callback(_consume_exception)
+        self._inflight[key] = future
+        try:
+            value = await compute()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        else:
+            self.put(key, value)
+            future.set_result(value)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    def clear(self):
+        """キャッシュの内容をすべて削除する"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        """
+        キャッシュの統計情報を取得します。
+
+        Returns:
+            dict: 件数、ヒット数、ミス数、追い出し数、ヒット率などを含む辞書
+        """
+        with self._lock:
+            lookups = self._hits + self._misses
+            return {
+                "max_entries": self.max_entries,
+                "entries": len(self._entries),
+                "hits": self._hits,
+                "misses": self._misses,
+                "evictions": self._evictions,
+                "coalesced": self._coalesced,
+                "inflight": len(self._inflight),
+                "hit_rate": round(self._hits / lookups, 4) if lookups else 0.0,
+            }
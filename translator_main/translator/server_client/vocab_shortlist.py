@@ -0,0 +1,454 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+語彙の絞り込みモジュール
+
+このモジュールは、翻訳モデルの出力層をターゲット言語で実際に使われるトークンだけに絞り込む機能を提供します。
+M2M100 は100言語・約12万8千トークンの語彙を持ち、デコーダの各ステップで語彙全体のスコアを計算しますが、
+日本語の出力に現れるトークンはその一部です。ローカルのコーパスから日本語の出力に現れるトークンの
+リスト（ショートリスト）を事前に作成し、出力層と埋め込みをそのトークンだけに切り出すことで、
+各ステップの出力層・softmax・ビームの選択の計算量を減らします。
+
+主な機能:
+- 日本語のコーパスと、英文のコーパスを全語彙で翻訳した結果からのショートリストの作成
+- モデルファイルが変わったときのショートリストの無効化
+- デコーダの埋め込みと出力層のショートリストへの切り出し
+- 絞り込んだトークンIDと元のトークンIDの相互変換
+- 全語彙での生成との出力の差異と速度の比較
+
+単体で実行すると、ショートリストを作成し、全語彙での生成との出力の差異と速度を比較します:
+    python vocab_shortlist.py --corpus 日本語のコーパス.txt
+        [--source-corpus 英文のコーパス.txt] [--eval 評価用の英文.txt]
+"""
+
+import argparse
+import copy
+import difflib
+import json
+import os
+import sys
+import time
+
+import torch
+
+# ショートリストの形式が変わった場合に更新する
+SHORTLIST_VERSION = 1
+
+# SentencePiece の単語の先頭を表す記号
+WORD_PREFIX = "▁"
+
+
+class VocabShortlist:
+    """
+    ターゲット言語の出力に使うトークンのリスト
+
+    トークンIDは昇順に並べ、絞り込み後のトークンIDはリスト内の位置とします。
+    特殊トークン（<s>、<pad>、</s>、<unk>）は語彙の先頭にあるため、絞り込み後も同じIDになります。
+
+    Attributes:
+        token_ids (list[int]): 元の語彙でのトークンIDのリスト（昇順）
+        tgt_lang (str): ターゲット言語
+    """
+
+    def __init__(self, token_ids, tgt_lang):
+        """
+        VocabShortlist クラスの初期化
+
+        Args:
+            token_ids (iterable[int]): 出力に使うトークンIDのリスト
+            tgt_lang (str): ターゲット言語
+        """
+        self.token_ids = sorted(set(int(token_id) for token_id in token_ids))
+        self.tgt_lang = tgt_lang
+        self._index = {token_id: i for i, token_id in enumerate(self.token_ids)}
+        self._full_ids = torch.tensor(self.token_ids, dtype=torch.long)
+
+    def __len__(self):
+        return len(self.token_ids)
+
+    def __contains__(self, token_id):
+        return token_id in self._index
+
+    def to_short(self, token_id):
+        """
+        元の語彙のトークンIDを絞り込み後のトークンIDに変換します。
+
+        Args:
+            token_id (int): 元の語彙のトークンID
+
+        Returns:
+            int: 絞り込み後のトークンID
+
+        Raises:
+            KeyError: トークンがショートリストに含まれていない場合
+        """
+        return self._index[token_id]
+
+    def to_full(self, token_ids):
+        """
+        絞り込み後のトークンIDのテンソルを元の語彙のトークンIDに戻します。
+
+        Args:
+            token_ids (torch.Tensor): 絞り込み後のトークンIDのテンソル
+
+        Returns:
+            torch.Tensor: 元の語彙のトークンIDのテンソル（同じ形状）
+        """
+        return self._full_ids.to(token_ids.device)[token_ids]
+
+    def apply(self, model):
+        """
+        モデルのデコーダの埋め込みと出力層をショートリストのトークンだけに切り出します。
+
+        エンコーダは英文の入力を扱うため、元の語彙の埋め込みをそのまま使います。
+        切り出した埋め込みと出力層は、元のモデルと同じく1つの重みを共有します。
+        モデルはその場で変更され、以降の生成ではトークンIDが絞り込み後のIDになります。
+
+        Args:
+            model: M2M100ForConditionalGeneration のインスタンス
+
+        Raises:
+            ValueError: 出力層が切り出せない形式の場合（int8量子化済みなど）や、
+                特殊トークンが絞り込み後に同じIDにならない場合
+        """
+        decoder = model.get_decoder()
+        embedding = decoder.embed_tokens
+        lm_head = model.get_output_embeddings()
+        if not isinstance(lm_head, torch.nn.Linear) or not isinstance(lm_head.weight, torch.Tensor):
+            raise ValueError("出力層が torch.nn.Linear ではないため、語彙を絞り込めません")
+        if self.token_ids[-1] >= embedding.num_embeddings:
+            raise ValueError("ショートリストにモデルの語彙にないトークンが含まれています")
+        # 位置埋め込みや生成の開始・終了の判定は元の語彙のIDを使うため、特殊トークンのIDは変えられない
+        config = model.config
+        for name in ("pad_token_id", "eos_token_id", "bos_token_id", "decoder_start_token_id"):
+            token_id = getattr(config, name, None)
+            if token_id is not None and self._index.get(token_id) != token_id:
+                raise ValueError(f"{name}（{token_id}）が絞り込み後に同じIDになりません")
+
+        index = self._full_ids.to(embedding.weight.device)
+        weight = torch.nn.Parameter(embedding.weight.detach()[index].clone(), requires_grad=False)
+
+        # 埋め込みのスケールなどの設定を引き継ぐため、元の埋め込みを複製して重みだけを差し替える
+        sliced_embedding = copy.copy(embedding)
+        sliced_embedding._parameters = dict(embedding._parameters)  # 元の埋め込みと辞書を共有しないようにする
+        sliced_embedding.weight = weight
+        sliced_embedding.num_embeddings = len(self)
+        if embedding.padding_idx is not None:
+            sliced_embedding.padding_idx = self._index.get(embedding.padding_idx)
+        decoder.embed_tokens = sliced_embedding
+
+        sliced_lm_head = torch.nn.Linear(weight.shape[1], len(self), bias=lm_head.bias is not None,
+                                         device=weight.device, dtype=weight.dtype)
+        sliced_lm_head.weight = weight
+        if lm_head.bias is not None:
+            sliced_lm_head.bias = torch.nn.Parameter(
+                lm_head.bias.detach()[index].clone(), requires_grad=False
+            )
+        model.set_output_embeddings(sliced_lm_head)
+
+
+def shortlist_path_for(model_dir, tgt_lang):
+    """
+    ショートリストの保存先のパスを取得します。
+
+    Args:
+        model_dir (str): モデルディレクトリのパス
+        tgt_lang (str): ターゲット言語
+
+    Returns:
+        str: ショートリストのファイルのパス（モデルディレクトリの隣）
+    """
+    return f"{os.path.normpath(model_dir)}_shortlist_{tgt_lang}.json"
+
+
+def make_shortlist_fingerprint(model_fingerprint, tgt_lang):
+    """
+    ショートリストのフィンガープリントを作成します。
+
+    Args:
+        model_fingerprint (str): モデルディレクトリのフィンガープリント
+        tgt_lang (str): ターゲット言語
+
+    Returns:
+        str: ショートリストのフィンガープリント
+    """
+    return f"v{SHORTLIST_VERSION}:{model_fingerprint}:{tgt_lang}"
+
+
+def collect_token_ids(tokenizer, texts):
+    """
+    テキストをトークナイズし、現れたトークンIDを集めます。
+
+    Args:
+        tokenizer: M2M100のトークナイザー
+        texts (iterable[str]): ターゲット言語のテキスト
+
+    Returns:
+        set[int]: トークンIDの集合（特殊トークンを含まない）
+    """
+    token_ids = set()
+    for text in texts:
+        token_ids.update(tokenizer.convert_tokens_to_ids(tokenizer.tokenize(text)))
+    return token_ids
+
+
+def single_character_token_ids(tokenizer):
+    """
+    1文字だけのトークン（単語の先頭の記号を除く）のIDを集めます。
+
+    コーパスに現れなかった文字でも、1文字ずつのトークンで出力できるようにするために含めます。
+
+    Args:
+        tokenizer: M2M100のトークナイザー
+
+    Returns:
+        set[int]: トークンIDの集合
+    """
+    return {
+        token_id for token, token_id in tokenizer.get_vocab().items()
+        if len(token.replace(WORD_PREFIX, "")) <= 1
+    }
+
+
+def build_shortlist(tokenizer, tgt_lang, texts=(), generated_ids=()):
+    """
+    ターゲット言語のテキストと生成されたトークンIDからショートリストを作成します。
+
+    特殊トークンとターゲット言語のトークン、1文字だけのトークンは常に含めます。
+
+    Args:
+        tokenizer: M2M100のトークナイザー
+        tgt_lang (str): ターゲット言語
+        texts (iterable[str], optional): ターゲット言語のコーパス
+        generated_ids (iterable[list[int]], optional): 全語彙で翻訳したときに生成されたトークンIDのリスト
+
+    Returns:
+        VocabShortlist: 作成したショートリスト
+    """
+    token_ids = {
+        tokenizer.bos_token_id, tokenizer.pad_token_id,
+        tokenizer.eos_token_id, tokenizer.unk_token_id,
+        tokenizer.get_lang_id(tgt_lang),
+    }
+    token_ids |= single_character_token_ids(tokenizer)
+    token_ids |= collect_token_ids(tokenizer, texts)
+    for ids in generated_ids:
+        token_ids.update(ids)
+    return VocabShortlist(token_ids, tgt_lang)
+
+
+def save_shortlist(shortlist, path, fingerprint):
+    """
+    ショートリストをファイルに保存します。
+
+    書き込み途中で終了しても壊れたファイルが残らないよう、一時ファイルに書き込んでから置き換えます。
+
+    Args:
+        shortlist (VocabShortlist): 保存するショートリスト
+        path (str): 保存先のパス
+        fingerprint (str): make_shortlist_fingerprint() で作成したフィンガープリント
+    """
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump({
+            "fingerprint": fingerprint,
+            "tgt_lang": shortlist.tgt_lang,
+            "token_ids": shortlist.token_ids,
+        }, f)
+    os.replace(tmp_path, path)
+
+
+def load_shortlist(path, fingerprint):
+    """
+    保存されたショートリストを読み込みます。
+
+    Args:
+        path (str): ショートリストのファイルのパス
+        fingerprint (str): make_shortlist_fingerprint() で作成したフィンガープリント
+
+    Returns:
+        VocabShortlist: ショートリスト。存在しないか古い場合はNone
+    """
+    if not os.path.exists(path):
+        return None
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except Exception as e:
+        print(f"語彙のショートリストを読み込めませんでした: {e}")
+        return None
+    if data.get("fingerprint") != fingerprint:
+        print("語彙のショートリストが古いため使用しません。作り直してください")
+        return None
+    return VocabShortlist(data["token_ids"], data["tgt_lang"])
+
+
+def translate_texts(model, tokenizer, texts, src_lang, tgt_lang, generation_kwargs, shortlist=None,
+                    batch_size=8):
+    """
+    テキストをバッチごとに翻訳し、翻訳結果と生成されたトークンIDを返します。
+
+    Args:
+        model: 翻訳モデル（shortlist を指定する場合は apply() 済みのモデル）
+        tokenizer: M2M100のトークナイザー
+        texts (list[str]): 翻訳するテキストのリスト
+        src_lang (str): ソース言語
+        tgt_lang (str): ターゲット言語
+        generation_kwargs (dict): model.generate に渡す設定
+        shortlist (VocabShortlist, optional): モデルに適用したショートリスト
+        batch_size (int, optional): 1回の推論にまとめるテキストの数
+
+    Returns:
+        tuple: (翻訳結果のリスト, 生成されたトークンIDのリスト, 所要時間（秒）)
+    """
+    forced_bos_token_id = tokenizer.get_lang_id(tgt_lang)
+    if shortlist is not None:
+        forced_bos_token_id = shortlist.to_short(forced_bos_token_id)
+    results = []
+    generated_ids = []
+    tokenizer.src_lang = src_lang
+    started_at = time.perf_counter()
+    with torch.inference_mode():
+        for start in range(0, len(texts), batch_size):
+            inputs = tokenizer(texts[start:start + batch_size], return_tensors="pt", padding=True)
+            generated_tokens = model.generate(
+                **inputs, forced_bos_token_id=forced_bos_token_id, **generation_kwargs
+            )
+            if shortlist is not None:
+                generated_tokens = shortlist.to_full(generated_tokens)
+            results.extend(tokenizer.batch_decode(generated_tokens, skip_special_tokens=True))
+            generated_ids.extend(generated_tokens.tolist())
+    return results, generated_ids, time.perf_counter() - started_at
+
+
+def compare_with_full_vocab(model, tokenizer, shortlist, texts, src_lang="en", tgt_lang="ja",
+                            generation_kwargs=None):
+    """
+    全語彙での生成とショートリストでの生成の出力と速度を比較します。
+
+    全語彙で翻訳した後にモデルへショートリストを適用するため、モデルは変更されます。
+    最初の1件は初回実行のオーバーヘッドを除くため計測前に一度実行します。
+
+    Args:
+        model: 全語彙の翻訳モデル
+        tokenizer: M2M100のトークナイザー
+        shortlist (VocabShortlist): 比較するショートリスト
+        texts (list[str]): 比較に使用するテキストのリスト
+        src_lang (str, optional): ソース言語。デフォルトは"en"
+        tgt_lang (str, optional): ターゲット言語。デフォルトは"ja"
+        generation_kwargs (dict, optional): model.generate に渡す設定
+
+    Returns:
+        dict: 所要時間、出力の一致率と類似度、ショートリストに含まれないトークンを生成した件数を含む比較結果
+    """
+    generation_kwargs = generation_kwargs or {
+        "max_length": 200, "num_beams": 5, "early_stopping": True
+    }
+
+    translate_texts(model, tokenizer, texts[:1], src_lang, tgt_lang, generation_kwargs)
+    full_results, full_ids, full_sec = translate_texts(
+        model, tokenizer, texts, src_lang, tgt_lang, generation_kwargs
+    )
+
+    shortlist.apply(model)
+    translate_texts(model, tokenizer, texts[:1], src_lang, tgt_lang, generation_kwargs, shortlist)
+    short_results, _, short_sec = translate_texts(
+        model, tokenizer, texts, src_lang, tgt_lang, generation_kwargs, shortlist
+    )
+
+    # 全語彙での出力にショートリストにないトークンが含まれる場合は、出力が変わる可能性がある
+    out_of_shortlist = sum(
+        1 for ids in full_ids if any(token_id not in shortlist for token_id in ids)
+    )
+    exact_matches = sum(1 for a, b in zip(full_results, short_results) if a == b)
+    similarities = [
+        difflib.SequenceMatcher(None, a, b).ratio() for a, b in zip(full_results, short_results)
+    ]
+    diverged = [
+        {"text": text, "full": a, "shortlist": b}
+        for text, a, b in zip(texts, full_results, short_results) if a != b
+    ]
+    return {
+        "vocab_size": len(tokenizer),
+        "shortlist_size": len(shortlist),
+        "full_total_ms": round(full_sec * 1000, 1),
+        "shortlist_total_ms": round(short_sec * 1000, 1),
+        "speedup": round(full_sec / short_sec, 2) if short_sec > 0 else None,
+        "exact_match_rate": round(exact_matches / len(texts), 3),
+        "avg_similarity": round(sum(similarities) / len(similarities), 3),
+        "out_of_shortlist_outputs": out_of_shortlist,
+        "diverged": diverged,
+    }
+
+
+def _read_lines(path):
+    """テキストファイルを読み込み、空行を除いた行のリストを返す"""
+    with open(path, "r", encoding="utf-8") as f:
+        return [line.strip() for line in f if line.strip()]
+
+
+def main():
+    """
+    ショートリストを作成し、全語彙での生成との出力の差異と速度を比較するメイン関数
+
+    Returns:
+        None
+    """
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    from persistent_cache import compute_model_fingerprint
+    from sample_texts import SAMPLE_TEXTS
+
+    default_model_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "model", "m2m100_418M"
+    )
+    parser = argparse.ArgumentParser(description='ターゲット言語の語彙のショートリストの作成と全語彙との比較')
+    parser.add_argument('--model-dir', default=default_model_dir, help='モデルディレクトリ')
+    parser.add_argument('--src-lang', default='en', help='ソース言語')
+    parser.add_argument('--tgt-lang', default='ja', help='ターゲット言語')
+    parser.add_argument('--corpus', help='ターゲット言語のコーパス（1行に1文）')
+    parser.add_argument('--source-corpus', help='全語彙で翻訳して出力のトークンを集めるソース言語のコーパス（1行に1文）')
+    parser.add_argument('--eval', help='比較に使用するソース言語のテキスト（1行に1文、省略時は固定サンプル）')
+    args = parser.parse_args()
+    if not args.corpus and not args.source_corpus:
+        parser.error('--corpus または --source-corpus を指定してください')
+
+    print(f"モデルを読み込んでいます: {args.model_dir}")
+    tokenizer = M2M100Tokenizer.from_pretrained(args.model_dir)
+    model = M2M100ForConditionalGeneration.from_pretrained(args.model_dir)
+    model.eval()
+    generation_kwargs = {"max_length": 200, "num_beams": 5, "early_stopping": True}
+
+    texts = _read_lines(args.corpus) if args.corpus else []
+    generated_ids = []
+    if args.source_corpus:
+        source_texts = _read_lines(args.source_corpus)
+        print(f"ソース言語のコーパスを全語彙で翻訳しています（{len(source_texts)}件）...")
+        _, generated_ids, _ = translate_texts(
+            model, tokenizer, source_texts, args.src_lang, args.tgt_lang, generation_kwargs
+        )
+
+    shortlist = build_shortlist(tokenizer, args.tgt_lang, texts, generated_ids)
+    path = shortlist_path_for(args.model_dir, args.tgt_lang)
+    model_fingerprint = compute_model_fingerprint(args.model_dir)
+    save_shortlist(shortlist, path, make_shortlist_fingerprint(model_fingerprint, args.tgt_lang))
+    print(f"ショートリストを保存しました（{len(shortlist)} / {len(tokenizer)} トークン）: {path}")
+
+    eval_texts = _read_lines(args.eval) if args.eval else SAMPLE_TEXTS
+    print(f"\n全語彙での生成と比較しています（{len(eval_texts)}件）...")
+    report = compare_with_full_vocab(
+        model, tokenizer, shortlist, eval_texts, args.src_lang, args.tgt_lang, generation_kwargs
+    )
+    for sample in report.pop("diverged"):
+        print(f"\n入力: {sample['text']}")
+        print(f"  全語彙: {sample['full']}")
+        print(f"  ショートリスト: {sample['shortlist']}")
+    print("\n比較結果:")
+    for name, value in report.items():
+        print(f"  {name}: {value}")
+
+
+if __name__ == "__main__":
+    # 同じディレクトリのモジュールをインポートできるようにパスを追加
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
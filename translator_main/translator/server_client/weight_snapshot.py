@@ -0,0 +1,273 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+重みスナップショットモジュール
+
+このモジュールは、翻訳モデルの重みを bf16 / fp16 に変換したスナップショットを作成し、
+サーバーの起動時に高速に読み込むための機能を提供します。
+スナップショットはメモリマップで読み込まれ、重みの初期化や fp32 のコピーを経由しないため、
+from_pretrained() での読み込みよりも起動時間とピーク時のメモリ使用量が小さくなります。
+
+主な機能:
+- bf16 / fp16 のスナップショットの作成（1回だけ実行し、次回以降は再利用）
+- モデルファイルが変わったときのスナップショットの無効化
+- スナップショットのメモリマップによる読み込み
+- 読み込み時間とメモリ使用量（RSS、ピークRSS）の計測
+
+単体で実行すると、スナップショットを作成し、通常の読み込みとの読み込み時間とメモリ使用量を比較します:
+    python weight_snapshot.py [--model-dir モデルディレクトリ] [--dtype bf16]
+"""
+
+import argparse
+import gc
+import json
+import os
+import shutil
+import subprocess
+import sys
+import time
+
+import torch
+
+from quantization import get_process_rss_mb, get_peak_rss_mb
+from file_lock import exclusive_file_lock, private_tmp_path, remove_stale_tmp, replace_dir
+from shared_weights import load_safetensors_mmap, read_safetensors_metadata, load_model_mmap
+
+# スナップショットの形式が変わった場合に更新する
+SNAPSHOT_VERSION = 1
+
+# スナップショットで使用できる数値型
+SNAPSHOT_DTYPES = {
+    "bf16": torch.bfloat16,
+    "fp16": torch.float16,
+}
+
+# スナップショットに一緒にコピーするファイル
+SNAPSHOT_CONFIG_FILES = ("config.json", "generation_config.json")
+
+
+def snapshot_dir_for(model_dir, dtype_name):
+    """
+    スナップショットの保存先のディレクトリを取得します。
+
+    Args:
+        model_dir (str): 元のモデルディレクトリのパス
+        dtype_name (str): 数値型（"bf16" または "fp16"）
+
+    Returns:
+        str: スナップショットのディレクトリのパス（モデルディレクトリの隣）
+    """
+    return f"{os.path.normpath(model_dir)}_{dtype_name}_snapshot"
+
+
+def make_snapshot_fingerprint(model_fingerprint, dtype_name):
+    """
+    スナップショットのフィンガープリントを作成します。
+
+    Args:
+        model_fingerprint (str): 元のモデルディレクトリのフィンガープリント
+        dtype_name (str): 数値型
+
+    Returns:
+        str: スナップショットのフィンガープリント
+    """
+    return f"v{SNAPSHOT_VERSION}:{model_fingerprint}:{dtype_name}"
+
+
+def create_snapshot(model_dir, out_dir, dtype_name, fingerprint):
+    """
+    元のモデルの重みを指定した数値型に変換し、スナップショットとして保存します。
+
+    元の model.safetensors をメモリマップして1つずつ変換するため、fp32 の重み全体を
+    メモリ上に複製することはありません。書き込み途中で終了しても壊れたスナップショットが
+    残らないよう、プロセスごとの一時ディレクトリに書き込んでから置き換えます。
+    exclusive_file_lock() でロックを取得してから呼び出してください。
+
+    Args:
+        model_dir (str): 元のモデルディレクトリのパス
+        out_dir (str): スナップショットの保存先のディレクトリ
+        dtype_name (str): 数値型（"bf16" または "fp16"）
+        fingerprint (str): make_snapshot_fingerprint() で作成したフィンガープリント
+
+    Returns:
+        bool: 作成できた場合はTrue
+    """
+    from safetensors.torch import save_file
+
+    dtype = SNAPSHOT_DTYPES[dtype_name]
+    tmp_dir = private_tmp_path(out_dir)
+    try:
+        started_at = time.perf_counter()
+        remove_stale_tmp(out_dir)
+        os.makedirs(tmp_dir)
+        # メモリマップしたテンソルは同じストレージを参照しているため、保存前にそれぞれ独立したテンソルにする
+        state_dict = {
+            name: tensor.to(dtype) if tensor.is_floating_point() else tensor.clone()
+            for name, tensor in load_safetensors_mmap(
+                os.path.join(model_dir, "model.safetensors")
+            ).items()
+        }
+        save_file(state_dict, os.path.join(tmp_dir, "model.safetensors"),
+                  metadata={"fingerprint": fingerprint, "dtype": dtype_name})
+        del state_dict
+        for name in SNAPSHOT_CONFIG_FILES:
+            path = os.path.join(model_dir, name)
+            if os.path.exists(path):
+                shutil.copy2(path, tmp_dir)
+        replace_dir(tmp_dir, out_dir)
+        print(f"{dtype_name}のスナップショットを作成しました（{time.perf_counter() - started_at:.1f}秒）: {out_dir}")
+        return True
+    except Exception as e:
+        print(f"{dtype_name}のスナップショットの作成に失敗しました: {e}")
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        return False
+
+
+def load_snapshot(model_cls, snapshot_dir, dtype_name, fingerprint):
+    """
+    スナップショットをメモリマップで読み込みます。
+
+    Args:
+        model_cls: モデルのクラス（M2M100ForConditionalGeneration など）
+        snapshot_dir (str): スナップショットのディレクトリ
+        dtype_name (str): 数値型（"bf16" または "fp16"）
+        fingerprint (str): make_snapshot_fingerprint() で作成したフィンガープリント
+
+    Returns:
+        モデル。スナップショットが存在しないか古い場合はNone
+    """
+    model_file = os.path.join(snapshot_dir, "model.safetensors")
+    if not os.path.exists(model_file):
+        return None
+    try:
+        if read_safetensors_metadata(model_file).get("fingerprint") != fingerprint:
+            print(f"{dtype_name}のスナップショットが古いため、作り直します")
+            return None
+    except Exception as e:
+        print(f"{dtype_name}のスナップショットを確認できませんでした: {e}")
+        return None
+    return load_model_mmap(model_cls, snapshot_dir, dtype=SNAPSHOT_DTYPES[dtype_name])
+
+
+def load_or_create_snapshot(model_cls, model_dir, dtype_name, model_fingerprint):
+    """
+    スナップショットを読み込みます。存在しないか古い場合は作成してから読み込みます。
+
+    複数のワーカーが同時に起動した場合は、ロックを取得した1つのワーカーだけが作成し、
+    ほかのワーカーは作成の完了を待ってから読み込みます。
+
+    Args:
+        model_cls: モデルのクラス
+        model_dir (str): 元のモデルディレクトリのパス
+        dtype_name (str): 数値型（"bf16" または "fp16"）
+        model_fingerprint (str): 元のモデルディレクトリのフィンガープリント
+
+    Returns:
+        モデル。作成も読み込みもできない場合はNone
+    """
+    out_dir = snapshot_dir_for(model_dir, dtype_name)
+    fingerprint = make_snapshot_fingerprint(model_fingerprint, dtype_name)
+    model = load_snapshot(model_cls, out_dir, dtype_name, fingerprint)
+    if model is None:
+        with exclusive_file_lock(out_dir):
+            # ロックを待っている間に別のワーカーが作成していれば、それを読み込む
+            model = load_snapshot(model_cls, out_dir, dtype_name, fingerprint)
+            if model is None and create_snapshot(model_dir, out_dir, dtype_name, fingerprint):
+                gc.collect()
+                model = load_snapshot(model_cls, out_dir, dtype_name, fingerprint)
+    if model is not None:
+        print(f"{dtype_name}のスナップショットを読み込みました: {out_dir}")
+    return model
+
+
+def measure_load(load_fn):
+    """
+    モデルの読み込み時間とメモリ使用量を計測します。
+
+    Args:
+        load_fn (callable): モデルを返す関数
+
+    Returns:
+        tuple: (モデル, 計測結果の辞書)
+    """
+    rss_before = get_process_rss_mb()
+    started_at = time.perf_counter()
+    model = load_fn()
+    elapsed = time.perf_counter() - started_at
+    rss_after = get_process_rss_mb()
+    peak = get_peak_rss_mb()
+    report = {
+        "load_sec": round(elapsed, 3),
+        "rss_mb": round(rss_after, 1) if rss_after is not None else None,
+        "rss_delta_mb": (
+            round(rss_after - rss_before, 1)
+            if rss_after is not None and rss_before is not None else None
+        ),
+        "peak_rss_mb": round(peak, 1) if peak is not None else None,
+    }
+    return model, report
+
+
+def _measure_in_subprocess(mode, model_dir, dtype_name):
+    """別プロセスで読み込みを計測する（ピークRSSをプロセスごとに分けるため）"""
+    output = subprocess.run(
+        [sys.executable, os.path.abspath(__file__), "--model-dir", model_dir,
+         "--dtype", dtype_name, "--measure", mode],
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def main():
+    """
+    スナップショットを作成し、通常の読み込みとの読み込み時間とメモリ使用量を比較するメイン関数
+
+    Returns:
+        None
+    """
+    from transformers import M2M100ForConditionalGeneration
+    from persistent_cache import compute_model_fingerprint
+
+    default_model_dir = os.path.join(
+        os.path.dirname(os.path.abspath(__file__)), "model", "m2m100_418M"
+    )
+    parser = argparse.ArgumentParser(description='bf16/fp16スナップショットの作成と読み込み時間の比較')
+    parser.add_argument('--model-dir', default=default_model_dir, help='モデルディレクトリ')
+    parser.add_argument('--dtype', default='bf16', choices=sorted(SNAPSHOT_DTYPES),
+                        help='スナップショットの数値型')
+    parser.add_argument('--measure', choices=['from_pretrained', 'snapshot'],
+                        help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    model_fingerprint = compute_model_fingerprint(args.model_dir)
+    if args.measure == 'from_pretrained':
+        _, report = measure_load(
+            lambda: M2M100ForConditionalGeneration.from_pretrained(args.model_dir)
+        )
+        print(json.dumps(report))
+        return
+    if args.measure == 'snapshot':
+        _, report = measure_load(lambda: load_snapshot(
+            M2M100ForConditionalGeneration, snapshot_dir_for(args.model_dir, args.dtype),
+            args.dtype,
+            make_snapshot_fingerprint(model_fingerprint, args.dtype)
+        ))
+        print(json.dumps(report))
+        return
+
+    out_dir = snapshot_dir_for(args.model_dir, args.dtype)
+    if not create_snapshot(args.model_dir, out_dir, args.dtype,
+                           make_snapshot_fingerprint(model_fingerprint, args.dtype)):
+        sys.exit(1)
+
+    print("\n読み込み時間とメモリ使用量を比較しています...")
+    for mode in ('from_pretrained', 'snapshot'):
+        report = _measure_in_subprocess(mode, args.model_dir, args.dtype)
+        print(f"  {mode}: {report}")
+
+
+if __name__ == "__main__":
+    # 同じディレクトリのモジュールをインポートできるようにパスを追加
+    sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+    main()
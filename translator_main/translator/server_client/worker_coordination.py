@@ -0,0 +1,303 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+ワーカー間連携モジュール
+
+このモジュールは、複数のワーカープロセスで実行する翻訳サーバーで、翻訳ジョブとキャンセルを
+すべてのワーカーから扱えるようにするための共有状態を実装します。
+接続はワーカーに振り分けられるため、ジョブを登録したワーカーとは別のワーカーに
+結果の取得やキャンセルが届くことがあります。共有状態はSQLiteデータベースに保存します。
+
+主な機能:
+- キャンセルの全ワーカーへの通知（各ワーカーのスレッドが定期的に確認して反映）
+- 同じ内容のジョブのワーカーをまたいだ重複排除
+- 別のワーカーが実行したジョブの状態と結果の参照
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+
+# ジョブの状態（job_store と同じ値）
+JOB_PENDING = "pending"
+JOB_DONE = "done"
+JOB_FAILED = "failed"
+
+
+def _serialize_key(key):
+    """ジョブのキーをデータベース用の文字列に変換する"""
+    raw = json.dumps(key, ensure_ascii=False, separators=(",", ":"))
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def remove_shared_state(db_path):
+    """
+    共有状態のデータベースファイルを削除します。
+
+    ワーカーを起動する前に親プロセスから呼び出し、前回の起動時に残った
+    実行中のジョブを引き継がないようにします。
+
+    Args:
+        db_path (str): データベースファイルのパス
+    """
+    for suffix in ("", "-wal", "-shm"):
+        try:
+            os.remove(db_path + suffix)
+        except FileNotFoundError:
+            pass
+
+
+class WorkerCoordinator:
+    """
+    SQLiteを使用したワーカー間の翻訳ジョブとキャンセルの共有
+
+    キャンセルは cancellations テーブルに追加され、各ワーカーのスレッドが poll_interval 秒ごとに
+    新しい行を確認してコールバックを呼び出します。ジョブは登録したワーカーが状態と結果を
+    jobs テーブルに書き込み、他のワーカーはそれを参照します。
+
+    Attributes:
+        db_path (str): データベースファイルのパス
+        ttl_sec (float): 完了したジョブの結果を保持する秒数
+        stale_sec (float): 実行中のまま更新されないジョブを無効とみなす秒数
+        poll_interval (float): キャンセルを確認する間隔（秒）
+    """
+
+    def __init__(self, db_path, ttl_sec=60.0, stale_sec=600.0, poll_interval=0.05):
+        """
+        WorkerCoordinator クラスの初期化
+
+        Args:
+            db_path (str): データベースファイルのパス
+            ttl_sec (float, optional): 完了したジョブの結果を保持する秒数。デフォルトは60
+            stale_sec (float, optional): 実行中のまま更新されないジョブを無効とみなす秒数。デフォルトは600
+            poll_interval (float, optional): キャンセルを確認する間隔（秒）。デフォルトは0.05
+        """
+        self.db_path = db_path
+        self.ttl_sec = max(0.0, float(ttl_sec))
+        self.stale_sec = max(1.0, float(stale_sec))
+        self.poll_interval = max(0.01, float(poll_interval))
+        self.worker_id = os.getpid()
+
+        self._lock = threading.Lock()
+        self._conn = None
+        self._listener = None
+        self._stop = threading.Event()
+        self._last_cancel = 0
+
+        # 統計情報
+        self._cancels_sent = 0
+        self._cancels_received = 0
+        self._remote_jobs = 0
+
+    def open(self, on_cancel):
+        """
+        データベースに接続し、他のワーカーからのキャンセルの確認を開始します。
+
+        Args:
+            on_cancel (callable): キャンセルされたリクエストIDを引数に呼び出される関数
+        """
+        directory = os.path.dirname(self.db_path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        # 複数のワーカーが同時に書き込むため、ロックの解放を待つ時間を長めにする
+        conn = sqlite3.connect(
+            self.db_path, timeout=10.0, check_same_thread=False, isolation_level=None
+        )
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS cancellations ("
+            "id INTEGER PRIMARY KEY AUTOINCREMENT, request_id TEXT NOT NULL, "
+            "worker INTEGER NOT NULL, cancelled_at REAL NOT NULL)"
+        )
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS jobs ("
+            "job_id TEXT PRIMARY KEY, job_key TEXT NOT NULL, worker INTEGER NOT NULL, "
+            "status TEXT NOT NULL, content TEXT, updated_at REAL NOT NULL)"
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_key ON jobs(job_key)")
+        with self._lock:
+            self._conn = conn
+            # 起動前のキャンセルは対象の翻訳がないため反映しない
+            row = conn.execute("SELECT MAX(id) FROM cancellations").fetchone()
+            self._last_cancel = row[0] or 0
+
+        self._listener = threading.Thread(
+            target=self._listen_loop, args=(on_cancel,), name="worker-coordination", daemon=True
+        )
+        self._listener.start()
+
+    def close(self):
+        """キャンセルの確認を止め、データベースとの接続を閉じます。"""
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=1.0)
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def publish_cancel(self, request_id):
+        """
+        キャンセルを他のワーカーに通知します。
+
+        Args:
+            request_id (str): キャンセルするリクエストID
+        """
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "INSERT INTO cancellations (request_id, worker, cancelled_at) VALUES (?, ?, ?)",
+                (request_id, self.worker_id, time.time())
+            )
+            self._cancels_sent += 1
+
+    def _listen_loop(self, on_cancel):
+        """他のワーカーからのキャンセルを定期的に確認し、古い行を削除する"""
+        last_prune = time.monotonic()
+        while not self._stop.wait(self.poll_interval):
+            try:
+                with self._lock:
+                    if self._conn is None:
+                        return
+                    rows = self._conn.execute(
+                        "SELECT id, request_id, worker FROM cancellations WHERE id > ? ORDER BY id",
+                        (self._last_cancel,)
+                    ).fetchall()
+                    if rows:
+                        self._last_cancel = rows[-1][0]
+                    if time.monotonic() - last_prune > 10.0:
+                        self._prune()
+                        last_prune = time.monotonic()
+                for _, request_id, worker in rows:
+                    # 自分が通知したキャンセルは /cancel の処理中に反映済み
+                    if worker != self.worker_id and on_cancel(request_id):
+                        self._cancels_received += 1
+            except Exception as e:
+                print(f"ワーカー間のキャンセルの確認中にエラーが発生しました: {e}")
+
+    def _prune(self):
+        """古いキャンセルと保持期間を過ぎたジョブを削除する（ロックを取得して呼び出す）"""
+        now = time.time()
+        self._conn.execute("DELETE FROM cancellations WHERE cancelled_at < ?", (now - 60.0,))
+        self._conn.execute(
+            "DELETE FROM jobs WHERE (status != ? AND updated_at < ?) OR updated_at < ?",
+            (JOB_PENDING, now - self.ttl_sec, now - self.stale_sec)
+        )
+
+    def claim_job(self, key, job_id):
+        """
+        同じキーのジョブがなければ、このワーカーのジョブとして登録します。
+
+        確認と登録は1つのトランザクションで行うため、複数のワーカーが同時に同じジョブを
+        登録しても、実行するのは1つのワーカーだけです。
+
+        Args:
+            key (tuple): 重複排除に使用するキー
+            job_id (str): 登録する場合のジョブID
+
+        Returns:
+            dict: 実行中または完了済みの同じキーのジョブ（登録した場合はこのジョブ）。
+                job_id、worker、status、content を含みます
+        """
+        job_key = _serialize_key(key)
+        now = time.time()
+        claimed = {
+            "job_id": job_id, "worker": self.worker_id, "status": JOB_PENDING, "content": None
+        }
+        with self._lock:
+            if self._conn is None:
+                return claimed
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = self._conn.execute(
+                    "SELECT job_id, worker, status, content FROM jobs "
+                    "WHERE job_key = ? "
+                    "AND ((status = ? AND updated_at >= ?) OR (status = ? AND updated_at >= ?)) "
+                    "ORDER BY updated_at DESC LIMIT 1",
+                    (job_key, JOB_PENDING, now - self.stale_sec, JOB_DONE, now - self.ttl_sec)
+                ).fetchone()
+                if row is None:
+                    self._conn.execute(
+                        "INSERT OR REPLACE INTO jobs "
+                        "(job_id, job_key, worker, status, content, updated_at) "
+                        "VALUES (?, ?, ?, ?, NULL, ?)",
+                        (job_id, job_key, self.worker_id, JOB_PENDING, now)
+                    )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        if row is None:
+            return claimed
+        if row[1] != self.worker_id:
+            self._remote_jobs += 1
+        return self._row_to_job(row)
+
+    def finish_job(self, job_id, status, content):
+        """
+        このワーカーで実行したジョブの状態と結果を書き込みます。
+
+        Args:
+            job_id (str): ジョブID
+            status (str): ジョブの状態（done / failed）
+            content (dict): GET /jobs/{job_id} で返す内容
+        """
+        with self._lock:
+            if self._conn is None:
+                return
+            self._conn.execute(
+                "UPDATE jobs SET status = ?, content = ?, updated_at = ? WHERE job_id = ?",
+                (status, json.dumps(content, ensure_ascii=False), time.time(), job_id)
+            )
+
+    def get_job(self, job_id):
+        """
+        他のワーカーが登録したジョブを取得します。
+
+        Args:
+            job_id (str): ジョブID
+
+        Returns:
+            dict: job_id、worker、status、content を含む辞書。存在しないか保持期間を過ぎた場合はNone
+        """
+        now = time.time()
+        with self._lock:
+            if self._conn is None:
+                return None
+            row = self._conn.execute(
+                "SELECT job_id, worker, status, content FROM jobs "
+                "WHERE job_id = ? AND ((status = ? AND updated_at >= ?) OR updated_at >= ?)",
+                (job_id, JOB_PENDING, now - self.stale_sec, now - self.ttl_sec)
+            ).fetchone()
+        return self._row_to_job(row) if row is not None else None
+
+    @staticmethod
+    def _row_to_job(row):
+        """jobs テーブルの行を辞書に変換する"""
+        job_id, worker, status, content = row
+        return {
+            "job_id": job_id,
+            "worker": worker,
+            "status": status,
+            "content": json.loads(content) if content else None,
+        }
+
+    def stats(self):
+        """
+        ワーカー間連携の統計情報を取得します。
+
+        Returns:
+            dict: 通知・反映したキャンセルの数と、他のワーカーのジョブを共有した数を含む辞書
+        """
+        return {
+            "worker": self.worker_id,
+            "cancels_sent": self._cancels_sent,
+            "cancels_received": self._cancels_received,
+            "remote_jobs": self._remote_jobs,
+        }